@@ -9,7 +9,12 @@ from app.core.db import Base
 from app.models.user import User  # noqa
 from app.models.category import Category  # noqa
 from app.models.expense import Expense  # noqa
+from app.models.expense_key import ExpenseKey  # noqa
 from app.models.expense_history import ExpenseHistory  # noqa
+from app.models.daily_category_total import DailyCategoryTotal  # noqa
+from app.models.cache_version import CacheVersion  # noqa
+from app.models.expense_snapshot import ExpenseSnapshot  # noqa
+from app.models.expense_history_outbox import ExpenseHistoryOutbox  # noqa
 
 config = context.config
 fileConfig(config.config_file_name)
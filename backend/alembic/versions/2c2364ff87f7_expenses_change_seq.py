@@ -0,0 +1,58 @@
+"""expenses change_seq for delta sync
+
+Revision ID: 2c2364ff87f7
+Revises: a4fdeb288d7f
+Create Date: 2026-10-18 21:42:05.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2c2364ff87f7"
+down_revision: Union[str, None] = "a4fdeb288d7f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE expenses_change_seq")
+    # volatile default: таблица переписывается, каждая существующая строка получает свой номер
+    op.add_column('expenses', sa.Column(
+        'change_seq', sa.BigInteger(),
+        server_default=sa.text("nextval('expenses_change_seq')"),
+        nullable=False,
+    ))
+    op.execute("ALTER SEQUENCE expenses_change_seq OWNED BY expenses.change_seq")
+    op.create_index('ix_expenses_change_seq', 'expenses', ['change_seq'], unique=False)
+    op.create_index(
+        'ix_expenses_updated_at_change_seq', 'expenses', ['updated_at', 'change_seq'], unique=False,
+    )
+
+    # любое UPDATE (ORM, массовые операции, ручной SQL) получает новый номер и свежий updated_at
+    op.execute("""
+        CREATE FUNCTION expenses_bump_change_seq() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_seq := nextval('expenses_change_seq');
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_expenses_change_seq
+        BEFORE UPDATE ON expenses
+        FOR EACH ROW EXECUTE FUNCTION expenses_bump_change_seq()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER trg_expenses_change_seq ON expenses")
+    op.execute("DROP FUNCTION expenses_bump_change_seq()")
+    op.drop_index('ix_expenses_updated_at_change_seq', table_name='expenses')
+    op.drop_index('ix_expenses_change_seq', table_name='expenses')
+    op.drop_column('expenses', 'change_seq')  # последовательность (OWNED BY) удаляется вместе с колонкой
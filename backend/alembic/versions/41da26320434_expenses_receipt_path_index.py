@@ -0,0 +1,30 @@
+"""expenses receipt_path index
+
+Revision ID: 41da26320434
+Revises: 9878fccb7609
+Create Date: 2026-10-18 13:41:52.306118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "41da26320434"
+down_revision: Union[str, None] = "9878fccb7609"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # подсчёт ссылок на файл чека (receipt_store.release)
+    op.create_index(
+        'ix_expenses_receipt_path', 'expenses', ['receipt_path'], unique=False,
+        postgresql_where=sa.text('receipt_path IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_expenses_receipt_path', table_name='expenses')
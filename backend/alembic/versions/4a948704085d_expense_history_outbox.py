@@ -0,0 +1,41 @@
+"""expense_history_outbox for batched audit writer
+
+Revision ID: 4a948704085d
+Revises: 716dcb641a86
+Create Date: 2026-10-19 10:14:22.905127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4a948704085d"
+down_revision: Union[str, None] = "716dcb641a86"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('expense_history_outbox',
+    sa.Column('seq', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('expense_id', sa.UUID(), nullable=False),
+    sa.Column('action', sa.String(length=16), nullable=False),
+    sa.Column('diff_json', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('actor_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+
+
+def downgrade() -> None:
+    # недоперенесённые строки не теряем
+    op.execute(
+        "INSERT INTO expense_history (id, expense_id, action, diff_json, actor_id, created_at) "
+        "SELECT id, expense_id, action, diff_json, actor_id, created_at FROM expense_history_outbox ORDER BY seq"
+    )
+    op.drop_table('expense_history_outbox')
@@ -0,0 +1,198 @@
+"""monthly range partitions for expenses and expense_history
+
+Revision ID: 716dcb641a86
+Revises: 2c2364ff87f7
+Create Date: 2026-10-18 23:05:47.629814
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "716dcb641a86"
+down_revision: Union[str, None] = "2c2364ff87f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# таблицы переписываются целиком под ACCESS EXCLUSIVE — запускать в окно обслуживания
+
+MONTHS_AHEAD = 3
+
+COMMENT_TSV_EXPR = (
+    "setweight(to_tsvector('russian', coalesce(comment, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(comment, '')), 'B')"
+)
+
+EXPENSE_COLUMNS = (
+    "id, amount_cents, payment_source, category_id, comment, spent_at, receipt_path, is_deleted, "
+    "deleted_at, deleted_by, created_by, created_at, updated_at, change_seq"
+)
+HISTORY_COLUMNS = "id, expense_id, action, diff_json, actor_id, created_at"
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _bound(d: date) -> str:
+    return f"'{d.isoformat()} 00:00:00+00'"
+
+
+def _expense_table(name: str, **kw) -> None:
+    op.create_table(name,
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('amount_cents', sa.Integer(), nullable=False),
+    sa.Column('payment_source', sa.String(length=16), nullable=False),
+    sa.Column('category_id', sa.UUID(), nullable=False),
+    sa.Column('comment', sa.Text(), nullable=True),
+    sa.Column('comment_tsv', postgresql.TSVECTOR(), sa.Computed(COMMENT_TSV_EXPR, persisted=True), nullable=True),
+    sa.Column('spent_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('receipt_path', sa.Text(), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('deleted_by', sa.UUID(), nullable=True),
+    sa.Column('created_by', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('expenses_change_seq')"), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], name='expenses_category_id_fkey'),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], name='expenses_created_by_fkey'),
+    sa.ForeignKeyConstraint(['deleted_by'], ['users.id'], name='expenses_deleted_by_fkey'),
+    **kw
+    )
+
+
+def _expense_indexes(pk: list[str]) -> None:
+    op.create_primary_key('expenses_pkey', 'expenses', pk)
+    op.create_index('ix_expenses_spent_at_id', 'expenses', ['spent_at', 'id'], unique=False)
+    op.create_index(
+        'ix_expenses_live_spent_at_id', 'expenses', ['spent_at', 'id'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+    op.create_index(
+        'ix_expenses_live_category_spent_at_id', 'expenses', ['category_id', 'spent_at', 'id'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+    op.create_index(
+        'ix_expenses_live_source_spent_at_id', 'expenses', ['payment_source', 'spent_at', 'id'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+    op.create_index(
+        'ix_expenses_receipt_path', 'expenses', ['receipt_path'], unique=False,
+        postgresql_where=sa.text('receipt_path IS NOT NULL'),
+    )
+    op.create_index('ix_expenses_comment_tsv', 'expenses', ['comment_tsv'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_expenses_comment_trgm', 'expenses', ['comment'], unique=False,
+        postgresql_using='gin', postgresql_ops={'comment': 'gin_trgm_ops'},
+    )
+    op.create_index('ix_expenses_change_seq', 'expenses', ['change_seq'], unique=False)
+    op.create_index(
+        'ix_expenses_updated_at_change_seq', 'expenses', ['updated_at', 'change_seq'], unique=False,
+    )
+    op.execute("ALTER SEQUENCE expenses_change_seq OWNED BY expenses.change_seq")
+    op.execute("""
+        CREATE TRIGGER trg_expenses_change_seq
+        BEFORE UPDATE ON expenses
+        FOR EACH ROW EXECUTE FUNCTION expenses_bump_change_seq()
+    """)
+
+
+def _history_table(name: str, **kw) -> None:
+    op.create_table(name,
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('expense_id', sa.UUID(), nullable=False),
+    sa.Column('action', sa.String(length=16), nullable=False),
+    sa.Column('diff_json', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('actor_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['actor_id'], ['users.id'], name='expense_history_actor_id_fkey'),
+    **kw
+    )
+
+
+def _history_indexes(pk: list[str]) -> None:
+    op.create_primary_key('expense_history_pkey', 'expense_history', pk)
+    op.create_index('ix_expense_history_expense_created', 'expense_history', ['expense_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_expense_history_created', 'expense_history', ['created_at', 'id'], unique=False)
+    op.create_index('ix_expense_history_actor_created', 'expense_history', ['actor_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_expense_history_action_created', 'expense_history', ['action', 'created_at', 'id'], unique=False)
+
+
+def _partitions(table: str, first: date, last: date) -> None:
+    """_p_before (MINVALUE..first), помесячные first..last, _p_future (..MAXVALUE) — как в app.core.partitions."""
+    op.execute(f"CREATE TABLE {table}_p_before PARTITION OF {table} FOR VALUES FROM (MINVALUE) TO ({_bound(first)})")
+    m = first
+    while m <= last:
+        op.execute(
+            f"CREATE TABLE {table}_p{m:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ({_bound(m)}) TO ({_bound(_add_months(m, 1))})"
+        )
+        m = _add_months(m, 1)
+    op.execute(f"CREATE TABLE {table}_p_future PARTITION OF {table} FOR VALUES FROM ({_bound(m)}) TO (MAXVALUE)")
+
+
+def _first_month(table: str, key: str, default: date) -> date:
+    first = op.get_bind().scalar(sa.text(
+        f"SELECT date_trunc('month', min({key}) AT TIME ZONE 'UTC')::date FROM {table}"
+    ))
+    return min(first, default) if first else default
+
+
+def upgrade() -> None:
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    last = _add_months(current, MONTHS_AHEAD)
+
+    # уникальный ключ партиционированной таблицы обязан включать ключ партиции,
+    # поэтому внешних ключей на expenses.id больше быть не может
+    op.drop_constraint('expense_history_expense_id_fkey', 'expense_history', type_='foreignkey')
+    op.drop_constraint('expense_snapshots_expense_id_fkey', 'expense_snapshots', type_='foreignkey')
+
+    # expenses: новая партиционированная таблица, копия данных, индексы — после загрузки
+    op.rename_table('expenses', 'expenses_unpartitioned')
+    op.execute("ALTER SEQUENCE expenses_change_seq OWNED BY NONE")
+    _expense_table('expenses', postgresql_partition_by='RANGE (spent_at)')
+    _partitions('expenses', _first_month('expenses_unpartitioned', 'spent_at', current), last)
+    op.execute(f"INSERT INTO expenses ({EXPENSE_COLUMNS}) SELECT {EXPENSE_COLUMNS} FROM expenses_unpartitioned")
+    op.drop_table('expenses_unpartitioned')
+    _expense_indexes(['id', 'spent_at'])
+
+    op.rename_table('expense_history', 'expense_history_unpartitioned')
+    _history_table('expense_history', postgresql_partition_by='RANGE (created_at)')
+    _partitions('expense_history', _first_month('expense_history_unpartitioned', 'created_at', current), last)
+    op.execute(
+        f"INSERT INTO expense_history ({HISTORY_COLUMNS}) "
+        f"SELECT {HISTORY_COLUMNS} FROM expense_history_unpartitioned"
+    )
+    op.drop_table('expense_history_unpartitioned')
+    _history_indexes(['id', 'created_at'])
+
+    op.execute("ANALYZE expenses")
+    op.execute("ANALYZE expense_history")
+
+
+def downgrade() -> None:
+    op.rename_table('expense_history', 'expense_history_partitioned')
+    _history_table('expense_history')
+    op.execute(
+        f"INSERT INTO expense_history ({HISTORY_COLUMNS}) "
+        f"SELECT {HISTORY_COLUMNS} FROM expense_history_partitioned"
+    )
+    op.drop_table('expense_history_partitioned')  # вместе с партициями
+    _history_indexes(['id'])
+
+    op.rename_table('expenses', 'expenses_partitioned')
+    op.execute("ALTER SEQUENCE expenses_change_seq OWNED BY NONE")
+    _expense_table('expenses')
+    op.execute(f"INSERT INTO expenses ({EXPENSE_COLUMNS}) SELECT {EXPENSE_COLUMNS} FROM expenses_partitioned")
+    op.drop_table('expenses_partitioned')
+    _expense_indexes(['id'])
+
+    op.create_foreign_key('expense_snapshots_expense_id_fkey', 'expense_snapshots', 'expenses', ['expense_id'], ['id'])
+    op.create_foreign_key('expense_history_expense_id_fkey', 'expense_history', 'expenses', ['expense_id'], ['id'])
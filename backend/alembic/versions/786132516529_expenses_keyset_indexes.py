@@ -0,0 +1,41 @@
+"""expenses keyset indexes
+
+Revision ID: 786132516529
+Revises: f403e6d61af5
+Create Date: 2026-10-18 10:12:41.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "786132516529"
+down_revision: Union[str, None] = "f403e6d61af5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_expenses_spent_at_id', 'expenses', ['spent_at', 'id'], unique=False)
+    op.create_index(
+        'ix_expenses_live_spent_at_id', 'expenses', ['spent_at', 'id'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+    op.create_index(
+        'ix_expenses_live_category_spent_at_id', 'expenses', ['category_id', 'spent_at', 'id'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+    op.create_index(
+        'ix_expenses_live_source_spent_at_id', 'expenses', ['payment_source', 'spent_at', 'id'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_expenses_live_source_spent_at_id', table_name='expenses')
+    op.drop_index('ix_expenses_live_category_spent_at_id', table_name='expenses')
+    op.drop_index('ix_expenses_live_spent_at_id', table_name='expenses')
+    op.drop_index('ix_expenses_spent_at_id', table_name='expenses')
@@ -0,0 +1,31 @@
+"""cache_versions
+
+Revision ID: 9878fccb7609
+Revises: f83c2f234285
+Create Date: 2026-10-18 12:20:05.771630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9878fccb7609"
+down_revision: Union[str, None] = "f83c2f234285"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO cache_versions (name, version) VALUES ('categories', 1)")
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
@@ -0,0 +1,44 @@
+"""expenses comment search (tsvector + pg_trgm)
+
+Revision ID: a4fdeb288d7f
+Revises: c96fec4c476d
+Create Date: 2026-10-18 17:10:39.552871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4fdeb288d7f"
+down_revision: Union[str, None] = "c96fec4c476d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COMMENT_TSV_EXPR = (
+    "setweight(to_tsvector('russian', coalesce(comment, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(comment, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('expenses', sa.Column(
+        'comment_tsv', postgresql.TSVECTOR(),
+        sa.Computed(COMMENT_TSV_EXPR, persisted=True),
+        nullable=True,
+    ))
+    op.create_index('ix_expenses_comment_tsv', 'expenses', ['comment_tsv'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_expenses_comment_trgm', 'expenses', ['comment'], unique=False,
+        postgresql_using='gin', postgresql_ops={'comment': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_expenses_comment_trgm', table_name='expenses')
+    op.drop_index('ix_expenses_comment_tsv', table_name='expenses')
+    op.drop_column('expenses', 'comment_tsv')
@@ -0,0 +1,31 @@
+"""expense_history indexes
+
+Revision ID: b2906df3af74
+Revises: 41da26320434
+Create Date: 2026-10-18 15:02:17.640915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2906df3af74"
+down_revision: Union[str, None] = "41da26320434"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_expense_history_expense_created', 'expense_history', ['expense_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_expense_history_created', 'expense_history', ['created_at', 'id'], unique=False)
+    op.create_index('ix_expense_history_actor_created', 'expense_history', ['actor_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_expense_history_action_created', 'expense_history', ['action', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_expense_history_action_created', table_name='expense_history')
+    op.drop_index('ix_expense_history_actor_created', table_name='expense_history')
+    op.drop_index('ix_expense_history_created', table_name='expense_history')
+    op.drop_index('ix_expense_history_expense_created', table_name='expense_history')
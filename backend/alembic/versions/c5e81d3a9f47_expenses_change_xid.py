@@ -0,0 +1,60 @@
+"""expenses.change_xid: delta-sync cursor by writing transaction
+
+Revision ID: c5e81d3a9f47
+Revises: 4a948704085d
+Create Date: 2026-10-19 14:02:37.418263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5e81d3a9f47"
+down_revision: Union[str, None] = "4a948704085d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # существующие строки получают xid этой миграции — все меньше любого будущего курсора-границы
+    op.add_column('expenses', sa.Column(
+        'change_xid', sa.BigInteger(),
+        server_default=sa.text("(pg_current_xact_id()::text::bigint)"),
+        nullable=False,
+    ))
+    op.create_index('ix_expenses_change_xid_id', 'expenses', ['change_xid', 'id'], unique=False)
+    # граница по updated_at больше не нужна — /changes ограничивает курсор xmin снимка
+    op.drop_index('ix_expenses_updated_at_change_seq', table_name='expenses')
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION expenses_bump_change_seq() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_seq := nextval('expenses_change_seq');
+            NEW.change_xid := pg_current_xact_id()::text::bigint;
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION expenses_bump_change_seq() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_seq := nextval('expenses_change_seq');
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.create_index(
+        'ix_expenses_updated_at_change_seq', 'expenses', ['updated_at', 'change_seq'], unique=False,
+    )
+    op.drop_index('ix_expenses_change_xid_id', table_name='expenses')
+    op.drop_column('expenses', 'change_xid')
@@ -0,0 +1,36 @@
+"""expense_snapshots
+
+Revision ID: c96fec4c476d
+Revises: b2906df3af74
+Create Date: 2026-10-18 16:25:44.018263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c96fec4c476d"
+down_revision: Union[str, None] = "b2906df3af74"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('expense_snapshots',
+    sa.Column('expense_id', sa.UUID(), nullable=False),
+    sa.Column('snapshot_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('state', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], ),
+    sa.PrimaryKeyConstraint('expense_id', 'snapshot_at')
+    )
+    # поиск последнего прогона снимков
+    op.create_index('ix_expense_snapshots_snapshot_at', 'expense_snapshots', ['snapshot_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_expense_snapshots_snapshot_at', table_name='expense_snapshots')
+    op.drop_table('expense_snapshots')
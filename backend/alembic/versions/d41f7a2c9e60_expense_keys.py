@@ -0,0 +1,79 @@
+"""expense_keys: id -> partition key lookup, FKs from history/snapshots
+
+Revision ID: d41f7a2c9e60
+Revises: c5e81d3a9f47
+Create Date: 2026-10-19 16:41:08.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d41f7a2c9e60"
+down_revision: Union[str, None] = "c5e81d3a9f47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('expense_keys',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('spent_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO expense_keys (id, spent_at) SELECT id, spent_at FROM expenses")
+
+    # перенос строки между партициями (смена месяца spent_at) — это DELETE + INSERT:
+    # AFTER UPDATE не срабатывает, срабатывают AFTER DELETE и AFTER INSERT (в этом порядке)
+    op.execute("""
+        CREATE FUNCTION expenses_sync_key() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM expense_keys WHERE id = OLD.id AND spent_at = OLD.spent_at;
+                RETURN OLD;
+            END IF;
+            INSERT INTO expense_keys (id, spent_at) VALUES (NEW.id, NEW.spent_at)
+            ON CONFLICT (id) DO UPDATE SET spent_at = EXCLUDED.spent_at;
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute(
+        "CREATE TRIGGER trg_expenses_sync_key AFTER INSERT OR DELETE OR UPDATE OF spent_at ON expenses "
+        "FOR EACH ROW EXECUTE FUNCTION expenses_sync_key()"
+    )
+
+    # вместо внешних ключей на expenses.id, снятых при партиционировании (716dcb641a86).
+    # Сироты могли появиться только от ручного DELETE трат: снимки производные — удаляем,
+    # историю (аудит) молча не трогаем — миграция остановится, разобрать руками
+    bind = op.get_bind()
+    orphans = bind.scalar(sa.text(
+        "SELECT count(*) FROM expense_history h "
+        "WHERE NOT EXISTS (SELECT 1 FROM expense_keys k WHERE k.id = h.expense_id)"
+    ))
+    if orphans:
+        raise RuntimeError(
+            f"expense_history: {orphans} row(s) reference missing expenses; "
+            "archive or delete them, then rerun the migration"
+        )
+    op.execute(
+        "DELETE FROM expense_snapshots s "
+        "WHERE NOT EXISTS (SELECT 1 FROM expense_keys k WHERE k.id = s.expense_id)"
+    )
+    for table in ('expense_history', 'expense_snapshots'):
+        op.create_foreign_key(
+            f'{table}_expense_id_fkey', table, 'expense_keys', ['expense_id'], ['id'],
+            deferrable=True, initially='DEFERRED',
+        )
+
+
+def downgrade() -> None:
+    op.drop_constraint('expense_snapshots_expense_id_fkey', 'expense_snapshots', type_='foreignkey')
+    op.drop_constraint('expense_history_expense_id_fkey', 'expense_history', type_='foreignkey')
+    op.execute("DROP TRIGGER trg_expenses_sync_key ON expenses")
+    op.execute("DROP FUNCTION expenses_sync_key()")
+    op.drop_table('expense_keys')
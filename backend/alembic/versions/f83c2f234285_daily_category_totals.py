@@ -0,0 +1,44 @@
+"""daily_category_totals rollup
+
+Revision ID: f83c2f234285
+Revises: 786132516529
+Create Date: 2026-10-18 11:03:27.918402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f83c2f234285"
+down_revision: Union[str, None] = "786132516529"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_category_totals',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.UUID(), nullable=False),
+    sa.Column('payment_source', sa.String(length=16), nullable=False),
+    sa.Column('total_cents', sa.BigInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.PrimaryKeyConstraint('day', 'category_id', 'payment_source')
+    )
+    # первичное заполнение из уже существующих трат
+    op.execute(
+        """
+        INSERT INTO daily_category_totals (day, category_id, payment_source, total_cents, count)
+        SELECT date(timezone('UTC', spent_at)), category_id, payment_source, sum(amount_cents), count(*)
+        FROM expenses
+        WHERE is_deleted = false
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_category_totals')
@@ -0,0 +1,28 @@
+import bcrypt
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_db
+from app.core.actor import create_access_token
+from app.models.user import User
+from app.schemas.auth import LoginIn, TokenOut
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+@router.post("/login", response_model=TokenOut)
+async def login(
+    payload: LoginIn,
+    db: AsyncSession = Depends(get_db),
+):
+    user = await db.scalar(select(User).where(User.email == payload.email.strip().lower()))
+    # bcrypt медленный намеренно — считаем в пуле потоков, не в event loop
+    ok = user is not None and await run_in_threadpool(
+        bcrypt.checkpw, payload.password.encode("utf-8"), user.password_hash.encode("utf-8")
+    )
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    token, expires_in = create_access_token(user)
+    return TokenOut(access_token=token, expires_in=expires_in, role=user.role.value)
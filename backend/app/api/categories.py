@@ -1,35 +1,120 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import date
 
-from app.core.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_db, get_read_db
+from app.core.actor import Actor, get_actor
 from app.core.admin_guard import require_admin
+from app.core.category_cache import VERSION_KEY, category_cache, invalidate_categories
+from app.core.conditional import list_etag, not_modified
+from app.core.category_tree import closure_cte
+from app.core.versions import expenses_version, get_version
 from app.models.category import Category
-from app.schemas.category import CategoryOut, CategoryCreate, CategoryUpdate
+from app.models.daily_category_total import DailyCategoryTotal
+from app.schemas.category import CategoryOut, CategoryCreate, CategoryUpdate, CategoryTreeNodeOut
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+ALLOWED_SOURCES = {"CASH", "CARD", "BANK"}
+
 @router.get("", response_model=list[CategoryOut])
-def list_categories(
+async def list_categories(
+    request: Request,
+    response: Response,
     active_only: bool = Query(default=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
+    actor: Actor = Depends(get_actor),
+):
+    cached = not_modified(request, response, list_etag(request, await get_version(db, VERSION_KEY), actor.role))
+    if cached is not None:
+        return cached
+    # из кеша процесса (сортировка: сначала родители, потом дети, потом по имени)
+    return await category_cache.list(db, active_only)
+
+@router.get("/tree", response_model=list[CategoryTreeNodeOut])
+async def category_tree(
+    request: Request,
+    response: Response,
+    date_from: date | None = Query(default=None),
+    date_to: date | None = Query(default=None),
+    payment_source: str | None = Query(default=None),
+    active_only: bool = Query(default=False),
+    db: AsyncSession = Depends(get_read_db),
+    actor: Actor = Depends(get_actor),
 ):
-    q = db.query(Category)
-    if active_only:
-        q = q.filter(Category.is_active == True)  # noqa: E712
-    # Сортировка: сначала родители, потом дети, потом по имени
-    rows = q.order_by(Category.parent_id.nullsfirst(), Category.name.asc()).all()
-    return rows
+    """
+    Плоский список категорий (parent_id задаёт дерево) с суммами: своими и по всему поддереву.
+    Суммы — из роллапа daily_category_totals, поддеревья — рекурсивным CTE,
+    всё двумя запросами независимо от глубины дерева. Удалённые траты в суммы не входят.
+    Только для вошедших (как и /expenses).
+    """
+    etag = list_etag(
+        request, await get_version(db, VERSION_KEY), await expenses_version(db), actor.role
+    )
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+
+    conds = []
+    if date_from:
+        conds.append(DailyCategoryTotal.day >= date_from)
+    if date_to:
+        conds.append(DailyCategoryTotal.day <= date_to)
+    if payment_source:
+        ps = payment_source.upper()
+        if ps not in ALLOWED_SOURCES:
+            raise HTTPException(status_code=400, detail="payment_source must be CASH|CARD|BANK")
+        conds.append(DailyCategoryTotal.payment_source == ps)
+
+    own = (
+        select(
+            DailyCategoryTotal.category_id,
+            func.sum(DailyCategoryTotal.total_cents).label("total_cents"),
+            func.sum(DailyCategoryTotal.count).label("count"),
+        )
+        .where(*conds)
+        .group_by(DailyCategoryTotal.category_id)
+        .subquery("own")
+    )
+    closure = closure_cte()
+    subtree_q = (
+        select(
+            closure.c.ancestor_id,
+            func.sum(own.c.total_cents).label("total_cents"),
+            func.sum(own.c.count).label("count"),
+        )
+        .join(own, own.c.category_id == closure.c.descendant_id)
+        .group_by(closure.c.ancestor_id)
+    )
+
+    own_totals = {r.category_id: r for r in await db.execute(select(own))}
+    subtree_totals = {r.ancestor_id: r for r in await db.execute(subtree_q)}
+
+    out = []
+    for cat in await category_cache.list(db, active_only):
+        o = own_totals.get(cat.id)
+        t = subtree_totals.get(cat.id)
+        out.append(CategoryTreeNodeOut(
+            **cat.model_dump(),
+            total_cents=o.total_cents if o else 0,
+            count=o.count if o else 0,
+            subtree_total_cents=t.total_cents if t else 0,
+            subtree_count=t.count if t else 0,
+        ))
+    return out
 
 @router.post("", response_model=CategoryOut)
-def create_category(
+async def create_category(
     payload: CategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin: None = Depends(require_admin),
 ):
     # Проверка parent_id (если задан)
     if payload.parent_id:
-        parent = db.query(Category).filter(Category.id == payload.parent_id).first()
+        parent = await db.scalar(select(Category).where(Category.id == payload.parent_id))
         if not parent:
             raise HTTPException(status_code=404, detail="Parent category not found")
         # На MVP: родитель должен быть активным
@@ -37,29 +122,30 @@ def create_category(
             raise HTTPException(status_code=400, detail="Parent category is archived")
 
     # Уникальность по name (простая, как в модели)
-    exists = db.query(Category).filter(Category.name == payload.name).first()
+    exists = await db.scalar(select(Category).where(Category.name == payload.name))
     if exists:
         raise HTTPException(status_code=400, detail="Category name already exists")
 
     cat = Category(name=payload.name, parent_id=payload.parent_id, is_active=True)
     db.add(cat)
-    db.commit()
-    db.refresh(cat)
+    await invalidate_categories(db)
+    await db.commit()
+    await db.refresh(cat)
     return cat
 
 @router.patch("/{category_id}", response_model=CategoryOut)
-def update_category(
+async def update_category(
     category_id: uuid.UUID,
     payload: CategoryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin: None = Depends(require_admin),
 ):
-    cat = db.query(Category).filter(Category.id == category_id).first()
+    cat = await db.scalar(select(Category).where(Category.id == category_id))
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
     if payload.name is not None:
-        exists = db.query(Category).filter(Category.name == payload.name, Category.id != category_id).first()
+        exists = await db.scalar(select(Category).where(Category.name == payload.name, Category.id != category_id))
         if exists:
             raise HTTPException(status_code=400, detail="Category name already exists")
         cat.name = payload.name
@@ -68,43 +154,46 @@ def update_category(
         if payload.parent_id == category_id:
             raise HTTPException(status_code=400, detail="Category cannot be parent of itself")
         if payload.parent_id:
-            parent = db.query(Category).filter(Category.id == payload.parent_id).first()
+            parent = await db.scalar(select(Category).where(Category.id == payload.parent_id))
             if not parent:
                 raise HTTPException(status_code=404, detail="Parent category not found")
             if not parent.is_active:
                 raise HTTPException(status_code=400, detail="Parent category is archived")
         cat.parent_id = payload.parent_id
 
-    db.commit()
-    db.refresh(cat)
+    await invalidate_categories(db)
+    await db.commit()
+    await db.refresh(cat)
     return cat
 
 @router.post("/{category_id}/archive", response_model=CategoryOut)
-def archive_category(
+async def archive_category(
     category_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin: None = Depends(require_admin),
 ):
-    cat = db.query(Category).filter(Category.id == category_id).first()
+    cat = await db.scalar(select(Category).where(Category.id == category_id))
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
     cat.is_active = False
-    db.commit()
-    db.refresh(cat)
+    await invalidate_categories(db)
+    await db.commit()
+    await db.refresh(cat)
     return cat
 
 @router.post("/{category_id}/restore", response_model=CategoryOut)
-def restore_category(
+async def restore_category(
     category_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin: None = Depends(require_admin),
 ):
-    cat = db.query(Category).filter(Category.id == category_id).first()
+    cat = await db.scalar(select(Category).where(Category.id == category_id))
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
     cat.is_active = True
-    db.commit()
-    db.refresh(cat)
+    await invalidate_categories(db)
+    await db.commit()
+    await db.refresh(cat)
     return cat
@@ -0,0 +1,83 @@
+import uuid
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.actor import Actor, get_actor
+from app.core.conditional import list_etag, not_modified
+from app.core.db import get_read_db
+from app.core.versions import expenses_version
+from app.models.daily_category_total import DailyCategoryTotal
+from app.schemas.dashboard import DashboardOut
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+ALLOWED_SOURCES = {"CASH", "CARD", "BANK"}
+
+
+@router.get("", response_model=DashboardOut)
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    date_from: date | None = Query(default=None),
+    date_to: date | None = Query(default=None),
+    category_ids: list[uuid.UUID] | None = Query(default=None),
+    payment_source: str | None = Query(default=None),
+    db: AsyncSession = Depends(get_read_db),
+    actor: Actor = Depends(get_actor),
+):
+    """
+    Агрегаты по категориям и по дням. Читает только роллап daily_category_totals,
+    в expenses не ходит. Удалённые траты не учитываются — для любой роли, как список трат по умолчанию.
+    Только для вошедших (как и /expenses).
+    """
+    cached = not_modified(request, response, list_etag(request, await expenses_version(db), actor.role))
+    if cached is not None:
+        return cached
+
+    conds = []
+    if date_from:
+        conds.append(DailyCategoryTotal.day >= date_from)
+    if date_to:
+        conds.append(DailyCategoryTotal.day <= date_to)
+    if category_ids:
+        conds.append(DailyCategoryTotal.category_id.in_(category_ids))
+    if payment_source:
+        ps = payment_source.upper()
+        if ps not in ALLOWED_SOURCES:
+            raise HTTPException(status_code=400, detail="payment_source must be CASH|CARD|BANK")
+        conds.append(DailyCategoryTotal.payment_source == ps)
+
+    total = func.coalesce(func.sum(DailyCategoryTotal.total_cents), 0).label("total_cents")
+    cnt = func.coalesce(func.sum(DailyCategoryTotal.count), 0).label("count")
+
+    by_category = (await db.execute(
+        select(DailyCategoryTotal.category_id, total, cnt)
+        .where(*conds)
+        .group_by(DailyCategoryTotal.category_id)
+        .having(func.sum(DailyCategoryTotal.count) != 0)
+        .order_by(total.desc())
+    )).all()
+
+    by_day = (await db.execute(
+        select(DailyCategoryTotal.day, total, cnt)
+        .where(*conds)
+        .group_by(DailyCategoryTotal.day)
+        .having(func.sum(DailyCategoryTotal.count) != 0)
+        .order_by(DailyCategoryTotal.day.asc())
+    )).all()
+
+    return {
+        "total_cents": sum(r.total_cents for r in by_category),
+        "count": sum(r.count for r in by_category),
+        "by_category": [
+            {"category_id": r.category_id, "total_cents": r.total_cents, "count": r.count}
+            for r in by_category
+        ],
+        "by_day": [
+            {"day": r.day, "total_cents": r.total_cents, "count": r.count}
+            for r in by_day
+        ],
+    }
@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.actor import Actor, get_actor_url_token
+from app.core.config import settings
+from app.core.events import RESYNC, event_hub
+
+router = APIRouter(tags=["events"])
+
+
+def _sse(seq: int | None, ev: dict) -> str:
+    event = "resync" if ev is RESYNC else "expense"
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n"
+
+
+@router.get("/events")
+async def expense_events(
+    request: Request,
+    _actor: Actor = Depends(get_actor_url_token),
+):
+    """
+    Server-Sent Events: изменения трат (CREATE/UPDATE/DELETE/RESTORE, BULK) после commit.
+    data: {"action", "expense_id", "changes": {поле: новое значение}, "by", "at"}.
+    event: resync — клиент мог пропустить события (отстал, переподключение): перечитать список.
+    """
+    q = event_hub.subscribe()
+    # EventSource переподключился сам — что было в разрыве, мы не знаем
+    reconnected = request.headers.get("last-event-id") is not None
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if reconnected:
+                yield _sse(None, RESYNC)
+            while True:
+                try:
+                    seq, ev = await asyncio.wait_for(q.get(), settings.events_keepalive_sec)
+                except asyncio.TimeoutError:
+                    # комментарий SSE: держит соединение через прокси
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(seq, ev)
+        finally:
+            event_hub.unsubscribe(q)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
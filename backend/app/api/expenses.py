@@ -1,24 +1,79 @@
+import csv
+import io
+import json
 import uuid
 from datetime import datetime, date, time
-from typing import Any
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-from app.core.db import get_db
-from app.core.actor import get_actor, require_admin_role
+from typing import Any, AsyncIterator, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import func, insert, literal, literal_column, select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_db, get_read_db, read_sessionmaker
+from app.core.actor import Actor, get_actor, require_admin_role
+from app.core.pagination import keyset_page, encode_xid_cursor, decode_xid_cursor
+from app.core import snapshots
+from app.core.partitions import expense_by_id, expenses_by_ids
+from app.core import audit, rollup
+from app.core.category_cache import VERSION_KEY as CATEGORIES_VERSION, category_cache
+from app.core.category_tree import subtree_ids
+from app.core.conditional import list_etag, not_modified
+from app.core.fast_json import rows_response
+from app.core.versions import EXPENSES_VERSION, bump_after_commit, expenses_version, get_version
 from app.models.expense import Expense
-from app.models.expense_history import ExpenseHistory
 from app.models.category import Category
-from app.models.user import User, UserRole
-from app.schemas.expense import ExpenseOut, ExpenseCreate, ExpenseUpdate
+from app.models.user import UserRole
+from app.schemas.expense import (
+    ExpenseOut,
+    ExpenseCreate,
+    ExpenseUpdate,
+    ExpenseImportRow,
+    BulkRowError,
+    BulkImportResult,
+    ExpenseBatchIn,
+    ExpenseBatchResult,
+    ExpenseChangesOut,
+    ExpenseTombstone,
+)
 from app.schemas.expense_history import ExpenseHistoryOut
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
 ALLOWED_SOURCES = {"CASH", "CARD", "BANK"}
 
+PAGE_SIZE_DEFAULT = 200
+PAGE_SIZE_MAX = 1000
+
+EXPORT_BATCH = 2000
+EXPORT_COLUMNS = [
+    "id",
+    "spent_at",
+    "amount_cents",
+    "payment_source",
+    "category_id",
+    "category_name",
+    "comment",
+    "receipt_path",
+    "is_deleted",
+    "created_by",
+    "created_at",
+    "updated_at",
+]
+
+# колонки ExpenseOut в порядке полей схемы: список отдаётся Core-строками через orjson
+# (без ORM-объектов и без повторной валидации каждой строки в response_model)
+_OUT_COLUMNS = tuple(getattr(Expense, name) for name in ExpenseOut.model_fields)
+
+CHANGES_LIMIT_DEFAULT = 500
+CHANGES_LIMIT_MAX = 5000
+
+BULK_MAX_ROWS = 100_000
+BULK_CHUNK = 5000
+# POST /expenses/batch: больше — 413 (по фильтру заранее не знаем, сколько попадёт)
+BATCH_MAX_ROWS = 10_000
+
 
 def _dt_start(d: date) -> datetime:
     return datetime.combine(d, time.min)
@@ -50,33 +105,56 @@ def _make_diff(old: Expense, new_data: dict) -> dict:
     return diff
 
 
+def _create_diff(values: dict) -> dict:
+    return {
+        "amount_cents": {"old": None, "new": values["amount_cents"]},
+        "payment_source": {"old": None, "new": values["payment_source"]},
+        "category_id": {"old": None, "new": str(values["category_id"])},
+        "comment": {"old": None, "new": values["comment"]},
+        "spent_at": {"old": None, "new": values["spent_at"].isoformat()},
+    }
+
+
 def _write_history(
-    db: Session,
+    db: AsyncSession,
     expense_id: uuid.UUID,
     action: str,
     diff: dict,
     actor_id: uuid.UUID,
 ) -> None:
-    h = ExpenseHistory(
-        expense_id=expense_id,
-        action=action,
-        diff_json=diff or {},
-        actor_id=actor_id,
-    )
-    db.add(h)
+    # inline — в транзакции траты; batched — групповой записью после commit (app.core.audit)
+    audit.add_history(db, expense_id, action, diff, actor_id)
 
 
-@router.get("", response_model=list[ExpenseOut])
-def list_expenses(
-    date_from: date | None = Query(default=None),
-    date_to: date | None = Query(default=None),
-    category_ids: list[uuid.UUID] | None = Query(default=None),
-    payment_source: str | None = Query(default=None),
-    include_deleted: bool = Query(default=False),
-    db: Session = Depends(get_db),
-    actor: User = Depends(get_actor),
-):
-    q = db.query(Expense)
+_RU = literal_column("'russian'::regconfig")
+_SIMPLE = literal_column("'simple'::regconfig")
+
+
+def _search_tsquery(q: str):
+    # websearch_to_tsquery безопасен для пользовательского ввода (кавычки, "-слово", or)
+    return func.websearch_to_tsquery(_RU, q).op("||")(func.websearch_to_tsquery(_SIMPLE, q))
+
+
+def _search_cond(q: str):
+    """Совпадение по полнотекстовому индексу или по триграммам (опечатки) — оба через GIN."""
+    return Expense.comment_tsv.op("@@")(_search_tsquery(q)) | literal(q).op("<%")(Expense.comment)
+
+
+def _search_rank(q: str):
+    return func.ts_rank(Expense.comment_tsv, _search_tsquery(q)) + func.word_similarity(q, Expense.comment)
+
+
+def _list_filters(
+    actor: Actor,
+    date_from: date | None,
+    date_to: date | None,
+    category_ids: list[uuid.UUID] | None,
+    payment_source: str | None,
+    include_deleted: bool,
+    include_children: bool = False,
+) -> list:
+    """Общие фильтры списка трат (список, экспорт)."""
+    conds = []
 
     # По умолчанию менеджер НЕ видит удалённые.
     # Админ может включить include_deleted=true
@@ -85,36 +163,301 @@ def list_expenses(
             raise HTTPException(status_code=403, detail="Admin only for include_deleted")
         # админ видит всё (и удалённые тоже)
     else:
-        q = q.filter(Expense.is_deleted == False)  # noqa: E712
+        conds.append(Expense.is_deleted == False)  # noqa: E712
 
     if date_from:
-        q = q.filter(Expense.spent_at >= _dt_start(date_from))
+        conds.append(Expense.spent_at >= _dt_start(date_from))
     if date_to:
-        q = q.filter(Expense.spent_at <= _dt_end(date_to))
+        conds.append(Expense.spent_at <= _dt_end(date_to))
 
     if category_ids:
-        q = q.filter(Expense.category_id.in_(category_ids))
+        if include_children:
+            # вся ветка на любой глубине — рекурсивный CTE в том же запросе
+            conds.append(Expense.category_id.in_(subtree_ids(category_ids)))
+        else:
+            conds.append(Expense.category_id.in_(category_ids))
 
     if payment_source:
         ps = payment_source.upper()
         if ps not in ALLOWED_SOURCES:
             raise HTTPException(status_code=400, detail="payment_source must be CASH|CARD|BANK")
-        q = q.filter(Expense.payment_source == ps)
+        conds.append(Expense.payment_source == ps)
+
+    return conds
 
-    return q.order_by(Expense.spent_at.desc()).all()
+
+@router.get("", response_model=list[ExpenseOut])
+async def list_expenses(
+    request: Request,
+    response: Response,
+    date_from: date | None = Query(default=None),
+    date_to: date | None = Query(default=None),
+    category_ids: list[uuid.UUID] | None = Query(default=None),
+    include_children: bool = Query(default=False),
+    payment_source: str | None = Query(default=None),
+    include_deleted: bool = Query(default=False),
+    limit: int = Query(default=PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = Query(default=None),
+    as_of: datetime | None = Query(default=None),
+    q: str | None = Query(default=None, min_length=2, max_length=200),
+    db: AsyncSession = Depends(get_read_db),
+    actor: Actor = Depends(get_actor),
+):
+    """
+    Keyset-пагинация по (spent_at, id), от новых к старым.
+    Если есть следующая страница — курсор отдаём в заголовке X-Next-Cursor
+    (тело остаётся списком, фронт не ломается).
+    as_of — список в состоянии на указанный момент (только админ).
+    q — поиск по комментарию: лучшие `limit` совпадений по релевантности (без курсора).
+    ETag — по версии трат (и категорий при include_children) и параметрам; на совпавший If-None-Match — 304
+    без основного запроса.
+    """
+    if q and (as_of or cursor):
+        raise HTTPException(status_code=400, detail="q cannot be combined with as_of or cursor")
+
+    parts = [await expenses_version(db), actor.role]
+    if include_children and category_ids:
+        # состав поддерева зависит от дерева категорий — перенос категории меняет ответ
+        parts.append(await get_version(db, CATEGORIES_VERSION))
+    etag = list_etag(request, *parts)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+
+    if as_of:
+        return await _list_as_of(
+            response, as_of, date_from, date_to, category_ids, include_children, payment_source,
+            include_deleted, limit, cursor, db, actor,
+        )
+
+    stmt = select(*_OUT_COLUMNS).where(
+        *_list_filters(
+            actor, date_from, date_to, category_ids, payment_source, include_deleted, include_children
+        )
+    )
+
+    if q:
+        stmt = (
+            stmt.where(_search_cond(q))
+            .order_by(_search_rank(q).desc(), Expense.spent_at.desc(), Expense.id.desc())
+            .limit(limit)
+        )
+        return rows_response((await db.execute(stmt)).all(), response)
+
+    rows = await keyset_page(db, stmt, Expense.spent_at, Expense.id, limit, cursor, response, as_rows=True)
+    return rows_response(rows, response)
+
+
+async def _list_as_of(
+    response: Response,
+    as_of: datetime,
+    date_from: date | None,
+    date_to: date | None,
+    category_ids: list[uuid.UUID] | None,
+    include_children: bool,
+    payment_source: str | None,
+    include_deleted: bool,
+    limit: int,
+    cursor: str | None,
+    db: AsyncSession,
+    actor: Actor,
+) -> Response:
+    if actor.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin only for as_of")
+    # проверка параметров — та же, что у обычного списка
+    _list_filters(actor, date_from, date_to, category_ids, payment_source, include_deleted)
+
+    # фильтры — по состоянию на as_of (значения могли отличаться от текущих), всё в одном запросе
+    st = snapshots.expenses_as_of_query(snapshots.parse_ts(as_of))
+    conds = []
+    if not include_deleted:
+        conds.append(st.c.is_deleted == False)  # noqa: E712
+    if date_from:
+        conds.append(st.c.spent_at >= _dt_start(date_from))
+    if date_to:
+        conds.append(st.c.spent_at <= _dt_end(date_to))
+    if category_ids:
+        conds.append(st.c.category_id.in_(subtree_ids(category_ids) if include_children else category_ids))
+    if payment_source:
+        conds.append(st.c.payment_source == payment_source.upper())
+
+    # даты в снимках/истории бывают без зоны — это UTC
+    await db.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    rows = await keyset_page(db, select(st).where(*conds), st.c.spent_at, st.c.id, limit, cursor, response, as_rows=True)
+    return rows_response(rows, response)
+
+
+async def _export_rows(conds: list, session_factory) -> AsyncIterator[dict]:
+    """
+    Читает траты серверным курсором (yield_per) — в памяти только текущая пачка.
+    Сессия своя: зависимость get_db закрывается раньше, чем стрим дочитается.
+    """
+    stmt = (
+        select(
+            Expense.id,
+            Expense.spent_at,
+            Expense.amount_cents,
+            Expense.payment_source,
+            Expense.category_id,
+            Category.name.label("category_name"),
+            Expense.comment,
+            Expense.receipt_path,
+            Expense.is_deleted,
+            Expense.created_by,
+            Expense.created_at,
+            Expense.updated_at,
+        )
+        .join(Category, Category.id == Expense.category_id)
+        .where(*conds)
+        .order_by(Expense.spent_at.desc(), Expense.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+
+    async with session_factory() as db:
+        result = await db.stream(stmt)
+        async for row in result:
+            yield {k: _jsonable(v) for k, v in row._mapping.items()}
+
+
+async def _export_csv(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=EXPORT_COLUMNS)
+    # BOM — чтобы Excel открыл кириллицу без танцев
+    buf.write("\ufeff")
+    w.writeheader()
+    # заголовок отдаём сразу, не дожидаясь первой пачки
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    n = 0
+    async for row in rows:
+        w.writerow(row)
+        n += 1
+        if n % EXPORT_BATCH == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+async def _export_ndjson(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    chunk = []
+    async for row in rows:
+        chunk.append(json.dumps(row, ensure_ascii=False))
+        if len(chunk) >= EXPORT_BATCH:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+@router.get("/export")
+async def export_expenses(
+    request: Request,
+    format: Literal["csv", "ndjson"] = Query(default="csv"),
+    date_from: date | None = Query(default=None),
+    date_to: date | None = Query(default=None),
+    category_ids: list[uuid.UUID] | None = Query(default=None),
+    include_children: bool = Query(default=False),
+    payment_source: str | None = Query(default=None),
+    include_deleted: bool = Query(default=False),
+    q: str | None = Query(default=None, min_length=2, max_length=200),
+    actor: Actor = Depends(get_actor),
+):
+    """Выгрузка трат потоком (CSV / NDJSON) с теми же фильтрами, что и список."""
+    # фильтры (и проверки прав) — до начала стрима, чтобы ошибки ушли нормальным HTTP-кодом
+    conds = _list_filters(
+        actor, date_from, date_to, category_ids, payment_source, include_deleted, include_children
+    )
+    if q:
+        conds.append(_search_cond(q))
+    # реплика, если клиент недавно ничего не менял
+    rows = _export_rows(conds, read_sessionmaker(request))
+
+    if format == "csv":
+        body, media_type = _export_csv(rows), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _export_ndjson(rows), "application/x-ndjson"
+
+    filename = f"expenses_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/changes", response_model=ExpenseChangesOut)
+async def expense_changes(
+    since: str | None = Query(default=None),
+    limit: int = Query(default=CHANGES_LIMIT_DEFAULT, ge=1, le=CHANGES_LIMIT_MAX),
+    db: AsyncSession = Depends(get_db),
+    _actor: Actor = Depends(get_actor),
+):
+    """
+    Дельта-синхронизация: что изменилось после курсора since, по порядку (change_xid, id).
+    Без since — первая загрузка (только живые траты). upserts — текущее состояние трат,
+    deleted — удалённые после курсора. has_more=true — сразу повторить с новым cursor.
+    Читаем из основной базы: на реплике курсор может обогнать ещё не доехавшие строки.
+    """
+    conds = []
+    after = None
+    if since is not None:
+        after = decode_xid_cursor(since)
+        conds.append(tuple_(Expense.change_xid, Expense.id) > tuple_(*after))
+    else:
+        conds.append(Expense.is_deleted == False)  # noqa: E712
+
+    # граница — xmin снимка, взятый до чтения строк: транзакции с меньшим xid уже завершились,
+    # их строки видны следующему запросу и больше не появятся с таким xid. Незакоммиченная
+    # транзакция (сколько бы она ни шла) держит xmin, и курсор за её изменения не заходит
+    horizon = await db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"))
+    conds.append(Expense.change_xid < horizon)
+
+    stmt = (
+        select(*_OUT_COLUMNS, Expense.deleted_at, Expense.change_xid)
+        .where(*conds)
+        .order_by(Expense.change_xid, Expense.id)
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    upserts, deleted = [], []
+    for r in rows:
+        if r.is_deleted:
+            deleted.append(ExpenseTombstone(id=r.id, deleted_at=r.deleted_at))
+        else:
+            upserts.append(ExpenseOut.model_validate(r, from_attributes=True))
+    cursor = _changes_cursor(after, rows[-1] if rows else None, has_more, horizon)
+    return ExpenseChangesOut(
+        upserts=upserts, deleted=deleted, cursor=encode_xid_cursor(*cursor), has_more=has_more,
+    )
+
+
+def _changes_cursor(
+    after: tuple[int, uuid.UUID] | None, last, has_more: bool, horizon: int,
+) -> tuple[int, uuid.UUID]:
+    """
+    Следующий курсор /changes. Есть ещё — последняя отданная строка. Всё до границы отдано —
+    сама граница (horizon, нулевой id): строк с xid меньше неё уже не будет. Назад не идёт.
+    """
+    nxt = (last.change_xid, last.id) if has_more else (horizon, uuid.UUID(int=0))
+    return max(after, nxt) if after is not None else nxt
 
 
 @router.post("", response_model=ExpenseOut)
-def create_expense(
+async def create_expense(
     payload: ExpenseCreate,
-    db: Session = Depends(get_db),
-    actor: User = Depends(get_actor),
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
 ):
     ps = payload.payment_source.upper()
     if ps not in ALLOWED_SOURCES:
         raise HTTPException(status_code=400, detail="payment_source must be CASH|CARD|BANK")
 
-    cat = db.query(Category).filter(Category.id == payload.category_id).first()
+    cat = await category_cache.get(db, payload.category_id)
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
     if not cat.is_active:
@@ -134,35 +477,318 @@ def create_expense(
     )
 
     db.add(exp)
-    db.flush()  # чтобы появился exp.id до commit
+    await db.flush()  # чтобы появился exp.id до commit
+    await rollup.add_expense(db, exp)
 
     _write_history(
         db,
         exp.id,
         "CREATE",
-        {
-            "amount_cents": {"old": None, "new": exp.amount_cents},
-            "payment_source": {"old": None, "new": exp.payment_source},
-            "category_id": {"old": None, "new": str(exp.category_id)},
-            "comment": {"old": None, "new": exp.comment},
-            "spent_at": {"old": None, "new": exp.spent_at.isoformat()},
-        },
+        _create_diff({
+            "amount_cents": exp.amount_cents,
+            "payment_source": exp.payment_source,
+            "category_id": exp.category_id,
+            "comment": exp.comment,
+            "spent_at": exp.spent_at,
+        }),
         actor.id,
     )
 
-    db.commit()
-    db.refresh(exp)
+    await audit.commit_with_history(db)
+    await bump_after_commit(EXPENSES_VERSION)
+    await db.refresh(exp)
     return exp
 
 
+def _validation_detail(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(x) for x in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+    )
+
+
+def _decode_csv(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Excel на русской Windows сохраняет CSV в cp1251
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded (save as 'CSV UTF-8')")
+
+
+def _parse_csv(text: str) -> list[dict]:
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    # пустые ячейки -> None, чтобы сработали дефолты схемы
+    return [{k: (v if v != "" else None) for k, v in r.items() if k} for r in reader]
+
+
+async def _bulk_insert(
+    db: AsyncSession,
+    raw_rows: list,
+    actor_id: uuid.UUID,
+    atomic: bool,
+) -> BulkImportResult:
+    errors: list[BulkRowError] = []
+    parsed: list[tuple[int, ExpenseImportRow]] = []
+
+    for i, raw in enumerate(raw_rows):
+        try:
+            row = ExpenseImportRow.model_validate(raw)
+        except ValidationError as e:
+            errors.append(BulkRowError(row=i, detail=_validation_detail(e)))
+            continue
+        if row.payment_source.upper() not in ALLOWED_SOURCES:
+            errors.append(BulkRowError(row=i, detail="payment_source must be CASH|CARD|BANK"))
+            continue
+        if row.category_id is None and not row.category_name:
+            errors.append(BulkRowError(row=i, detail="category_id or category_name is required"))
+            continue
+        parsed.append((i, row))
+
+    # категории — из кеша процесса, одна сверка версии на всю пачку
+    by_id, by_name = await category_cache.snapshot(db)
+
+    now = datetime.utcnow()
+    expense_rows: list[dict] = []
+    history_rows: list[dict] = []
+    delta = rollup.RollupDelta()
+
+    for i, row in parsed:
+        cat = by_id.get(row.category_id) if row.category_id is not None else by_name.get(row.category_name)
+        if not cat:
+            errors.append(BulkRowError(row=i, detail="Category not found"))
+            continue
+        if not cat.is_active:
+            errors.append(BulkRowError(row=i, detail="Category is archived"))
+            continue
+
+        values = {
+            "id": uuid.uuid4(),
+            "amount_cents": row.amount_cents,
+            "payment_source": row.payment_source.upper(),
+            "category_id": cat.id,
+            "comment": row.comment,
+            "spent_at": row.spent_at or now,
+            "receipt_path": None,
+            "is_deleted": False,
+            "deleted_at": None,
+            "deleted_by": None,
+            "created_by": actor_id,
+        }
+        expense_rows.append(values)
+        history_rows.append({
+            "id": uuid.uuid4(),
+            "expense_id": values["id"],
+            "action": "CREATE",
+            "diff_json": _create_diff(values),
+            "actor_id": actor_id,
+        })
+        delta.add(values["spent_at"], values["category_id"], values["payment_source"], 1, values["amount_cents"])
+
+    errors.sort(key=lambda e: e.row)
+    if atomic and errors:
+        return BulkImportResult(created=0, errors=errors)
+
+    # executemany (insertmanyvalues) пачками, всё в одной транзакции; история — тем же путём,
+    # что у одиночных изменений (inline или outbox, см. app.core.audit)
+    for start in range(0, len(expense_rows), BULK_CHUNK):
+        await db.execute(insert(Expense), expense_rows[start:start + BULK_CHUNK])
+    await audit.add_history_rows(db, history_rows)
+    await delta.apply(db)
+    await audit.commit_with_history(db)
+    await bump_after_commit(EXPENSES_VERSION)
+
+    return BulkImportResult(created=len(expense_rows), errors=errors)
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_expenses(
+    request: Request,
+    atomic: bool = Query(default=False),
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
+):
+    """
+    Массовый импорт трат: JSON-массив, text/csv в теле или CSV-файл (multipart, поле file).
+    Колонки CSV: amount_cents, payment_source, category_id | category_name, comment, spent_at.
+    Ошибочные строки пропускаются и возвращаются в errors; с atomic=true при любой
+    ошибке не создаётся ничего.
+    """
+    ct = (request.headers.get("content-type") or "").lower()
+    if ct.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="CSV file expected in field 'file'")
+        raw_rows = _parse_csv(_decode_csv(await upload.read()))
+    elif ct.startswith("text/csv"):
+        raw_rows = _parse_csv(_decode_csv(await request.body()))
+    else:
+        try:
+            raw_rows = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        if not isinstance(raw_rows, list):
+            raise HTTPException(status_code=400, detail="JSON array expected")
+
+    if len(raw_rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows (max {BULK_MAX_ROWS})")
+
+    return await _bulk_insert(db, raw_rows, actor.id, atomic)
+
+
+def _batch_conds(payload: ExpenseBatchIn, actor: Actor) -> list:
+    if (payload.ids is None) == (payload.filter is None):
+        raise HTTPException(status_code=400, detail="Pass either ids or filter")
+    if payload.ids is not None:
+        return expenses_by_ids(payload.ids)
+    f = payload.filter
+    # пустой фильтр задел бы все траты — так не бывает случайно правильно
+    if not (f.date_from or f.date_to or f.category_ids or f.payment_source):
+        raise HTTPException(status_code=400, detail="Filter must not be empty")
+    include_deleted = f.include_deleted or payload.op == "restore"
+    return _list_filters(
+        actor, f.date_from, f.date_to, f.category_ids, f.payment_source, include_deleted, f.include_children
+    )
+
+
+async def _batch_update(db: AsyncSession, conds: list, values: dict, old_col=None) -> list:
+    """
+    Один UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING: новые значения из expenses,
+    старое значение изменяемой колонки (old_value) — из подзапроса, для diff и роллапа.
+    """
+    cols = [Expense.id, Expense.spent_at]
+    if old_col is not None:
+        cols.append(old_col.label("old_value"))
+    target = select(*cols).where(*conds).with_for_update().limit(BATCH_MAX_ROWS + 1).subquery("target")
+
+    returning = [
+        Expense.id, Expense.amount_cents, Expense.payment_source,
+        Expense.category_id, Expense.spent_at, Expense.is_deleted,
+    ]
+    if old_col is not None:
+        returning.append(target.c.old_value)
+    stmt = (
+        update(Expense)
+        # по полному PK — каждая строка ищется в своей партиции
+        .where(Expense.id == target.c.id, Expense.spent_at == target.c.spent_at)
+        .values(values)
+        .returning(*returning)
+        .execution_options(synchronize_session=False)
+    )
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > BATCH_MAX_ROWS:
+        await db.rollback()
+        raise HTTPException(status_code=413, detail=f"Too many rows (max {BATCH_MAX_ROWS})")
+    return rows
+
+
+@router.post("/batch", response_model=ExpenseBatchResult)
+async def batch_expenses(
+    payload: ExpenseBatchIn,
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
+):
+    """
+    Массовые операции над тратами по списку id или фильтру: set_category, set_payment_source,
+    delete, restore. Один UPDATE ... RETURNING, одна многострочная вставка истории (diff — как у
+    одиночных эндпоинтов), роллап одним upsert, один commit.
+    Права те же: restore — только админ, правка удалённых трат — только админ.
+    Траты, которые уже в нужном состоянии, не трогаются и в историю не попадают.
+    """
+    if payload.op == "restore" and actor.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin only (set header X-Role: ADMIN)")
+
+    conds = _batch_conds(payload, actor)
+    delta = rollup.RollupDelta()
+    history_rows: list[dict] = []
+
+    if payload.op in ("set_category", "set_payment_source"):
+        if payload.op == "set_category":
+            if payload.category_id is None:
+                raise HTTPException(status_code=400, detail="category_id is required")
+            cat = await category_cache.get(db, payload.category_id)
+            if not cat:
+                raise HTTPException(status_code=404, detail="Category not found")
+            if not cat.is_active:
+                raise HTTPException(status_code=400, detail="Category is archived")
+            column, new_value = Expense.category_id, payload.category_id
+        else:
+            ps = (payload.payment_source or "").upper()
+            if ps not in ALLOWED_SOURCES:
+                raise HTTPException(status_code=400, detail="payment_source must be CASH|CARD|BANK")
+            column, new_value = Expense.payment_source, ps
+
+        if actor.role != UserRole.ADMIN and payload.ids is not None:
+            deleted = await db.scalar(
+                select(Expense.id).where(*expenses_by_ids(payload.ids), Expense.is_deleted == True).limit(1)  # noqa: E712
+            )
+            if deleted:
+                raise HTTPException(status_code=403, detail="Cannot edit deleted expense (admin only)")
+
+        rows = await _batch_update(db, [*conds, column != new_value], {column.key: new_value}, old_col=column)
+        for r in rows:
+            history_rows.append({
+                "id": uuid.uuid4(),
+                "expense_id": r.id,
+                "action": "UPDATE",
+                "diff_json": {column.key: {"old": _jsonable(r.old_value), "new": _jsonable(new_value)}},
+                "actor_id": actor.id,
+            })
+            if not r.is_deleted:
+                old_cat = r.old_value if column is Expense.category_id else r.category_id
+                old_ps = r.old_value if column is Expense.payment_source else r.payment_source
+                delta.add(r.spent_at, old_cat, old_ps, -1, r.amount_cents)
+                delta.add(r.spent_at, r.category_id, r.payment_source, 1, r.amount_cents)
+
+    elif payload.op == "delete":
+        rows = await _batch_update(
+            db,
+            [*conds, Expense.is_deleted == False],  # noqa: E712
+            {"is_deleted": True, "deleted_at": datetime.utcnow(), "deleted_by": actor.id},
+        )
+        for r in rows:
+            history_rows.append({
+                "id": uuid.uuid4(),
+                "expense_id": r.id,
+                "action": "DELETE",
+                "diff_json": {"is_deleted": {"old": False, "new": True}},
+                "actor_id": actor.id,
+            })
+            delta.add(r.spent_at, r.category_id, r.payment_source, -1, r.amount_cents)
+
+    else:  # restore
+        rows = await _batch_update(
+            db,
+            [*conds, Expense.is_deleted == True],  # noqa: E712
+            {"is_deleted": False, "deleted_at": None, "deleted_by": None},
+        )
+        for r in rows:
+            history_rows.append({
+                "id": uuid.uuid4(),
+                "expense_id": r.id,
+                "action": "RESTORE",
+                "diff_json": {"is_deleted": {"old": True, "new": False}},
+                "actor_id": actor.id,
+            })
+            delta.add(r.spent_at, r.category_id, r.payment_source, 1, r.amount_cents)
+
+    if rows:
+        await audit.add_history_rows(db, history_rows)
+        await delta.apply(db)
+    await audit.commit_with_history(db)
+    if rows:
+        await bump_after_commit(EXPENSES_VERSION)
+
+    return ExpenseBatchResult(op=payload.op, updated=len(rows), ids=[r.id for r in rows])
+
+
 @router.patch("/{expense_id}", response_model=ExpenseOut)
-def update_expense(
+async def update_expense(
     expense_id: uuid.UUID,
     payload: ExpenseUpdate,
-    db: Session = Depends(get_db),
-    actor: User = Depends(get_actor),
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
 ):
-    exp = db.query(Expense).filter(Expense.id == expense_id).first()
+    exp = await db.scalar(select(Expense).where(*expense_by_id(expense_id)).with_for_update())
     if not exp:
         raise HTTPException(status_code=404, detail="Expense not found")
 
@@ -181,7 +807,7 @@ def update_expense(
         update_data["payment_source"] = ps
 
     if payload.category_id is not None:
-        cat = db.query(Category).filter(Category.id == payload.category_id).first()
+        cat = await category_cache.get(db, payload.category_id)
         if not cat:
             raise HTTPException(status_code=404, detail="Category not found")
         if not cat.is_active:
@@ -196,24 +822,36 @@ def update_expense(
 
     diff = _make_diff(exp, update_data)
 
+    # роллап считает только живые траты и зависит от суммы/дня/категории/источника
+    rollup_changed = not exp.is_deleted and bool(
+        diff.keys() & {"amount_cents", "payment_source", "category_id", "spent_at"}
+    )
+    if rollup_changed:
+        await rollup.remove_expense(db, exp)
+
     for k, v in update_data.items():
         setattr(exp, k, v)
 
+    if rollup_changed:
+        await rollup.add_expense(db, exp)
+
     if diff:
         _write_history(db, exp.id, "UPDATE", diff, actor.id)
 
-    db.commit()
-    db.refresh(exp)
+    await audit.commit_with_history(db)
+    if diff:
+        await bump_after_commit(EXPENSES_VERSION)
+    await db.refresh(exp)
     return exp
 
 
 @router.post("/{expense_id}/delete", response_model=ExpenseOut)
-def soft_delete_expense(
+async def soft_delete_expense(
     expense_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    actor: User = Depends(get_actor),
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
 ):
-    exp = db.query(Expense).filter(Expense.id == expense_id).first()
+    exp = await db.scalar(select(Expense).where(*expense_by_id(expense_id)).with_for_update())
     if not exp:
         raise HTTPException(status_code=404, detail="Expense not found")
 
@@ -221,6 +859,7 @@ def soft_delete_expense(
         exp.is_deleted = True
         exp.deleted_at = datetime.utcnow()
         exp.deleted_by = actor.id
+        await rollup.remove_expense(db, exp)
 
         _write_history(
             db,
@@ -230,19 +869,20 @@ def soft_delete_expense(
             actor.id,
         )
 
-        db.commit()
-        db.refresh(exp)
+        await audit.commit_with_history(db)
+        await bump_after_commit(EXPENSES_VERSION)
+        await db.refresh(exp)
 
     return exp
 
 
 @router.post("/{expense_id}/restore", response_model=ExpenseOut)
-def restore_expense(
+async def restore_expense(
     expense_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin_role),
+    db: AsyncSession = Depends(get_db),
+    admin: Actor = Depends(require_admin_role),
 ):
-    exp = db.query(Expense).filter(Expense.id == expense_id).first()
+    exp = await db.scalar(select(Expense).where(*expense_by_id(expense_id)).with_for_update())
     if not exp:
         raise HTTPException(status_code=404, detail="Expense not found")
 
@@ -250,6 +890,7 @@ def restore_expense(
         exp.is_deleted = False
         exp.deleted_at = None
         exp.deleted_by = None
+        await rollup.add_expense(db, exp)
 
         _write_history(
             db,
@@ -259,22 +900,46 @@ def restore_expense(
             admin.id,
         )
 
-        db.commit()
-        db.refresh(exp)
+        await audit.commit_with_history(db)
+        await bump_after_commit(EXPENSES_VERSION)
+        await db.refresh(exp)
 
     return exp
 
 
-@router.get("/{expense_id}/history", response_model=list[ExpenseHistoryOut])
-def get_expense_history(
+@router.get("/{expense_id}", response_model=ExpenseOut)
+async def get_expense(
     expense_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin_role),
+    as_of: datetime | None = Query(default=None),
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
 ):
-    rows = db.execute(
-        select(ExpenseHistory)
-        .where(ExpenseHistory.expense_id == expense_id)
-        .order_by(ExpenseHistory.created_at.desc())
-    ).scalars().all()
+    """Одна трата; с as_of — в состоянии на указанный момент (только админ)."""
+    if as_of:
+        if actor.role != UserRole.ADMIN:
+            raise HTTPException(status_code=403, detail="Admin only for as_of")
+        rows = await snapshots.expenses_as_of(db, snapshots.parse_ts(as_of), [expense_id])
+        if not rows:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        return rows[0]
+
+    exp = await db.scalar(select(Expense).where(*expense_by_id(expense_id)))
+    if not exp or (exp.is_deleted and actor.role != UserRole.ADMIN):
+        raise HTTPException(status_code=404, detail="Expense not found")
+    return exp
 
-    return rows
+
+@router.get("/{expense_id}/history", response_model=list[ExpenseHistoryOut])
+async def get_expense_history(
+    response: Response,
+    expense_id: uuid.UUID,
+    limit: int = Query(default=PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = Query(default=None),
+    db: AsyncSession = Depends(get_read_db),
+    admin: Actor = Depends(require_admin_role),
+):
+    # keyset по (created_at, id), индекс ix_expense_history_expense_created; плюс ещё не перенесённое из outbox
+    h = audit.HISTORY
+    q = select(h).where(h.c.expense_id == expense_id)
+    rows = await keyset_page(db, q, h.c.created_at, h.c.id, limit, cursor, response, as_rows=True)
+    return [r._asdict() for r in rows]
@@ -1,7 +1,14 @@
 from fastapi import APIRouter
 
+from app.core.audit import audit_writer
+
 router = APIRouter()
 
 @router.get("/health")
-def health():
+async def health():
     return {"ok": True}
+
+@router.get("/health/audit")
+async def health_audit():
+    # счётчики группового писателя истории (batched-режим)
+    return audit_writer.stats()
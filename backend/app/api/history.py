@@ -0,0 +1,58 @@
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_read_db
+from app.core.actor import Actor, require_admin_role
+from app.core.pagination import keyset_page
+from app.core import audit
+from app.schemas.expense_history import ExpenseHistoryOut
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+ALLOWED_ACTIONS = {"CREATE", "UPDATE", "DELETE", "RESTORE"}
+
+PAGE_SIZE_DEFAULT = 200
+PAGE_SIZE_MAX = 1000
+
+
+@router.get("", response_model=list[ExpenseHistoryOut])
+async def list_history(
+    response: Response,
+    actor_id: uuid.UUID | None = Query(default=None),
+    action: list[str] | None = Query(default=None),
+    expense_id: uuid.UUID | None = Query(default=None),
+    created_from: datetime | None = Query(default=None),
+    created_to: datetime | None = Query(default=None),
+    limit: int = Query(default=PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = Query(default=None),
+    db: AsyncSession = Depends(get_read_db),
+    admin: Actor = Depends(require_admin_role),
+):
+    """
+    Общая лента изменений по всем тратам (только админ), от новых к старым.
+    Keyset по (created_at, id); курсор следующей страницы — в X-Next-Cursor.
+    """
+    # expense_history + ещё не перенесённое из outbox (batched-режим)
+    h = audit.HISTORY
+    q = select(h)
+
+    if actor_id:
+        q = q.where(h.c.actor_id == actor_id)
+    if expense_id:
+        q = q.where(h.c.expense_id == expense_id)
+    if action:
+        actions = {a.upper() for a in action}
+        if not actions <= ALLOWED_ACTIONS:
+            raise HTTPException(status_code=400, detail="action must be CREATE|UPDATE|DELETE|RESTORE")
+        q = q.where(h.c.action.in_(actions))
+    if created_from:
+        q = q.where(h.c.created_at >= created_from)
+    if created_to:
+        q = q.where(h.c.created_at <= created_to)
+
+    rows = await keyset_page(db, q, h.c.created_at, h.c.id, limit, cursor, response, as_rows=True)
+    return [r._asdict() for r in rows]
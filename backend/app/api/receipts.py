@@ -1,31 +1,46 @@
+import mimetypes
 import os
+import time
 import uuid
 from pathlib import Path
-from datetime import datetime
+from typing import Literal
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response, UploadFile, File
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.db import get_db
-from app.core.actor import get_actor
+from app.core.actor import Actor, get_actor, get_actor_url_token
+from app.core import receipt_store, receipt_derivatives
+from app.core.conditional import etag_matches
+from app.core.partitions import expense_by_id
+from app.core.versions import EXPENSES_VERSION, bump_after_commit
+from app.core.metrics import RECEIPT_UPLOAD_BYTES, RECEIPT_UPLOAD_DURATION
 from app.models.expense import Expense
-from app.models.user import User, UserRole
+from app.models.user import UserRole
 
 router = APIRouter(prefix="/expenses", tags=["receipts"])
+# отдача файлов чеков (оригинал или ?size=thumb|preview)
+files_router = APIRouter(prefix="/receipts", tags=["receipts"])
 
-def _receipts_dir() -> Path:
-  p = Path(os.getenv("RECEIPTS_DIR", "/data/receipts"))
-  p.mkdir(parents=True, exist_ok=True)
-  return p
+# служебные папки внутри RECEIPTS_DIR — наружу не отдаём
+_PRIVATE_DIRS = {"tmp", receipt_derivatives.DERIVED_DIR}
+
+# private: видимость зависит от роли (удалённые траты)
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
 
 @router.post("/{expense_id}/receipt")
 async def upload_receipt(
     expense_id: uuid.UUID,
+    background: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    actor: User = Depends(get_actor),
+    db: AsyncSession = Depends(get_db),
+    actor: Actor = Depends(get_actor),
 ):
-    exp = db.query(Expense).filter(Expense.id == expense_id).first()
+    exp = await db.scalar(select(Expense).where(*expense_by_id(expense_id)))
     if not exp:
         raise HTTPException(status_code=404, detail="Expense not found")
 
@@ -43,25 +58,127 @@ async def upload_receipt(
         # если расширение странное — подставим по content-type
         ext = ".pdf" if ct == "application/pdf" else ".jpg"
 
-    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    name = f"{expense_id}_{ts}_{uuid.uuid4().hex}{ext}"
-    out_path = _receipts_dir() / name
+    # не держим транзакцию открытой, пока качается файл
+    await db.commit()
 
-    # сохранить файл
-    with out_path.open("wb") as f:
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
-            f.write(chunk)
+    # файл по содержимому: ab/cd/<sha256>.ext (одинаковые чеки хранятся один раз)
+    t0 = time.perf_counter()
+    name, size = await receipt_store.save_upload(db, file, ext)
+    RECEIPT_UPLOAD_DURATION.observe(time.perf_counter() - t0)
+    RECEIPT_UPLOAD_BYTES.observe(size)
 
-    # сохранить относительный путь (чтобы на VPS было переносимо)
+    # сохранить относительный путь (чтобы на VPS было переносимо);
+    # перечитываем строку под блокировкой — старый путь нужен актуальный
+    await db.refresh(exp, with_for_update=True)
+    old_name = exp.receipt_path
     exp.receipt_path = name
-    db.commit()
-    db.refresh(exp)
+    await db.commit()
+    await bump_after_commit(EXPENSES_VERSION)
+    await db.refresh(exp)
+
+    # старый файл удаляем, только если на него больше никто не ссылается
+    if old_name and old_name != name:
+        await receipt_store.release(db, old_name)
+
+    # превью/миниатюры — в фоне, после ответа (промах догенерится при запросе)
+    background.add_task(receipt_derivatives.generate_all, name)
 
     return {
         "expense_id": str(expense_id),
         "receipt_path": name,
         "url": f"/receipts/{name}",
     }
+
+
+def _original_path(name: str) -> Path:
+    root = receipt_store.receipts_dir().resolve()
+    p = (root / name).resolve()
+    if not p.is_relative_to(root) or p == root or p.relative_to(root).parts[0] in _PRIVATE_DIRS:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return p
+
+
+def _etag(name: str, size: str | None) -> str:
+    # имя уникально и содержимое под ним не меняется (для новых — это и есть sha256),
+    # поэтому ETag строгий и считается без чтения файла
+    base = Path(name).stem
+    return f'"{base}-{size}"' if size else f'"{base}"'
+
+
+class ReceiptFileResponse(FileResponse):
+    """
+    FileResponse (Range/If-Range и pathsend, если сервер его умеет) +
+    строгий ETag и бессрочный кеш. Если настроен RECEIPTS_ACCEL_REDIRECT_PREFIX,
+    тело не отдаём сами — nginx отдаёт файл через X-Accel-Redirect (sendfile).
+    """
+
+    def __init__(self, path: Path, etag: str, **kwargs) -> None:
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE,
+        }
+        self.etag = etag
+        super().__init__(path, headers=headers, **kwargs)
+
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:
+        # Starlette сверяет If-Range со своим md5(mtime-size), а наружу уходит наш ETag;
+        # сравнение строгое (RFC 9110 13.1.5), дата Last-Modified — как в базовом классе
+        return http_if_range == self.etag or super()._should_use_range(http_if_range, stat_result)
+
+
+def _accel_redirect(path: Path, etag: str, media_type: str | None) -> Response:
+    rel = path.relative_to(receipt_store.receipts_dir().resolve()).as_posix()
+    prefix = settings.receipts_accel_redirect_prefix.rstrip("/")
+    headers = {
+        "X-Accel-Redirect": f"{prefix}/{quote(rel)}",
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE,
+    }
+    return Response(status_code=200, headers=headers, media_type=media_type)
+
+
+async def _check_visible(db: AsyncSession, actor: Actor, name: str) -> None:
+    """Те же правила, что в API: удалённые траты (и их чеки) видит только админ."""
+    q = select(Expense.id).where(Expense.receipt_path == name)
+    if actor.role != UserRole.ADMIN:
+        q = q.where(Expense.is_deleted == False)  # noqa: E712
+    if await db.scalar(q.limit(1)) is None:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+
+
+@files_router.get("/{name:path}")
+async def get_receipt(
+    name: str,
+    size: Literal["thumb", "preview"] | None = Query(default=None),
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+    # ссылка из <img>/<a> — токен в ?token=
+    actor: Actor = Depends(get_actor_url_token),
+):
+    path = _original_path(name)
+    await _check_visible(db, actor, name)
+
+    etag = _etag(name, size)
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": IMMUTABLE_CACHE},
+        )
+
+    if size:
+        try:
+            derived = await receipt_derivatives.get_derivative(name, size)
+        except receipt_derivatives.UnsupportedReceipt:
+            # оригинал по-прежнему доступен без ?size=
+            raise HTTPException(status_code=415, detail="Receipt preview is not available for this file")
+        if derived is None:
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        path, media_type = derived.resolve(), "image/webp"
+    else:
+        if not path.is_file():
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        media_type = None
+
+    if settings.receipts_accel_redirect_prefix:
+        return _accel_redirect(path, etag, media_type or mimetypes.guess_type(path.name)[0])
+    return ReceiptFileResponse(path, etag, media_type=media_type)
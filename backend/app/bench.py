@@ -0,0 +1,292 @@
+"""
+Нагрузочные замеры API по сценариям: пропускная способность и перцентили задержки.
+Запускать против стенда с данными из app.gen_data (сценарии записи создают/меняют траты).
+
+    python -m app.bench --base-url http://localhost:8000 --duration 20 --concurrency 8 --out bench/baseline.json
+    python -m app.bench ... --compare bench/baseline.json   # код выхода 1, если p95 вырос больше --max-regression
+
+Сценарии выполняются по очереди: прогрев --warmup секунд, затем --duration секунд замера.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+from PIL import Image
+
+SEARCH_WORDS = ["смеситель", "полотенца", "доставка", "кофе", "ремонт", "бензин", "Метро"]
+
+
+class Context:
+    """Что нужно сценариям: токен, категории, id существующих трат, курсор второй страницы."""
+
+    def __init__(self) -> None:
+        self.rng = random.Random(1)
+        self.leaf_ids: list[str] = []
+        self.root_ids: list[str] = []
+        self.expense_ids: list[str] = []
+        self.cursor: str | None = None
+        self.first_day = date.today() - timedelta(days=365)
+        self.last_day = date.today()
+        self.images: list[bytes] = []
+
+    def window(self, days: int) -> tuple[str, str]:
+        span = max((self.last_day - self.first_day).days - days, 1)
+        d0 = self.first_day + timedelta(days=self.rng.randrange(span))
+        return d0.isoformat(), (d0 + timedelta(days=days)).isoformat()
+
+
+def _png(rng: random.Random, px: int = 400) -> bytes:
+    # шум плохо сжимается — размер файла ближе к фото чека
+    img = Image.frombytes("RGB", (px, px), rng.randbytes(px * px * 3))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+async def prepare(client: httpx.AsyncClient, email: str, password: str, images: int) -> Context:
+    ctx = Context()
+    r = await client.post("/auth/login", json={"email": email, "password": password})
+    r.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+
+    cats = (await client.get("/categories")).json()
+    parents = {c["parent_id"] for c in cats if c["parent_id"]}
+    ctx.leaf_ids = [c["id"] for c in cats if c["id"] not in parents]
+    ctx.root_ids = [c["id"] for c in cats if c["parent_id"] is None and c["id"] in parents]
+    if not ctx.leaf_ids:
+        raise SystemExit("Нет категорий — сначала python -m app.gen_data")
+
+    r = await client.get("/expenses", params={"limit": 1000})
+    r.raise_for_status()
+    rows = r.json()
+    ctx.expense_ids = [e["id"] for e in rows]
+    ctx.cursor = r.headers.get("X-Next-Cursor")
+    if rows:
+        ctx.last_day = datetime.fromisoformat(rows[0]["spent_at"]).date()
+        ctx.first_day = ctx.last_day - timedelta(days=365)
+    ctx.images = [_png(ctx.rng) for _ in range(images)]
+    return ctx
+
+
+# --- сценарии: (client, ctx) -> response ---
+
+async def list_default(c, ctx):
+    return await c.get("/expenses", params={"limit": 200})
+
+
+async def list_page2(c, ctx):
+    return await c.get("/expenses", params={"limit": 200, "cursor": ctx.cursor or ""})
+
+
+async def list_category(c, ctx):
+    return await c.get("/expenses", params={"limit": 200, "category_ids": ctx.rng.choice(ctx.leaf_ids)})
+
+
+async def list_subtree(c, ctx):
+    root = ctx.rng.choice(ctx.root_ids or ctx.leaf_ids)
+    return await c.get("/expenses", params={"limit": 200, "category_ids": root, "include_children": "true"})
+
+
+async def list_dates_source(c, ctx):
+    d0, d1 = ctx.window(30)
+    return await c.get("/expenses", params={"limit": 200, "date_from": d0, "date_to": d1, "payment_source": "CARD"})
+
+
+async def list_search(c, ctx):
+    return await c.get("/expenses", params={"limit": 50, "q": ctx.rng.choice(SEARCH_WORDS)})
+
+
+async def create_expense(c, ctx):
+    return await c.post("/expenses", json={
+        "amount_cents": ctx.rng.randint(1, 5000) * 100,
+        "payment_source": ctx.rng.choice(["CASH", "CARD", "BANK"]),
+        "category_id": ctx.rng.choice(ctx.leaf_ids),
+        "comment": f"bench {ctx.rng.choice(SEARCH_WORDS)}",
+    })
+
+
+async def update_expense(c, ctx):
+    eid = ctx.rng.choice(ctx.expense_ids)
+    return await c.patch(f"/expenses/{eid}", json={"amount_cents": ctx.rng.randint(1, 5000) * 100})
+
+
+async def expense_history(c, ctx):
+    return await c.get(f"/expenses/{ctx.rng.choice(ctx.expense_ids)}/history")
+
+
+async def history_feed(c, ctx):
+    return await c.get("/history", params={"limit": 100})
+
+
+async def dashboard(c, ctx):
+    d0, d1 = ctx.window(90)
+    return await c.get("/dashboard", params={"date_from": d0, "date_to": d1})
+
+
+async def receipt_upload(c, ctx):
+    eid = ctx.rng.choice(ctx.expense_ids)
+    img = ctx.rng.choice(ctx.images)
+    return await c.post(f"/expenses/{eid}/receipt", files={"file": ("bench.png", img, "image/png")})
+
+
+SCENARIOS = {
+    f.__name__: f
+    for f in (
+        list_default, list_page2, list_category, list_subtree, list_dates_source, list_search,
+        create_expense, update_expense, expense_history, history_feed, dashboard, receipt_upload,
+    )
+}
+
+
+def _percentile(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+async def run_scenario(client, ctx, fn, concurrency: int, warmup: float, duration: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    statuses: dict[int, int] = {}
+
+    async def worker(until: float, record: bool) -> None:
+        nonlocal errors
+        while time.perf_counter() < until:
+            t0 = time.perf_counter()
+            try:
+                r = await fn(client, ctx)
+                ok = r.status_code < 400
+                code = r.status_code
+            except httpx.HTTPError:
+                ok, code = False, 0
+            elapsed = time.perf_counter() - t0
+            if record:
+                latencies.append(elapsed)
+                statuses[code] = statuses.get(code, 0) + 1
+                if not ok:
+                    errors += 1
+
+    if warmup > 0:
+        until = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(until, False) for _ in range(concurrency)))
+
+    t_start = time.perf_counter()
+    until = t_start + duration
+    await asyncio.gather(*(worker(until, True) for _ in range(concurrency)))
+    wall = time.perf_counter() - t_start
+
+    lat = sorted(latencies)
+    ms = lambda v: round(v * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "rps": round(len(lat) / wall, 1) if wall else 0,
+        "p50_ms": ms(_percentile(lat, 50)),
+        "p90_ms": ms(_percentile(lat, 90)),
+        "p95_ms": ms(_percentile(lat, 95)),
+        "p99_ms": ms(_percentile(lat, 99)),
+        "max_ms": ms(lat[-1]) if lat else 0,
+        "mean_ms": ms(sum(lat) / len(lat)) if lat else 0,
+    }
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """Печатает сравнение с базовым прогоном; False — если где-то p95 хуже порога."""
+    ok = True
+    print(f"\n{'scenario':<20} {'p95 base':>10} {'p95 now':>10} {'Δ':>8} {'rps base':>10} {'rps now':>10}")
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            print(f"{name:<20} {'—':>10} {cur['p95_ms']:>10} {'new':>8}")
+            continue
+        delta = (cur["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        flag = ""
+        if delta > max_regression:
+            ok = False
+            flag = "  REGRESSION"
+        print(
+            f"{name:<20} {base['p95_ms']:>10} {cur['p95_ms']:>10} {delta:>+8.0%} "
+            f"{base['rps']:>10} {cur['rps']:>10}{flag}"
+        )
+    return ok
+
+
+async def main(args) -> int:
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(unknown)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        ctx = await prepare(client, args.email, args.password, images=16)
+        result = {
+            "meta": {
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "git_rev": _git_rev(),
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "duration_sec": args.duration,
+                "warmup_sec": args.warmup,
+                "python": platform.python_version(),
+                "host": platform.node(),
+            },
+            "scenarios": {},
+        }
+        print(f"{'scenario':<20} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for name in names:
+            s = await run_scenario(client, ctx, SCENARIOS[name], args.concurrency, args.warmup, args.duration)
+            result["scenarios"][name] = s
+            print(
+                f"{name:<20} {s['requests']:>7} {s['errors']:>5} {s['rps']:>8} "
+                f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} {s['max_ms']:>8}",
+                flush=True,
+            )
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nSaved: {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочные замеры API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="admin@shurale.local")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=15, help="секунд замера на сценарий")
+    parser.add_argument("--warmup", type=float, default=3, help="секунд прогрева на сценарий (не считаются)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--only", help="сценарии через запятую: " + ",".join(SCENARIOS))
+    parser.add_argument("--out", help="куда сохранить JSON с результатами")
+    parser.add_argument("--compare", help="JSON базового прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="допустимый рост p95 (0.2 = +20%%)")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
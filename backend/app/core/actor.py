@@ -1,33 +1,156 @@
-from fastapi import Depends, Header, HTTPException
-from sqlalchemy.orm import Session
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 
+from fastapi import Depends, Header, HTTPException, Query
+from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
 from app.core.db import get_db
 from app.models.user import User, UserRole
 
+JWT_ALGORITHM = "HS256"
+
+
+@dataclass(frozen=True)
+class Actor:
+    """Кто делает запрос. Берётся из JWT, без похода в БД."""
+    id: uuid.UUID
+    role: UserRole
+
+
+class _UserCache:
+    """
+    Маленький LRU с TTL для сид-пользователей входа по X-Role.
+    Свой на каждый процесс; TTL ограничивает, насколько устаревшими могут быть данные.
+    """
+
+    def __init__(self, maxsize: int, ttl_sec: float) -> None:
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_user_cache = _UserCache(maxsize=settings.user_cache_size, ttl_sec=settings.user_cache_ttl_sec)
+
+
+async def _load_user(db: AsyncSession, key, where) -> User | None:
+    user = _user_cache.get(key)
+    if user is None:
+        user = await db.scalar(select(User).where(where))
+        if user is not None:
+            # отвязываем от сессии, чтобы объект можно было отдавать в другие запросы
+            db.expunge(user)
+            _user_cache.put(key, user)
+    return user
+
 
-def get_actor(
-    db: Session = Depends(get_db),
+def create_access_token(user: User) -> tuple[str, int]:
+    expires_in = settings.jwt_expires_min * 60
+    payload = {
+        "sub": str(user.id),
+        "role": user.role.value,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+    }
+    return jwt.encode(payload, settings.jwt_secret, algorithm=JWT_ALGORITHM), expires_in
+
+
+def _actor_from_token(token: str) -> Actor:
+    try:
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=[JWT_ALGORITHM])
+        return Actor(id=uuid.UUID(payload["sub"]), role=UserRole(payload["role"]))
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def get_actor(
+    db: AsyncSession = Depends(get_db),
+    authorization: str | None = Header(default=None),
     x_role: str | None = Header(default=None, alias="X-Role"),
-) -> User:
+) -> Actor:
     """
-    Временная логика актёра (пока без настоящей авторизации):
+    Authorization: Bearer <jwt> -> актёр из токена (подпись + срок, БД не трогаем).
+
+    Только для разработки/тестов (AUTH_ALLOW_ROLE_HEADER=true, по умолчанию выключено), если токена нет:
     - X-Role: ADMIN -> admin@shurale.local
     - иначе -> manager@shurale.local
+    Сид-пользователи кешируются, так что и здесь запрос в БД не на каждый вызов.
     """
+    if authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=401, detail="Bearer token expected")
+        return _actor_from_token(token)
+
+    if not settings.auth_allow_role_header:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
     email = "admin@shurale.local" if x_role == "ADMIN" else "manager@shurale.local"
 
-    user = db.query(User).filter(User.email == email).first()
+    user = await _load_user(db, ("email", email), User.email == email)
     if not user:
         raise HTTPException(
             status_code=500,
             detail=f"Seed users not found. Run: python -m app.seed (missing {email})",
         )
-    return user
+    return Actor(id=user.id, role=user.role)
+
+
+async def get_actor_url_token(
+    token: str | None = Query(default=None),
+    db: AsyncSession = Depends(get_db),
+    authorization: str | None = Header(default=None),
+    x_role: str | None = Header(default=None, alias="X-Role"),
+) -> Actor:
+    """
+    Для запросов, которые браузер делает сам (EventSource, <img src>, <a href>) и заголовок
+    Authorization поставить не может: токен можно передать в ?token=. Заголовок важнее.
+    """
+    if token and not authorization:
+        return _actor_from_token(token)
+    return await get_actor(db, authorization, x_role)
 
 
-def require_admin_role(
-    actor: User = Depends(get_actor),
-) -> User:
+async def require_admin_role(
+    actor: Actor = Depends(get_actor),
+) -> Actor:
     if actor.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin only (set header X-Role: ADMIN)")
     return actor
@@ -1,5 +1,8 @@
-from fastapi import Header, HTTPException
+from fastapi import Depends, HTTPException
 
-def require_admin(x_role: str | None = Header(default=None, alias="X-Role")) -> None:
-    if x_role != "ADMIN":
+from app.core.actor import Actor, get_actor
+from app.models.user import UserRole
+
+async def require_admin(actor: Actor = Depends(get_actor)) -> None:
+    if actor.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin only. Set header X-Role: ADMIN")
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import events
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import AUDIT_OUTBOX_BACKLOG, AUDIT_OUTBOX_ERRORS, AUDIT_OUTBOX_FLUSH, AUDIT_OUTBOX_ROWS
+from app.models.expense_history import ExpenseHistory
+from app.models.expense_history_outbox import ExpenseHistoryOutbox
+
+log = logging.getLogger(__name__)
+
+EVENTS_KEY = "events_pending"
+# строк истории в одном executemany (импорт, массовые операции)
+HISTORY_CHUNK = 5000
+# страховочный проход: строки, оставшиеся после падения процесса или записанные другим воркером
+SWEEP_INTERVAL_SEC = 5.0
+
+# перенос пачки outbox -> expense_history одним запросом; SKIP LOCKED — воркеры не мешают друг другу
+_MOVE_BATCH = text("""
+    WITH batch AS (
+        DELETE FROM expense_history_outbox
+        WHERE seq IN (
+            SELECT seq FROM expense_history_outbox ORDER BY seq LIMIT :n FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, expense_id, action, diff_json, actor_id, created_at
+    )
+    INSERT INTO expense_history (id, expense_id, action, diff_json, actor_id, created_at)
+    SELECT id, expense_id, action, diff_json, actor_id, created_at FROM batch
+""")
+
+
+def _history_select(model):
+    return select(model.id, model.expense_id, model.action, model.diff_json, model.actor_id, model.created_at)
+
+
+# вся история для чтения: expense_history + ещё не перенесённые строки outbox. Перенос — одна транзакция,
+# поэтому строка видна ровно в одной из таблиц. Условия на колонки Postgres опускает в обе ветки
+# (индексы и отсечение партиций expense_history работают); outbox маленький.
+HISTORY = union_all(_history_select(ExpenseHistory), _history_select(ExpenseHistoryOutbox)).subquery("history")
+
+
+class AuditWriter:
+    """
+    Групповой перенос истории из outbox (AUDIT_WRITER_MODE=batched).
+
+    Запрос пишет строку в expense_history_outbox в транзакции траты (атомарно с изменением,
+    без индексов expense_history) и не ждёт дальнейшего. Писатель после commit'ов собирает
+    пачку (до AUDIT_BATCH_MAX_ROWS строк, ожидание AUDIT_BATCH_MAX_WAIT_MS) и переносит её
+    в expense_history одним INSERT ... SELECT в своей транзакции.
+    """
+
+    def __init__(self, max_rows: int, max_wait_ms: int) -> None:
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self._wake: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        self._stats = {"batches": 0, "rows": 0, "max_batch": 0, "flush_ms_total": 0.0, "errors": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        # дописываем всё, что уже в outbox
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    def notify(self) -> None:
+        """После commit с новыми строками outbox — разбудить писателя (не ждём его)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), SWEEP_INTERVAL_SEC)
+                # копим пачку от параллельных запросов
+                if not self._stopping:
+                    await asyncio.sleep(self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._drain()
+        await self._drain()
+
+    async def _drain(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    n = (await db.execute(_MOVE_BATCH, {"n": self.max_rows})).rowcount
+                    await db.commit()
+            except Exception:  # noqa: BLE001 — строки остаются в outbox, повторим на следующем проходе
+                self._stats["errors"] += 1
+                AUDIT_OUTBOX_ERRORS.inc()
+                log.warning("audit outbox flush failed", exc_info=True)
+                return
+            if n:
+                elapsed = time.perf_counter() - t0
+                self._stats["batches"] += 1
+                self._stats["rows"] += n
+                self._stats["max_batch"] = max(self._stats["max_batch"], n)
+                self._stats["flush_ms_total"] += elapsed * 1000
+                AUDIT_OUTBOX_ROWS.inc(n)
+                AUDIT_OUTBOX_FLUSH.observe(elapsed)
+            if n < self.max_rows:
+                await self._update_backlog()
+                return
+
+    async def _update_backlog(self) -> None:
+        # outbox без индексов, но после переноса в нём почти ничего нет — count дешёвый
+        try:
+            async with AsyncSessionLocal() as db:
+                AUDIT_OUTBOX_BACKLOG.set(await db.scalar(select(func.count()).select_from(ExpenseHistoryOutbox)))
+        except Exception:  # noqa: BLE001
+            log.warning("audit outbox backlog check failed", exc_info=True)
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        s["avg_batch"] = round(s["rows"] / s["batches"], 2) if s["batches"] else 0
+        s["avg_flush_ms"] = round(s["flush_ms_total"] / s["batches"], 3) if s["batches"] else 0
+        s["mode"] = settings.audit_writer_mode
+        return s
+
+
+audit_writer = AuditWriter(settings.audit_batch_max_rows, settings.audit_batch_max_wait_ms)
+
+
+def _history_model():
+    return ExpenseHistoryOutbox if settings.audit_writer_mode == "batched" else ExpenseHistory
+
+
+def add_history(
+    db: AsyncSession,
+    expense_id: uuid.UUID,
+    action: str,
+    diff: dict,
+    actor_id: uuid.UUID,
+) -> None:
+    """Строка истории в транзакции траты: inline — сразу в expense_history, batched — в outbox."""
+    db.add(_history_model()(
+        expense_id=expense_id,
+        action=action,
+        diff_json=diff or {},
+        actor_id=actor_id,
+    ))
+    # событие для /events — NOTIFY в той же транзакции (commit_with_history)
+    db.info.setdefault(EVENTS_KEY, []).append({
+        "expense_id": expense_id,
+        "action": action,
+        "diff_json": diff or {},
+        "actor_id": actor_id,
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+async def add_history_rows(db: AsyncSession, rows: list[dict]) -> None:
+    """
+    Много строк истории (импорт, массовые операции) — тем же путём, что add_history:
+    executemany пачками в expense_history или outbox, события — в commit_with_history.
+    """
+    model = _history_model()
+    for start in range(0, len(rows), HISTORY_CHUNK):
+        await db.execute(insert(model), rows[start:start + HISTORY_CHUNK])
+    db.info.setdefault(EVENTS_KEY, []).extend(rows)
+
+
+async def commit_with_history(db: AsyncSession) -> None:
+    """commit изменения вместе с историей; в batched-режиме — разбудить перенос из outbox."""
+    pending = db.info.pop(EVENTS_KEY, None)
+    await events.publish(db, pending or [])
+    await db.commit()
+    if pending and settings.audit_writer_mode == "batched":
+        audit_writer.notify()
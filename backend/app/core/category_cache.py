@@ -0,0 +1,69 @@
+import asyncio
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.versions import get_version, bump_version
+from app.models.category import Category
+from app.schemas.category import CategoryOut
+
+VERSION_KEY = "categories"
+
+
+class _CategoryCache:
+    """
+    Справочник категорий в памяти процесса.
+    Актуальность — по счётчику cache_versions["categories"]: один лёгкий запрос
+    на обращение, перечитываем таблицу только если версия сменилась.
+    Работает и с несколькими воркерами: версия общая, в БД.
+    """
+
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self._version: int | None = None
+        self._by_id: dict[uuid.UUID, CategoryOut] = {}
+        self._by_name: dict[str, CategoryOut] = {}
+        self._sorted: list[CategoryOut] = []
+
+    async def _ensure_fresh(self, db: AsyncSession) -> None:
+        # сначала версия, потом данные: если между ними кто-то закоммитит,
+        # в худшем случае перечитаем ещё раз, но устаревшее под новой версией не сохраним
+        # версия только растёт: более старая (отстающая реплика) кеш не откатывает
+        version = await get_version(db, VERSION_KEY)
+        if self._version is not None and version <= self._version:
+            return
+        async with self._lock:
+            if self._version is not None and version <= self._version:
+                return
+            rows = (await db.execute(select(Category))).scalars().all()
+            items = [CategoryOut.model_validate(c, from_attributes=True) for c in rows]
+            # Сортировка: сначала родители, потом дети, потом по имени
+            items.sort(key=lambda c: (c.parent_id is not None, str(c.parent_id or ""), c.name))
+            self._by_id = {c.id: c for c in items}
+            self._by_name = {c.name: c for c in items}
+            self._sorted = items
+            self._version = version
+
+    async def get(self, db: AsyncSession, category_id: uuid.UUID) -> CategoryOut | None:
+        await self._ensure_fresh(db)
+        return self._by_id.get(category_id)
+
+    async def snapshot(self, db: AsyncSession) -> tuple[dict[uuid.UUID, CategoryOut], dict[str, CategoryOut]]:
+        """Словари (по id, по имени) на момент вызова — для пачек, одна сверка версии."""
+        await self._ensure_fresh(db)
+        return self._by_id, self._by_name
+
+    async def list(self, db: AsyncSession, active_only: bool) -> list[CategoryOut]:
+        await self._ensure_fresh(db)
+        if active_only:
+            return [c for c in self._sorted if c.is_active]
+        return list(self._sorted)
+
+
+category_cache = _CategoryCache()
+
+
+async def invalidate_categories(db: AsyncSession) -> None:
+    """Вызывать в каждой мутации категорий, до commit."""
+    await bump_version(db, VERSION_KEY)
@@ -0,0 +1,26 @@
+import uuid
+
+from sqlalchemy import select
+
+from app.models.category import Category
+
+
+def closure_cte(roots: list[uuid.UUID] | None = None):
+    """
+    Рекурсивный CTE (ancestor_id, descendant_id): каждая категория — предок самой себя
+    и всех своих потомков на любой глубине. UNION (без ALL) — чтобы случайный цикл
+    в parent_id не зациклил запрос.
+    roots — ограничить предков этими категориями (для фильтра по поддереву).
+    """
+    base = select(Category.id.label("ancestor_id"), Category.id.label("descendant_id"))
+    if roots is not None:
+        base = base.where(Category.id.in_(roots))
+    closure = base.cte("category_closure", recursive=True)
+    step = select(closure.c.ancestor_id, Category.id).where(Category.parent_id == closure.c.descendant_id)
+    return closure.union(step)
+
+
+def subtree_ids(roots: list[uuid.UUID]):
+    """SELECT id всех категорий в поддеревьях roots (включая сами roots)."""
+    closure = closure_cte(roots)
+    return select(closure.c.descendant_id)
@@ -0,0 +1,33 @@
+import hashlib
+
+from fastapi import Request, Response
+
+# браузер хранит ответ, но каждый раз переспрашивает с If-None-Match
+REVALIDATE_CACHE = "private, no-cache"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+
+
+def list_etag(request: Request, *parts) -> str:
+    """
+    ETag списка: версии данных (cache_versions) + всё, от чего зависит ответ, —
+    параметры запроса (фильтры, курсор, limit) и то, что передал эндпоинт (роль и т.п.).
+    """
+    h = hashlib.blake2b(digest_size=12)
+    h.update(repr((parts, sorted(request.query_params.multi_items()))).encode("utf-8"))
+    return f'"{h.hexdigest()}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """304, если у клиента та же версия; иначе ставит ETag в ответ и возвращает None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE
+    return None
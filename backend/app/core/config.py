@@ -1,10 +1,57 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+
+    # реплика для тяжёлых чтений (списки, отчёты, история); не задана — всё идёт в основную
+    database_read_url: str | None = None
+    db_read_pool_size: int = 10
+    db_read_max_overflow: int = 20
+    # после изменения клиент столько секунд читает из основной (read-your-writes при лаге реплики, cookie)
+    read_sticky_sec: float = 5.0
+
     jwt_secret: str = "change_me"
     jwt_expires_min: int = 43200  # 30 days
 
+    # только для разработки/тестов: вход без токена по заголовку X-Role (сид-пользователи).
+    # Включается явно (AUTH_ALLOW_ROLE_HEADER=true); по умолчанию нужен JWT
+    auth_allow_role_header: bool = False
+    # кеш сид-пользователей для входа по X-Role (на процесс)
+    user_cache_size: int = 256
+    user_cache_ttl_sec: int = 300
+
+    # кеш превью/миниатюр чеков (derived/), LRU по размеру
+    receipt_cache_max_mb: int = 512
+    # если перед API стоит nginx: internal-location, который смотрит в RECEIPTS_DIR
+    # (напр. "/_receipts"); тогда файлы отдаёт nginx через sendfile
+    receipts_accel_redirect_prefix: str | None = None
+
+    # запись истории: inline (в транзакции траты) | batched (групповые INSERT, см. app.core.audit)
+    audit_writer_mode: Literal["inline", "batched"] = "inline"
+    audit_batch_max_rows: int = 500
+    audit_batch_max_wait_ms: int = 5
+
+    # помесячные партиции expenses / expense_history: сколько месяцев вперёд держать созданными
+    partitions_ahead_months: int = 3
+    partitions_ensure_on_startup: bool = True
+
+    # GET /events (SSE): очередь на подписчика и период keepalive-комментариев
+    events_queue_size: int = 256
+    events_keepalive_sec: float = 15.0
+
+    # GET /metrics (Prometheus)
+    metrics_enabled: bool = True
+    # заголовок Server-Timing (db / render / app / total) в каждом ответе
+    server_timing: bool = True
+    # SQL дольше порога -> лог app.slow_query (SQL, параметры, план); 0 — выключено
+    slow_query_ms: int = 500
+    # для медленных SELECT — EXPLAIN (ANALYZE, BUFFERS), повторно выполняет запрос
+    slow_query_explain: bool = True
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,16 +1,106 @@
+import math
+import time
+
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.core.config import settings
+from app.core.metrics import TimedQueuePool
 
+# синхронный движок — для скриптов (seed, alembic)
 engine = create_engine(settings.database_url, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# асинхронный (psycopg3 async) — для API
+async_engine = create_async_engine(
+    settings.database_url,
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    poolclass=TimedQueuePool,  # тот же AsyncAdaptedQueuePool + время ожидания соединения
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,  # после commit ленивых догрузок в async нет — оставляем значения
+)
+
+# реплика для чтений (DATABASE_READ_URL); без неё — та же основная база
+if settings.database_read_url:
+    async_read_engine = create_async_engine(
+        settings.database_read_url,
+        pool_pre_ping=True,
+        pool_size=settings.db_read_pool_size,
+        max_overflow=settings.db_read_max_overflow,
+        poolclass=TimedQueuePool,
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+else:
+    async_read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
 class Base(DeclarativeBase):
     pass
 
-def get_db():
-    db = SessionLocal()
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# read-your-writes: до какого момента (unix time) клиенту читать из основной — в его cookie,
+# поэтому работает при любом числе воркеров/процессов и не смешивает клиентов за одним NAT
+STICKY_COOKIE = "hft_read_primary_until"
+
+def _sticky_until(request: Request) -> float | None:
     try:
+        return float(request.cookies[STICKY_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+def read_sessionmaker(request: Request) -> async_sessionmaker:
+    """Фабрика сессий для чтения: реплика, если клиент недавно ничего не менял."""
+    until = _sticky_until(request)
+    # окно не длиннее READ_STICKY_SEC: подделанная cookie не переведёт клиента на основную навсегда
+    now = time.time()
+    if until is not None and now < until <= now + settings.read_sticky_sec + 1:
+        return AsyncSessionLocal
+    return AsyncReadSessionLocal
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI-middleware: на успешный изменяющий запрос (не GET, статус < 400) ставит cookie
+    STICKY_COOKIE = now + READ_STICKY_SEC — следующие чтения клиента (get_read_db) идут в основную.
+    Без реплики ничего не делает.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS or AsyncReadSessionLocal is AsyncSessionLocal:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + settings.read_sticky_sec
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.3f}; Max-Age={math.ceil(settings.read_sticky_sec)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db(request: Request):
+    """Сессия только для чтения (списки, отчёты, история). Писать через неё нельзя."""
+    async with read_sessionmaker(request)() as db:
         yield db
-    finally:
-        db.close()
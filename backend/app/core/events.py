@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+import json
+import logging
+from datetime import datetime
+
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "expense_events"
+# больше событий в одном commit (импорт, массовые операции) — одно событие BULK вместо потока
+MAX_EVENTS_PER_COMMIT = 200
+# полезная нагрузка NOTIFY ограничена 8000 байт
+PAYLOAD_LIMIT = 7500
+
+# клиенту пора перечитать данные: отстал (переполнилась очередь) или мог пропустить события
+RESYNC = {"action": "RESYNC"}
+
+
+def _event(row: dict) -> dict:
+    """Строка expense_history -> компактное событие: новые значения изменённых полей."""
+    at = row.get("created_at")
+    return {
+        "action": row["action"],
+        "expense_id": str(row["expense_id"]),
+        "changes": {k: v.get("new") for k, v in (row.get("diff_json") or {}).items()},
+        "by": str(row["actor_id"]),
+        "at": at.isoformat() if isinstance(at, datetime) else at,
+    }
+
+
+def _payloads(rows: list[dict]) -> list[str]:
+    if len(rows) > MAX_EVENTS_PER_COMMIT:
+        return [json.dumps([{"action": "BULK", "count": len(rows)}])]
+
+    out, batch, size = [], [], 2
+    for row in rows:
+        ev = _event(row)
+        s = json.dumps(ev, ensure_ascii=False, default=str)
+        # одно событие со скобками массива тоже должно уложиться в PAYLOAD_LIMIT
+        if len(s.encode("utf-8")) + 2 > PAYLOAD_LIMIT:
+            # длинный комментарий и т.п. — без значений, клиент дочитает строку сам
+            ev.pop("changes")
+            s = json.dumps(ev)
+        n = len(s.encode("utf-8")) + 1
+        if batch and size + n > PAYLOAD_LIMIT:
+            out.append("[" + ",".join(batch) + "]")
+            batch, size = [], 2
+        batch.append(s)
+        size += n
+    if batch:
+        out.append("[" + ",".join(batch) + "]")
+    return out
+
+
+async def publish(db: AsyncSession, rows: list[dict]) -> None:
+    """
+    NOTIFY о строках истории — в транзакции вызывающего: подписчики получат события
+    только после commit и не получат при rollback.
+    """
+    if not rows:
+        return
+    await db.execute(
+        text("SELECT pg_notify(:ch, p) FROM unnest(CAST(:ps AS text[])) AS p"),
+        {"ch": CHANNEL, "ps": _payloads(rows)},
+    )
+
+
+class EventHub:
+    """
+    Одно LISTEN-соединение на процесс (не из пула) и раздача событий подписчикам /events.
+    У каждого подписчика своя ограниченная очередь: не успевает читать — очередь
+    сбрасывается и ему уходит RESYNC, остальных медленный клиент не тормозит.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._subs: set[asyncio.Queue] = set()
+        self._task: asyncio.Task | None = None
+        self._seq = itertools.count(1)
+
+    def subscribe(self) -> asyncio.Queue:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="event-hub")
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subs.discard(q)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def _fanout(self, events: list[dict]) -> None:
+        items = [(next(self._seq), ev) for ev in events]
+        for q in list(self._subs):
+            for item in items:
+                try:
+                    q.put_nowait(item)
+                except asyncio.QueueFull:
+                    while not q.empty():
+                        q.get_nowait()
+                    q.put_nowait((next(self._seq), RESYNC))
+                    break
+
+    async def _run(self) -> None:
+        # LISTEN — только на основной базе: NOTIFY на реплики не реплицируется
+        dsn = make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        backoff, connected_before = 1.0, False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(dsn, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    if connected_before:
+                        # пока переподключались, события могли потеряться
+                        self._fanout([RESYNC])
+                    connected_before, backoff = True, 1.0
+                    async for n in conn.notifies():
+                        try:
+                            self._fanout(json.loads(n.payload))
+                        except ValueError:
+                            log.warning("bad event payload: %r", n.payload[:200])
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 — переподключаемся
+                log.warning("event listener failed, reconnecting in %.0fs", backoff, exc_info=True)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+event_hub = EventHub(settings.events_queue_size)
@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+import orjson
+from fastapi import Response
+from sqlalchemy import Row
+
+from app.core.metrics import TimedJSONResponse
+
+
+def _default(v):
+    # Decimal (numeric, sum() по integer) orjson не умеет; Pydantic в JSON отдаёт его строкой
+    if isinstance(v, Decimal):
+        return str(v)
+    raise TypeError
+
+
+class RowsJSONResponse(TimedJSONResponse):
+    """
+    JSON через orjson, без Pydantic. Для строк из простых типов (str/int/bool/None,
+    UUID, datetime с tz, Decimal) байты те же, что у обычного пути FastAPI (response_model -> json.dumps):
+    компактные разделители, UTF-8 без экранирования, UTC как "Z". Сверка — tests/test_fast_json.py.
+    """
+
+    def encode(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+def rows_response(rows: list[Row], response: Response) -> RowsJSONResponse:
+    """
+    Core-строки (колонки в порядке полей схемы ответа) -> готовый ответ.
+    Заголовки, выставленные эндпоинтом через response (X-Next-Cursor), переносятся —
+    FastAPI их к возвращённому Response сам не добавляет.
+    """
+    out = RowsJSONResponse([r._asdict() for r in rows])
+    for k, v in response.headers.items():
+        out.headers[k] = v
+    return out
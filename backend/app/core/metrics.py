@@ -0,0 +1,248 @@
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import JSONResponse
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core import slow_queries
+from app.core.config import settings
+
+# --- HTTP ---
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса (до отправки последнего байта тела)",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Запросы в обработке")
+
+# --- БД ---
+
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Время одного SQL-запроса (от отправки до ответа драйвера)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+QUERY_ERRORS = Counter("db_query_errors_total", "SQL-запросы, завершившиеся ошибкой")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Число SQL-запросов на один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 500),
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Суммарное время SQL на один HTTP-запрос",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+# --- чеки ---
+
+RECEIPT_UPLOAD_BYTES = Histogram(
+    "receipt_upload_bytes",
+    "Размер загруженного чека",
+    buckets=(16e3, 64e3, 256e3, 1e6, 2e6, 5e6, 10e6, 25e6, 50e6),
+)
+RECEIPT_UPLOAD_DURATION = Histogram(
+    "receipt_upload_duration_seconds",
+    "Приём файла чека: чтение, sha256, запись на диск",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# --- история (audit outbox, AUDIT_WRITER_MODE=batched) ---
+
+AUDIT_OUTBOX_BACKLOG = Gauge("audit_outbox_backlog", "Строк в expense_history_outbox после последнего переноса")
+AUDIT_OUTBOX_ROWS = Counter("audit_outbox_moved_rows_total", "Строк истории перенесено из outbox")
+AUDIT_OUTBOX_ERRORS = Counter("audit_outbox_flush_errors_total", "Неудачные переносы outbox")
+AUDIT_OUTBOX_FLUSH = Histogram(
+    "audit_outbox_flush_seconds",
+    "Перенос одной пачки outbox -> expense_history",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+
+class RequestStats:
+    """Счётчики текущего HTTP-запроса; хуки движка и JSON-ответ пишут сюда."""
+
+    __slots__ = ("queries", "db", "render", "slow")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.slow: list[slow_queries.SlowQuery] = []
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул async-движка, который меряет ожидание свободного соединения."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - t0)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERY_DURATION.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db += elapsed
+    if (
+        settings.slow_query_ms
+        and elapsed * 1000 >= settings.slow_query_ms
+        and not statement.startswith("EXPLAIN")  # сам разбор не логируем
+    ):
+        q = slow_queries.SlowQuery(statement, parameters, elapsed, executemany)
+        if stats is not None:
+            # EXPLAIN — после ответа, не на этом соединении
+            if len(stats.slow) < slow_queries.MAX_PER_REQUEST:
+                stats.slow.append(q)
+        else:
+            slow_queries.log_slow(q, route=None, plan=None)
+
+
+def _handle_error(exc_context):
+    QUERY_ERRORS.inc()
+    conn = exc_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+class _PoolCollector:
+    """Состояние пулов на момент скрейпа (без обновления на каждом checkout)."""
+
+    def __init__(self) -> None:
+        self.pools: dict[str, object] = {}
+
+    def collect(self):
+        for name, doc, attr in (
+            ("db_pool_size", "Размер пула (pool_size)", "size"),
+            ("db_pool_checked_out", "Соединения, выданные из пула", "checkedout"),
+            ("db_pool_checked_in", "Свободные соединения в пуле", "checkedin"),
+            ("db_pool_overflow", "Соединения сверх pool_size", "overflow"),
+        ):
+            g = GaugeMetricFamily(name, doc, labels=["engine"])
+            for engine_name, pool in self.pools.items():
+                g.add_metric([engine_name], getattr(pool, attr)())
+            yield g
+
+
+_pools = _PoolCollector()
+REGISTRY.register(_pools)
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    """Хуки на cursor_execute + метрики пула (метка engine). Повторный вызов ничего не делает."""
+    if name in _pools.pools:
+        return
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    _pools.pools[name] = sync_engine.pool
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse, который засекает кодирование тела (часть render в Server-Timing)."""
+
+    def encode(self, content) -> bytes:
+        return super().render(content)
+
+    def render(self, content) -> bytes:
+        t0 = time.perf_counter()
+        body = self.encode(content)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.render += time.perf_counter() - t0
+        return body
+
+
+def _server_timing(stats: RequestStats, total: float) -> str:
+    app_time = max(total - stats.db - stats.render, 0.0)
+    return (
+        f'db;desc="{stats.queries} queries";dur={stats.db * 1000:.1f}, '
+        f"render;dur={stats.render * 1000:.1f}, "
+        f"app;dur={app_time * 1000:.1f}, "
+        f"total;dur={total * 1000:.1f}"
+    )
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: латентность по шаблону маршрута (/expenses/{expense_id}, а не по
+    конкретному URL), запросы в обработке, число и время SQL на запрос.
+    Время фиксируется на последнем байте тела — фоновые задачи после ответа не считаются.
+    Заголовок Server-Timing: db (SQL), render (JSON-кодирование), app (остальное), total —
+    всё до начала ответа.
+    Медленные SQL этого запроса уходят в slow_queries (EXPLAIN в фоне).
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        done = False
+
+        def finish() -> None:
+            nonlocal done
+            if done:
+                return
+            done = True
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            REQUEST_DURATION.labels(scope["method"], label, str(status)).observe(time.perf_counter() - t0)
+            REQUEST_QUERIES.labels(label).observe(stats.queries)
+            REQUEST_DB_TIME.labels(label).observe(stats.db)
+            REQUESTS_IN_FLIGHT.dec()
+            if stats.slow:
+                slow_queries.schedule_explain(stats.slow, label)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing:
+                    timing = _server_timing(stats, time.perf_counter() - t0)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+            elif message["type"] == "http.response.pathsend":
+                finish()
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _request_stats.reset(token)
@@ -0,0 +1,81 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(ts: datetime, row_id: uuid.UUID) -> str:
+    """
+    Непрозрачный курсор для keyset-пагинации по (ts, id).
+    Клиент его не разбирает, просто передаёт обратно в ?cursor=...
+    """
+    raw = json.dumps({"t": ts.isoformat(), "i": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        ts, row_id = datetime.fromisoformat(data["t"]), uuid.UUID(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # наши курсоры — по timestamptz, всегда с зоной; без неё сравнение зависело бы от TimeZone сессии
+    if ts.tzinfo is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ts, row_id
+
+
+def encode_xid_cursor(xid: int, row_id: uuid.UUID) -> str:
+    """Курсор по (транзакция изменения, id) — GET /expenses/changes."""
+    raw = json.dumps({"x": xid, "i": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_xid_cursor(cursor: str) -> tuple[int, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        xid, row_id = data["x"], uuid.UUID(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(xid, int) or isinstance(xid, bool) or xid < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return xid, row_id
+
+
+async def keyset_page(
+    db: AsyncSession,
+    stmt: Select,
+    ts_col,
+    id_col,
+    limit: int,
+    cursor: str | None,
+    response: Response,
+    as_rows: bool = False,
+) -> list:
+    """
+    Страница по (ts_col, id_col) от новых к старым. Курсор следующей страницы —
+    в заголовке X-Next-Cursor (если она есть). stmt выбирает одну ORM-сущность
+    или (as_rows=True) набор колонок, среди которых ts_col и id_col, — тогда вернутся Row.
+    """
+    if cursor:
+        c_ts, c_id = decode_cursor(cursor)
+        # отдельное ts <= c_ts: сравнение кортежей планировщик не использует для отсечения партиций
+        stmt = stmt.where(ts_col <= c_ts, tuple_(ts_col, id_col) < tuple_(c_ts, c_id))
+
+    # берём на одну строку больше, чтобы понять, есть ли следующая страница
+    stmt = stmt.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1)
+    result = await db.execute(stmt)
+    rows = result.all() if as_rows else result.scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            getattr(last, ts_col.key), getattr(last, id_col.key)
+        )
+    return rows
@@ -0,0 +1,194 @@
+"""
+Помесячные партиции expenses (по spent_at) и expense_history (по created_at).
+
+У каждой таблицы (миграция 716dcb641a86):
+    {table}_p_before    MINVALUE .. первый месяц — траты задним числом старше помесячных
+    {table}_pYYYY_MM    один месяц (границы в UTC)
+    {table}_p_future    после последнего месяца .. MAXVALUE
+Крайние партиции ловят всё вне помесячных, поэтому вставка не падает, даже если новые
+месяцы вовремя не создали — просто нет отсечения. ensure() выкраивает месяцы из крайних,
+archive() отсоединяет старые (DETACH CONCURRENTLY) и переносит в схему archive.
+Запуск по расписанию — python -m app.partitions.
+"""
+import logging
+import re
+import uuid
+from datetime import date, datetime, timezone
+
+from sqlalchemy import ARRAY, Connection, DateTime, any_, cast, func, select, text
+
+from app.core.config import settings
+from app.models.expense import Expense
+from app.models.expense_history import ExpenseHistory
+from app.models.expense_key import ExpenseKey
+
+log = logging.getLogger(__name__)
+
+# таблица -> ключ партиции
+PARTITIONED = {"expenses": "spent_at", "expense_history": "created_at"}
+_MODELS = {"expenses": Expense, "expense_history": ExpenseHistory}
+ARCHIVE_SCHEMA = "archive"
+
+
+def expense_by_id(expense_id: uuid.UUID) -> list:
+    """
+    Условия на одну трату по id. PK партиции — (id, spent_at), по одному id Postgres прошёл бы
+    индексы всех партиций; spent_at из expense_keys (подзапрос) отсекает лишние при выполнении.
+    """
+    return [
+        Expense.id == expense_id,
+        Expense.spent_at == select(ExpenseKey.spent_at).where(ExpenseKey.id == expense_id).scalar_subquery(),
+    ]
+
+
+def expenses_by_ids(ids: list[uuid.UUID]) -> list:
+    """То же для списка id: spent_at = ANY(массив ключей) — только партиции этих трат."""
+    keys = select(func.array_agg(ExpenseKey.spent_at)).where(ExpenseKey.id.in_(ids)).scalar_subquery()
+    # CAST — чтобы вышло ANY(массив), а не ANY(подзапрос) (сравнение с каждой его строкой)
+    return [Expense.id.in_(ids), Expense.spent_at == any_(cast(keys, ARRAY(DateTime(timezone=True))))]
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _columns(table: str) -> str:
+    # вычисляемые (comment_tsv) не вставляются — Postgres посчитает сам
+    return ", ".join(c.name for c in _MODELS[table].__table__.columns if c.computed is None)
+
+
+def _bound(d: date) -> str:
+    return f"'{d.isoformat()} 00:00:00+00'"
+
+
+def _name(table: str, d: date) -> str:
+    return f"{table}_p{d:%Y_%m}"
+
+
+def monthly(conn: Connection, table: str) -> list[date]:
+    """Помесячные партиции таблицы (начала месяцев), по возрастанию."""
+    names = conn.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:t AS regclass)"
+        ),
+        {"t": table},
+    )
+    pattern = re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+    return sorted(date(int(m[1]), int(m[2]), 1) for n in names if (m := pattern.match(n)))
+
+
+def _carve(conn: Connection, table: str, edge: str, months: list[date], edge_bounds: tuple[str, str]) -> None:
+    """Выкроить месяцы из крайней партиции: отсоединить её, создать месяцы, перенести её строки из них, вернуть."""
+    key, cols = PARTITIONED[table], _columns(table)
+    edge_name = f"{table}_p_{edge}"
+    lo, hi = _bound(months[0]), _bound(add_months(months[-1], 1))
+
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {edge_name}"))
+    for m in months:
+        conn.execute(text(
+            f"CREATE TABLE {_name(table, m)} PARTITION OF {table} "
+            f"FOR VALUES FROM ({_bound(m)}) TO ({_bound(add_months(m, 1))})"
+        ))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {edge_name} WHERE {key} >= {lo} AND {key} < {hi} RETURNING {cols}) "
+        f"INSERT INTO {table} ({cols}) SELECT {cols} FROM moved"
+    )).rowcount
+    conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {edge_name} FOR VALUES FROM ({edge_bounds[0]}) TO ({edge_bounds[1]})"
+    ))
+    if moved:
+        log.info("%s: moved %d row(s) from %s", table, moved, edge_name)
+
+
+def ensure(conn: Connection, table: str, first: date | None, last: date) -> list[str]:
+    """
+    Помесячные партиции на [first, last] (first=None — только вперёд). Диапазон месяцев
+    остаётся сплошным. В транзакции conn; DETACH крайней партиции кратко блокирует таблицу.
+    """
+    # несколько воркеров на старте — создаёт один, остальные увидят готовое
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:k))"), {"k": f"partitions:{table}"})
+    months = monthly(conn, table)
+    if not months:
+        raise RuntimeError(f"{table} is not partitioned (run alembic upgrade head)")
+    lo, hi = months[0], months[-1]
+    created: list[date] = []
+
+    last = month_start(last)
+    if last > hi:
+        new = []
+        m = add_months(hi, 1)
+        while m <= last:
+            new.append(m)
+            m = add_months(m, 1)
+        _carve(conn, table, "future", new, (_bound(m), "MAXVALUE"))
+        created += new
+
+    if first is not None and month_start(first) < lo:
+        new = []
+        m = month_start(first)
+        while m < lo:
+            new.append(m)
+            m = add_months(m, 1)
+        _carve(conn, table, "before", new, ("MINVALUE", _bound(new[0])))
+        created += new
+
+    return [_name(table, m) for m in sorted(created)]
+
+
+def ensure_all(conn: Connection, first: date | None = None, ahead: int | None = None) -> list[str]:
+    """Обе таблицы: от first (если задан) до текущего месяца + ahead."""
+    ahead = settings.partitions_ahead_months if ahead is None else ahead
+    last = add_months(month_start(datetime.now(timezone.utc).date()), ahead)
+    return [name for table in PARTITIONED for name in ensure(conn, table, first, last)]
+
+
+async def ensure_on_startup() -> None:
+    """Партиции вперёд при старте API. Ошибка не мешает работе: строки попадут в крайнюю партицию."""
+    from app.core.db import async_engine
+
+    try:
+        async with async_engine.begin() as conn:
+            created = await conn.run_sync(ensure_all)
+        if created:
+            log.info("created partitions: %s", ", ".join(created))
+    except Exception:  # noqa: BLE001
+        log.warning("partition maintenance failed", exc_info=True)
+
+
+def archive(conn: Connection, table: str, before: date, drop: bool = False) -> list[str]:
+    """
+    Отсоединить месяцы раньше before (DETACH CONCURRENTLY — без долгой блокировки таблицы)
+    и перенести в схему archive (или удалить). conn — в режиме AUTOCOMMIT.
+    Крайняя _p_before уходит вместе с ними и пересоздаётся пустой до before.
+    Ключи expense_keys архивных трат остаются: на них ссылается история.
+    """
+    before = month_start(before)
+    old = [m for m in monthly(conn, table) if m < before]
+    if not old:
+        return []
+    edge = f"{table}_p_before"
+    months = [_name(table, m) for m in old]
+    for name in [edge, *months]:
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+    # пока новой _p_before нет, вставка задним числом раньше before падает — создаём сразу
+    archived_edge = f"{table}_p_before_{old[0]:%Y_%m}"
+    conn.execute(text(f"ALTER TABLE {edge} RENAME TO {archived_edge}"))
+    conn.execute(text(
+        f"CREATE TABLE {edge} PARTITION OF {table} FOR VALUES FROM (MINVALUE) TO ({_bound(before)})"
+    ))
+
+    if not drop:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    out = [archived_edge, *months]
+    for name in out:
+        if drop:
+            conn.execute(text(f"DROP TABLE {name}"))
+        else:
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    return out
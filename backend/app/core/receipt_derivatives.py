@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+from app.core.receipt_store import receipts_dir
+
+# длинная сторона в пикселях
+SIZES = {
+    "thumb": 256,
+    "preview": 1280,
+}
+WEBP_QUALITY = 80
+DERIVED_DIR = "derived"
+
+log = logging.getLogger(__name__)
+
+
+class UnsupportedReceipt(Exception):
+    """Файл чека не читается как изображение/PDF (битый или неподдерживаемый формат)."""
+
+
+def derived_root() -> Path:
+    return receipts_dir() / DERIVED_DIR
+
+
+def derivative_path(rel_path: str, size: str) -> Path:
+    # derived/<size>/ab/cd/<hash>.webp — раскладка повторяет оригиналы
+    return derived_root() / size / Path(rel_path).with_suffix(".webp")
+
+
+def remove_derivatives(rel_path: str) -> None:
+    """Удалить производные файлы всех размеров (оригинал больше никому не нужен)."""
+    for size in SIZES:
+        try:
+            derivative_path(rel_path, size).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _render_pdf_first_page(src: Path, px: int) -> Image.Image:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(str(src))
+    try:
+        page = pdf[0]
+        w, h = page.get_size()
+        scale = px / max(w, h)
+        return page.render(scale=max(scale, 0.1)).to_pil()
+    finally:
+        pdf.close()
+
+
+def _decode(src: Path, px: int) -> Image.Image:
+    try:
+        if src.suffix.lower() == ".pdf":
+            return _render_pdf_first_page(src, px)
+        with Image.open(src) as raw:
+            img = ImageOps.exif_transpose(raw)
+            img.load()
+            return img
+    except FileNotFoundError:
+        raise
+    except (OSError, ValueError, RuntimeError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError, обрезанный файл, PdfiumError (RuntimeError)
+        raise UnsupportedReceipt(f"{src.name}: {e}") from e
+
+
+def _render(src: Path, dst: Path, px: int) -> int:
+    img = _decode(src, px)
+    img.thumbnail((px, px))
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{uuid.uuid4().hex}.tmp")
+    img.save(tmp, format="WEBP", quality=WEBP_QUALITY)
+    os.replace(tmp, dst)
+    return dst.stat().st_size
+
+
+class _DiskLRU:
+    """
+    Ограничение размера папки derived/. Давность — по mtime (трогаем при каждой отдаче).
+    Счётчик в памяти приблизительный (у каждого воркера свой); когда он превышает лимит,
+    пересчитываем по диску и удаляем самые старые файлы до 90% лимита.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._approx: int | None = None
+        self._lock = threading.Lock()
+
+    def _scan(self) -> list[tuple[float, int, Path]]:
+        files = []
+        root = derived_root()
+        for dirpath, _dirs, names in os.walk(root):
+            for n in names:
+                p = Path(dirpath) / n
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        return files
+
+    def touch(self, p: Path) -> None:
+        try:
+            os.utime(p)
+        except FileNotFoundError:
+            pass
+
+    def added(self, nbytes: int) -> None:
+        with self._lock:
+            if self._approx is None:
+                self._approx = sum(f[1] for f in self._scan())
+            else:
+                self._approx += nbytes
+            if self._approx <= self.max_bytes:
+                return
+
+            files = self._scan()
+            total = sum(f[1] for f in files)
+            target = int(self.max_bytes * 0.9)
+            for _mtime, size, p in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                except FileNotFoundError:
+                    pass
+            self._approx = total
+
+
+_lru = _DiskLRU(settings.receipt_cache_max_mb * 1024 * 1024)
+
+
+class _KeyLock:
+    __slots__ = ("lock", "waiters")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.waiters = 0
+
+
+# генерация одного файла — один раз; запись удаляется, когда её больше никто не ждёт
+_inflight: dict[Path, _KeyLock] = {}
+
+
+def _generate_sync(rel_path: str, size: str) -> Path | None:
+    src = receipts_dir() / rel_path
+    dst = derivative_path(rel_path, size)
+    if dst.exists():
+        _lru.touch(dst)
+        return dst
+    if not src.exists():
+        return None
+    nbytes = _render(src, dst, SIZES[size])
+    _lru.added(nbytes)
+    return dst
+
+
+async def get_derivative(rel_path: str, size: str) -> Path | None:
+    """
+    Путь к производному файлу; при промахе генерирует (в пуле потоков, без дублей).
+    Файл не читается как изображение/PDF — UnsupportedReceipt.
+    """
+    dst = derivative_path(rel_path, size)
+    entry = _inflight.get(dst)
+    if entry is None:
+        entry = _inflight[dst] = _KeyLock()
+    entry.waiters += 1
+    try:
+        async with entry.lock:
+            return await run_in_threadpool(_generate_sync, rel_path, size)
+    finally:
+        entry.waiters -= 1
+        if entry.waiters == 0 and _inflight.get(dst) is entry:
+            del _inflight[dst]
+
+
+def generate_all(rel_path: str) -> None:
+    """Фоновая задача после загрузки: все размеры сразу. Ошибки не критичны — догенерим при запросе."""
+    for size in SIZES:
+        try:
+            _generate_sync(rel_path, size)
+        except UnsupportedReceipt as e:
+            log.warning("receipt derivative skipped: %s", e)
+            return
+        except Exception:  # noqa: BLE001 — сбой генерации не должен ронять фон
+            log.warning("receipt derivative failed: %s (%s)", rel_path, size, exc_info=True)
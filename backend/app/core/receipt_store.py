@@ -0,0 +1,102 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.expense import Expense
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def receipts_dir() -> Path:
+    p = Path(os.getenv("RECEIPTS_DIR", "/data/receipts"))
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def cas_path(digest: str, ext: str) -> str:
+    """Относительный путь по содержимому: ab/cd/<sha256>.ext"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def _write_chunk(f, h, chunk: bytes) -> None:
+    h.update(chunk)
+    f.write(chunk)
+
+
+def _place(tmp_path: Path, rel_path: str) -> None:
+    dst = receipts_dir() / rel_path
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    # всегда заменяем (атомарно): содержимое то же, а файл гарантированно на месте,
+    # даже если параллельно его только что удалили как осиротевший
+    os.replace(tmp_path, dst)
+
+
+def _unlink(rel_path: str) -> None:
+    try:
+        (receipts_dir() / rel_path).unlink()
+    except FileNotFoundError:
+        pass
+
+
+async def _lock(db: AsyncSession, rel_path: str) -> None:
+    # сериализуем привязку/удаление одного и того же файла между процессами
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:p))"), {"p": rel_path})
+
+
+async def save_upload(db: AsyncSession, file: UploadFile, ext: str) -> tuple[str, int]:
+    """
+    Пишет загрузку во временный файл, по ходу считая SHA-256 (диск — в пуле потоков),
+    затем переносит в ab/cd/<hash>.ext. Одинаковые чеки лежат одним файлом.
+    Берёт advisory-lock на путь до конца транзакции вызывающего.
+    Возвращает (относительный путь, размер в байтах).
+    """
+    tmp_dir = receipts_dir() / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+
+    h = hashlib.sha256()
+    size = 0
+    f = await run_in_threadpool(tmp_path.open, "wb")
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            await run_in_threadpool(_write_chunk, f, h, chunk)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(tmp_path.unlink, True)
+        raise
+    await run_in_threadpool(f.close)
+
+    rel_path = cas_path(h.hexdigest(), ext)
+    await _lock(db, rel_path)
+    await run_in_threadpool(_place, tmp_path, rel_path)
+    return rel_path, size
+
+
+async def release(db: AsyncSession, rel_path: str) -> None:
+    """
+    Убрать файл, если на него больше не ссылается ни одна трата (refcount по receipt_path),
+    вместе с его миниатюрами/превью в derived/.
+    Вызывать после commit изменения траты — в отдельной короткой транзакции.
+    """
+    from app.core.receipt_derivatives import remove_derivatives
+
+    await _lock(db, rel_path)
+    refs = await db.scalar(
+        select(func.count()).select_from(Expense).where(Expense.receipt_path == rel_path)
+    )
+    if not refs:
+        # сначала оригинал: без него фоновая генерация производные уже не создаст.
+        # Тот же файл с другим расширением делит с этим .webp — ему они догенерятся при запросе
+        await run_in_threadpool(_unlink, rel_path)
+        await run_in_threadpool(remove_derivatives, rel_path)
+    await db.commit()
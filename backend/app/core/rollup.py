@@ -0,0 +1,150 @@
+import uuid
+from datetime import date, datetime, timezone
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.daily_category_total import DailyCategoryTotal
+from app.models.expense import Expense
+
+# день считаем в UTC — так же, как пересборка из SQL (см. rollup_day_expr)
+ROLLUP_TZ = "UTC"
+
+UPSERT_CHUNK = 5000
+
+
+def rollup_day(dt: datetime) -> date:
+    # naive datetime (datetime.utcnow()) считаем UTC
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.date()
+
+
+def rollup_day_expr():
+    return func.date(func.timezone(ROLLUP_TZ, Expense.spent_at))
+
+
+async def _upsert(db: AsyncSession, values: list[dict]) -> None:
+    stmt = insert(DailyCategoryTotal).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            DailyCategoryTotal.day,
+            DailyCategoryTotal.category_id,
+            DailyCategoryTotal.payment_source,
+        ],
+        set_={
+            "total_cents": DailyCategoryTotal.total_cents + stmt.excluded.total_cents,
+            "count": DailyCategoryTotal.count + stmt.excluded.count,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def apply_rollup(
+    db: AsyncSession,
+    spent_at: datetime,
+    category_id: uuid.UUID,
+    payment_source: str,
+    sign: int,
+    amount_cents: int,
+) -> None:
+    """
+    Добавить (sign=1) или убрать (sign=-1) одну трату из роллапа.
+    Вызывается в той же транзакции, что и изменение траты — коммитит вызывающий.
+    """
+    await _upsert(db, [{
+        "day": rollup_day(spent_at),
+        "category_id": category_id,
+        "payment_source": payment_source,
+        "total_cents": sign * amount_cents,
+        "count": sign,
+    }])
+
+
+class RollupDelta:
+    """Накопитель изменений роллапа для пачки трат — применяется одним upsert."""
+
+    def __init__(self) -> None:
+        self._acc: dict[tuple, list[int]] = {}
+
+    def add(self, spent_at: datetime, category_id: uuid.UUID, payment_source: str, sign: int, amount_cents: int) -> None:
+        key = (rollup_day(spent_at), category_id, payment_source)
+        acc = self._acc.setdefault(key, [0, 0])
+        acc[0] += sign * amount_cents
+        acc[1] += sign
+
+    async def apply(self, db: AsyncSession) -> None:
+        # ключи уникальны — иначе ON CONFLICT не даст обновить строку дважды
+        values = [
+            {"day": k[0], "category_id": k[1], "payment_source": k[2], "total_cents": v[0], "count": v[1]}
+            for k, v in self._acc.items()
+            if v[0] or v[1]
+        ]
+        # пачками — у Postgres лимит на число параметров в одном запросе
+        for i in range(0, len(values), UPSERT_CHUNK):
+            await _upsert(db, values[i:i + UPSERT_CHUNK])
+        self._acc.clear()
+
+
+async def add_expense(db: AsyncSession, exp: Expense) -> None:
+    await apply_rollup(db, exp.spent_at, exp.category_id, exp.payment_source, 1, exp.amount_cents)
+
+
+async def remove_expense(db: AsyncSession, exp: Expense) -> None:
+    await apply_rollup(db, exp.spent_at, exp.category_id, exp.payment_source, -1, exp.amount_cents)
+
+
+def _expected_query():
+    day = rollup_day_expr()
+    return (
+        select(
+            day.label("day"),
+            Expense.category_id,
+            Expense.payment_source,
+            func.sum(Expense.amount_cents).label("total_cents"),
+            func.count().label("count"),
+        )
+        .where(Expense.is_deleted == False)  # noqa: E712
+        .group_by(day, Expense.category_id, Expense.payment_source)
+    )
+
+
+async def find_drift(db: AsyncSession) -> list[dict]:
+    """Сравнить роллап с пересчётом из expenses. Возвращает расходящиеся ключи."""
+    expected = {
+        (r.day, r.category_id, r.payment_source): (int(r.total_cents), int(r.count))
+        for r in await db.execute(_expected_query())
+    }
+    actual = {
+        (r.day, r.category_id, r.payment_source): (int(r.total_cents), int(r.count))
+        for r in (await db.execute(select(DailyCategoryTotal))).scalars()
+        if r.count != 0 or r.total_cents != 0
+    }
+
+    drift = []
+    for key in sorted(expected.keys() | actual.keys(), key=lambda k: (k[0], str(k[1]), k[2])):
+        exp_v = expected.get(key, (0, 0))
+        act_v = actual.get(key, (0, 0))
+        if exp_v != act_v:
+            drift.append({
+                "day": key[0].isoformat(),
+                "category_id": str(key[1]),
+                "payment_source": key[2],
+                "expected": {"total_cents": exp_v[0], "count": exp_v[1]},
+                "actual": {"total_cents": act_v[0], "count": act_v[1]},
+            })
+    return drift
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """Пересобрать роллап с нуля (в транзакции вызывающего)."""
+    # блокируем таблицу, чтобы параллельные инкременты не потерялись между delete и insert
+    await db.execute(text("LOCK TABLE daily_category_totals IN EXCLUSIVE MODE"))
+    await db.execute(delete(DailyCategoryTotal))
+    q = _expected_query()
+    await db.execute(
+        insert(DailyCategoryTotal).from_select(
+            ["day", "category_id", "payment_source", "total_cents", "count"], q
+        )
+    )
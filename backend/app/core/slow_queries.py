@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import json
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from app.core.config import settings
+
+log = logging.getLogger("app.slow_query")
+
+# сколько медленных SQL одного запроса разбирать
+MAX_PER_REQUEST = 5
+# EXPLAIN ANALYZE выполняет запрос ещё раз — только чтение
+_EXPLAINABLE = ("select", "with")
+
+_explain_lock: asyncio.Lock | None = None
+_tasks: set[asyncio.Task] = set()
+
+
+@dataclass
+class SlowQuery:
+    statement: str
+    parameters: object
+    elapsed: float
+    executemany: bool
+
+    @property
+    def explainable(self) -> bool:
+        return not self.executemany and self.statement.lstrip().lower().startswith(_EXPLAINABLE)
+
+
+def log_slow(q: SlowQuery, route: str | None, plan: object | None) -> None:
+    # одна строка JSON на запрос — удобно грепать и собирать в Loki/ELK
+    log.warning("slow_query %s", json.dumps({
+        "route": route,
+        "ms": round(q.elapsed * 1000, 1),
+        "sql": q.statement,
+        "params": q.parameters,
+        "plan": plan,
+    }, default=str, ensure_ascii=False))
+
+
+async def _explain(q: SlowQuery) -> object | None:
+    # импорт здесь: app.core.db сам зависит от метрик (пул), а те — от этого модуля
+    from app.core.db import async_engine
+
+    async with async_engine.connect() as conn:
+        await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+        res = await conn.exec_driver_sql(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + q.statement, q.parameters
+        )
+        plan = res.scalar()
+        await conn.rollback()
+    return plan
+
+
+async def _explain_and_log(items: list[SlowQuery], route: str) -> None:
+    global _explain_lock
+    if _explain_lock is None:
+        _explain_lock = asyncio.Lock()
+    # не больше одного разбора за раз: при общей деградации не добавляем нагрузку
+    busy = _explain_lock.locked()
+    async with _explain_lock if not busy else nullcontext():
+        for q in items:
+            plan = None
+            if settings.slow_query_explain and not busy and q.explainable:
+                try:
+                    plan = await _explain(q)
+                except Exception:  # noqa: BLE001 — разбор не должен мешать работе
+                    log.debug("explain failed", exc_info=True)
+            log_slow(q, route, plan)
+
+
+def schedule_explain(items: list[SlowQuery], route: str) -> None:
+    """Разобрать и залогировать медленные SQL запроса — отдельной задачей, после ответа."""
+    # пустой контекст: иначе задача унаследует счётчики запроса и EXPLAIN попадёт в них
+    task = asyncio.get_running_loop().create_task(
+        _explain_and_log(list(items), route), context=contextvars.Context()
+    )
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,231 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, DateTime, Integer, String, Subquery, Text, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.audit import HISTORY
+from app.core.partitions import expenses_by_ids
+from app.models.expense import Expense
+from app.models.expense_snapshot import ExpenseSnapshot
+
+# поля, которые меняет история (diff_json) — из них и состоит снимок
+STATE_FIELDS = ("amount_cents", "payment_source", "category_id", "comment", "spent_at", "is_deleted")
+
+
+def parse_ts(v: str | datetime) -> datetime:
+    """Время из diff_json/снимка; naive (datetime.utcnow()) считаем UTC."""
+    dt = datetime.fromisoformat(v) if isinstance(v, str) else v
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def apply_change(state: dict | None, action: str, diff: dict, at: datetime) -> dict:
+    state = dict(state) if state else {"is_deleted": False}
+    for k, change in (diff or {}).items():
+        if k in STATE_FIELDS:
+            state[k] = change.get("new")
+    if action == "DELETE":
+        state["is_deleted"] = True
+    elif action == "RESTORE":
+        state["is_deleted"] = False
+    state["changed_at"] = at.isoformat()
+    return state
+
+
+async def states_as_of(
+    db: AsyncSession,
+    as_of: datetime,
+    expense_ids: list[uuid.UUID] | None = None,
+) -> dict[uuid.UUID, dict]:
+    """
+    Состояния трат на момент as_of: последний снимок <= as_of для каждой траты
+    + история после него (до as_of включительно). Траты, созданные позже as_of, не попадают.
+    """
+    base_q = (
+        select(ExpenseSnapshot.expense_id, ExpenseSnapshot.snapshot_at, ExpenseSnapshot.state)
+        .where(ExpenseSnapshot.snapshot_at <= as_of)
+        .distinct(ExpenseSnapshot.expense_id)
+        .order_by(ExpenseSnapshot.expense_id, ExpenseSnapshot.snapshot_at.desc())
+    )
+    if expense_ids is not None:
+        base_q = base_q.where(ExpenseSnapshot.expense_id.in_(expense_ids))
+    base = base_q.subquery()
+
+    states: dict[uuid.UUID, dict] = {}
+    for r in await db.execute(select(base)):
+        states[r.expense_id] = r.state
+
+    # хвост истории: только то, что позже снимка своей траты (или вся, если снимка нет);
+    # HISTORY — вместе с ещё не перенесёнными строками outbox
+    h = HISTORY
+    hist_q = (
+        select(h.c.expense_id, h.c.action, h.c.diff_json, h.c.created_at)
+        .outerjoin(base, base.c.expense_id == h.c.expense_id)
+        .where(h.c.created_at <= as_of)
+        .where((base.c.snapshot_at.is_(None)) | (h.c.created_at > base.c.snapshot_at))
+        .order_by(h.c.expense_id, h.c.created_at, h.c.id)
+        .execution_options(yield_per=5000)
+    )
+    if expense_ids is not None:
+        hist_q = hist_q.where(h.c.expense_id.in_(expense_ids))
+
+    result = await db.stream(hist_q)
+    async for r in result:
+        states[r.expense_id] = apply_change(states.get(r.expense_id), r.action, r.diff_json, r.created_at)
+
+    return states
+
+
+async def last_snapshot_at(db: AsyncSession) -> datetime | None:
+    return await db.scalar(select(func.max(ExpenseSnapshot.snapshot_at)))
+
+
+async def make_snapshot(db: AsyncSession, at: datetime) -> int:
+    """
+    Снимок на момент at — только для трат, у которых были изменения после прошлого снимка.
+    Строится той же реконструкцией, что и чтение as_of, поэтому согласован с историей.
+    Коммитит вызывающий. Возвращает число записанных снимков.
+    """
+    prev = await last_snapshot_at(db)
+    changed_q = select(HISTORY.c.expense_id).where(HISTORY.c.created_at <= at).distinct()
+    if prev is not None:
+        changed_q = changed_q.where(HISTORY.c.created_at > prev)
+    changed = list((await db.scalars(changed_q)).all())
+    if not changed:
+        return 0
+
+    n = 0
+    chunk = 1000
+    for i in range(0, len(changed), chunk):
+        ids = changed[i:i + chunk]
+        states = await states_as_of(db, at, ids)
+        rows = [{"expense_id": eid, "snapshot_at": at, "state": st} for eid, st in states.items()]
+        if rows:
+            await db.execute(insert(ExpenseSnapshot).values(rows).on_conflict_do_nothing())
+            n += len(rows)
+    return n
+
+
+async def expenses_as_of(
+    db: AsyncSession,
+    as_of: datetime,
+    expense_ids: list[uuid.UUID] | None = None,
+) -> list[dict]:
+    """
+    Строки в формате ExpenseOut на момент as_of. Неизменяемые поля (created_by, created_at)
+    и receipt_path (история его не ведёт) — из текущей строки, updated_at — время последнего
+    изменения до as_of.
+    """
+    states = await states_as_of(db, as_of, expense_ids)
+    if not states:
+        return []
+
+    meta: dict[uuid.UUID, tuple] = {}
+    ids = list(states.keys())
+    for i in range(0, len(ids), 5000):
+        for r in await db.execute(
+            select(Expense.id, Expense.created_by, Expense.created_at, Expense.receipt_path)
+            .where(*expenses_by_ids(ids[i:i + 5000]))
+        ):
+            meta[r.id] = (r.created_by, r.created_at, r.receipt_path)
+
+    out = []
+    for eid, st in states.items():
+        if eid not in meta or st.get("spent_at") is None:
+            continue
+        created_by, created_at, receipt_path = meta[eid]
+        out.append({
+            "id": eid,
+            "amount_cents": st["amount_cents"],
+            "payment_source": st["payment_source"],
+            "category_id": uuid.UUID(st["category_id"]),
+            "comment": st.get("comment"),
+            "spent_at": parse_ts(st["spent_at"]),
+            "receipt_path": receipt_path,
+            "is_deleted": bool(st.get("is_deleted")),
+            "created_by": created_by,
+            "created_at": created_at,
+            "updated_at": parse_ts(st["changed_at"]),
+        })
+    return out
+
+
+# то же восстановление, что states_as_of + expenses_as_of, но целиком в SQL: последний снимок каждой траты
+# || значения "new" из хвоста истории (jsonb_object_agg с ORDER BY — при повторе ключа побеждает последний).
+# История — вместе с outbox (как audit.HISTORY). Даты в state — ISO-строки, в т.ч. без зоны:
+# читать под SET LOCAL TIME ZONE 'UTC' (как parse_ts).
+_STATE_AS_OF_SQL = f"""
+WITH base AS (
+    SELECT DISTINCT ON (expense_id) expense_id, snapshot_at, state
+    FROM expense_snapshots
+    WHERE snapshot_at <= :as_of
+    ORDER BY expense_id, snapshot_at DESC
+),
+tail AS (
+    SELECT h.expense_id,
+           jsonb_object_agg(d.key, d.value -> 'new' ORDER BY h.created_at, h.id)
+               FILTER (WHERE d.key IS NOT NULL) AS changes,
+           max(h.created_at) AS changed_at
+    FROM (
+        SELECT id, expense_id, action, diff_json, created_at FROM expense_history
+        UNION ALL
+        SELECT id, expense_id, action, diff_json, created_at FROM expense_history_outbox
+    ) h
+    LEFT JOIN base b ON b.expense_id = h.expense_id
+    LEFT JOIN LATERAL jsonb_each(
+        h.diff_json || CASE h.action
+            WHEN 'DELETE' THEN '{{"is_deleted": {{"new": true}}}}'::jsonb
+            WHEN 'RESTORE' THEN '{{"is_deleted": {{"new": false}}}}'::jsonb
+            ELSE '{{}}'::jsonb
+        END
+    ) d ON d.key IN ({", ".join(f"'{f}'" for f in STATE_FIELDS)})
+    WHERE h.created_at <= :as_of AND (b.snapshot_at IS NULL OR h.created_at > b.snapshot_at)
+    GROUP BY h.expense_id
+),
+st AS (
+    SELECT coalesce(b.expense_id, t.expense_id) AS expense_id,
+           coalesce(b.state, '{{"is_deleted": false}}'::jsonb) || coalesce(t.changes, '{{}}'::jsonb) AS s,
+           coalesce(t.changed_at, (b.state ->> 'changed_at')::timestamptz) AS changed_at
+    FROM base b FULL JOIN tail t ON t.expense_id = b.expense_id
+)
+SELECT e.id,
+       (st.s ->> 'amount_cents')::int AS amount_cents,
+       st.s ->> 'payment_source' AS payment_source,
+       (st.s ->> 'category_id')::uuid AS category_id,
+       st.s ->> 'comment' AS comment,
+       (st.s ->> 'spent_at')::timestamptz AS spent_at,
+       e.receipt_path,
+       coalesce((st.s ->> 'is_deleted')::boolean, false) AS is_deleted,
+       e.created_by,
+       e.created_at,
+       st.changed_at AS updated_at
+FROM st JOIN expenses e ON e.id = st.expense_id
+WHERE st.s ->> 'spent_at' IS NOT NULL
+"""
+
+
+def expenses_as_of_query(as_of: datetime) -> Subquery:
+    """
+    Траты на момент as_of как подзапрос с колонками ExpenseOut (в том же порядке) —
+    фильтры, keyset и LIMIT накладывает вызывающий, и они выполняются в БД.
+    Перед выполнением: SET LOCAL TIME ZONE 'UTC'.
+    """
+    return (
+        text(_STATE_AS_OF_SQL)
+        .bindparams(bindparam("as_of", as_of, type_=DateTime(timezone=True)))
+        .columns(
+            id=UUID(as_uuid=True),
+            amount_cents=Integer,
+            payment_source=String,
+            category_id=UUID(as_uuid=True),
+            comment=Text,
+            spent_at=DateTime(timezone=True),
+            receipt_path=Text,
+            is_deleted=Boolean,
+            created_by=UUID(as_uuid=True),
+            created_at=DateTime(timezone=True),
+            updated_at=DateTime(timezone=True),
+        )
+        .subquery("expenses_as_of")
+    )
@@ -0,0 +1,57 @@
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.cache_version import CacheVersion
+from app.models.expense import Expense
+
+# меняется при любом изменении трат (списки, дашборд, дерево категорий с суммами);
+# увеличивается после commit'а изменения (bump_after_commit), а не в его транзакции
+EXPENSES_VERSION = "expenses"
+
+
+async def get_version(db: AsyncSession, name: str) -> int:
+    v = await db.scalar(select(CacheVersion.version).where(CacheVersion.name == name))
+    return v or 0
+
+
+async def bump_version(db: AsyncSession, name: str) -> None:
+    """Увеличить версию в транзакции вызывающего (видна другим после его commit)."""
+    stmt = insert(CacheVersion).values(name=name, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CacheVersion.name],
+        set_={"version": CacheVersion.version + 1},
+    )
+    await db.execute(stmt)
+
+
+async def bump_after_commit(name: str) -> None:
+    """
+    Увеличить версию отдельной короткой транзакцией — вызывать после commit изменения.
+    Строка cache_versions не держится блокировкой всю транзакцию изменения, и писатели
+    на ней не выстраиваются в очередь. synchronous_commit off: потерянный при падении bump
+    перекрывает max(change_seq) в expenses_version.
+    """
+    from app.core.db import async_engine
+
+    async with async_engine.begin() as conn:
+        await conn.execute(text("SET LOCAL synchronous_commit = off"))
+        stmt = insert(CacheVersion).values(name=name, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CacheVersion.name],
+            set_={"version": CacheVersion.version + 1},
+        )
+        await conn.execute(stmt)
+
+
+async def expenses_version(db: AsyncSession) -> tuple[int, int]:
+    """
+    Версия трат для ETag: счётчик expenses и max(change_seq) (индекс ix_expenses_change_seq) —
+    одним запросом. change_seq меняется в транзакции изменения (вставка и триггер на UPDATE),
+    счётчик — после commit'а: покрывает изменения, закоммиченные не в порядке номеров.
+    """
+    row = (await db.execute(select(
+        select(CacheVersion.version).where(CacheVersion.name == EXPENSES_VERSION).scalar_subquery(),
+        select(func.max(Expense.change_seq)).scalar_subquery(),
+    ))).one()
+    return row[0] or 0, row[1] or 0
@@ -0,0 +1,289 @@
+"""
+Синтетические данные для нагрузочных замеров: категории N отелей, траты за несколько лет
+и цепочки истории к ним. Только для локальной/стендовой БД.
+
+    python -m app.gen_data --hotels 5 --expenses 2000000 --years 3
+    python -m app.gen_data --truncate ...   # сначала очистить траты, историю (и outbox), снимки и роллап
+
+Одинаковые --seed и --anchor-date дают одинаковые данные (кроме id пользователей из seed.py):
+период трат отсчитывается назад от --anchor-date, а не от текущего времени.
+Траты и история грузятся через COPY пачками по --chunk строк, роллап пересобирается в конце.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+import bcrypt
+from sqlalchemy import select
+
+from app import seed
+from app.core import partitions, rollup
+from app.core.category_cache import invalidate_categories
+from app.core.db import AsyncSessionLocal, SessionLocal, engine
+from app.core.versions import EXPENSES_VERSION, bump_after_commit
+from app.models.category import Category
+from app.models.user import User, UserRole
+
+# дерево категорий одного отеля: раздел -> подкатегории
+CATEGORY_TEMPLATE = {
+    "Продукты": ["Мясо и рыба", "Овощи и фрукты", "Молочная продукция", "Бакалея"],
+    "Хозтовары": ["Бытовая химия", "Текстиль", "Расходники для номеров"],
+    "Ремонт": ["Сантехника", "Электрика", "Мебель"],
+    "Коммунальные": ["Электроэнергия", "Вода", "Отопление", "Интернет"],
+    "Персонал": ["Зарплата", "Обучение", "Униформа"],
+    "Прачечная": [],
+    "Реклама": [],
+    "Транспорт": ["Топливо", "Такси"],
+}
+
+SOURCES = (("CARD", 0.55), ("CASH", 0.25), ("BANK", 0.20))
+
+COMMENT_WORDS = [
+    "закупка", "оплата", "счёт", "доставка", "замена", "ремонт", "аренда", "поставка",
+    "смеситель", "лампы", "полотенца", "простыни", "моющее", "кофе", "молоко", "хлеб",
+    "картофель", "курица", "бензин", "такси", "фильтр", "кабель", "краска", "матрас",
+]
+VENDORS = ["Метро", "Ашан", "Леруа", "ИП Иванов", "ООО Чистота", "Лента", "Газпромнефть", "Яндекс"]
+
+# доли трат с изменениями после создания
+P_UPDATE = 0.3
+P_DELETE = 0.03
+P_RESTORE = 0.2  # из удалённых
+
+# конец генерируемого периода по умолчанию — фиксированный, чтобы --seed воспроизводил данные
+DEFAULT_ANCHOR = date(2026, 1, 1)
+
+EXPENSE_COLUMNS = (
+    "id", "amount_cents", "payment_source", "category_id", "comment", "spent_at",
+    "is_deleted", "deleted_at", "deleted_by", "created_by", "created_at", "updated_at",
+)
+HISTORY_COLUMNS = ("id", "expense_id", "action", "diff_json", "actor_id", "created_at")
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _ensure_users(hotels: int) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    """admin из seed.py + по менеджеру на отель (пароль manager)."""
+    seed.run()
+    db = SessionLocal()
+    try:
+        admin_id = db.scalar(select(User.id).where(User.role == UserRole.ADMIN).order_by(User.email).limit(1))
+        pw_hash = bcrypt.hashpw(b"manager", bcrypt.gensalt()).decode("utf-8")
+        managers = []
+        for h in range(1, hotels + 1):
+            email = f"manager{h}@bench.local"
+            uid = db.scalar(select(User.id).where(User.email == email))
+            if uid is None:
+                u = User(email=email, password_hash=pw_hash, role=UserRole.MANAGER)
+                db.add(u)
+                db.flush()
+                uid = u.id
+            managers.append(uid)
+        db.commit()
+        return admin_id, managers
+    finally:
+        db.close()
+
+
+def _ensure_categories(hotels: int) -> list[tuple[uuid.UUID, int]]:
+    """Категории по шаблону для каждого отеля. Возвращает (id, номер отеля) всех категорий-листьев."""
+    db = SessionLocal()
+    try:
+        existing = {name: cid for cid, name in db.execute(select(Category.id, Category.name))}
+
+        def get_or_create(name: str, parent_id: uuid.UUID | None) -> uuid.UUID:
+            if name in existing:
+                return existing[name]
+            c = Category(name=name, parent_id=parent_id, is_active=True)
+            db.add(c)
+            db.flush()
+            existing[name] = c.id
+            return c.id
+
+        leaves = []
+        for h in range(1, hotels + 1):
+            root = get_or_create(f"Отель {h}", None)
+            for section, children in CATEGORY_TEMPLATE.items():
+                sid = get_or_create(f"Отель {h} / {section}", root)
+                if not children:
+                    leaves.append((sid, h))
+                for child in children:
+                    leaves.append((get_or_create(f"Отель {h} / {section} / {child}", sid), h))
+        db.commit()
+        return leaves
+    finally:
+        db.close()
+
+
+def _comment(rng: random.Random) -> str | None:
+    if rng.random() < 0.15:
+        return None
+    words = rng.sample(COMMENT_WORDS, rng.randint(1, 3))
+    return f"{' '.join(words).capitalize()}, {rng.choice(VENDORS)}, №{rng.randint(1, 99999)}"
+
+
+def _gen_expense(
+    rng: random.Random,
+    leaves: list[tuple[uuid.UUID, int]],
+    managers: list[uuid.UUID],
+    admin_id: uuid.UUID,
+    start: datetime,
+    span_sec: float,
+    now: datetime,
+) -> tuple[tuple, list[tuple]]:
+    """Одна трата (итоговое состояние) и её история — та же форма diff, что пишет API."""
+    cat_id, hotel = rng.choice(leaves)
+    author = managers[hotel - 1]
+    spent_at = start + timedelta(seconds=rng.random() * span_sec)
+    created_at = min(spent_at + timedelta(seconds=rng.random() * 2 * 86400), now)
+    state = {
+        # логнормальное: много мелких чеков, редкие крупные
+        "amount_cents": max(100, int(math.exp(rng.gauss(7.5, 1.2))) * 100),
+        "payment_source": rng.choices([s for s, _ in SOURCES], [w for _, w in SOURCES])[0],
+        "category_id": cat_id,
+        "comment": _comment(rng),
+        "spent_at": spent_at,
+    }
+    eid = _uuid(rng)
+    history = [(
+        _uuid(rng), eid, "CREATE",
+        json.dumps({
+            "amount_cents": {"old": None, "new": state["amount_cents"]},
+            "payment_source": {"old": None, "new": state["payment_source"]},
+            "category_id": {"old": None, "new": str(cat_id)},
+            "comment": {"old": None, "new": state["comment"]},
+            "spent_at": {"old": None, "new": spent_at.isoformat()},
+        }, ensure_ascii=False),
+        author, created_at,
+    )]
+
+    t = created_at
+    if rng.random() < P_UPDATE:
+        for _ in range(rng.randint(1, 3)):
+            t = min(t + timedelta(seconds=rng.random() * 7 * 86400), now)
+            diff = {}
+            if rng.random() < 0.7:
+                new_amount = max(100, state["amount_cents"] + rng.randint(-50, 50) * 100)
+                if new_amount != state["amount_cents"]:
+                    diff["amount_cents"] = {"old": state["amount_cents"], "new": new_amount}
+                    state["amount_cents"] = new_amount
+            else:
+                new_comment = _comment(rng)
+                if new_comment != state["comment"]:
+                    diff["comment"] = {"old": state["comment"], "new": new_comment}
+                    state["comment"] = new_comment
+            if diff:
+                history.append((_uuid(rng), eid, "UPDATE", json.dumps(diff, ensure_ascii=False), author, t))
+
+    is_deleted, deleted_at, deleted_by = False, None, None
+    if rng.random() < P_DELETE:
+        t = min(t + timedelta(seconds=rng.random() * 30 * 86400), now)
+        history.append((
+            _uuid(rng), eid, "DELETE", json.dumps({"is_deleted": {"old": False, "new": True}}), author, t,
+        ))
+        is_deleted, deleted_at, deleted_by = True, t, author
+        if rng.random() < P_RESTORE:
+            t = min(t + timedelta(seconds=rng.random() * 7 * 86400), now)
+            history.append((
+                _uuid(rng), eid, "RESTORE", json.dumps({"is_deleted": {"old": True, "new": False}}), admin_id, t,
+            ))
+            is_deleted, deleted_at, deleted_by = False, None, None
+
+    row = (
+        eid, state["amount_cents"], state["payment_source"], cat_id, state["comment"], spent_at,
+        is_deleted, deleted_at, deleted_by, author, created_at, t,
+    )
+    return row, history
+
+
+def _copy(cur, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as cp:
+        for r in rows:
+            cp.write_row(r)
+
+
+async def _finish() -> None:
+    async with AsyncSessionLocal() as db:
+        await rollup.rebuild(db)
+        await invalidate_categories(db)
+        await db.commit()
+    await bump_after_commit(EXPENSES_VERSION)
+
+
+def run(
+    hotels: int, expenses: int, years: float, chunk: int, seed_value: int, truncate: bool,
+    anchor: date = DEFAULT_ANCHOR,
+) -> None:
+    rng = random.Random(seed_value)
+    admin_id, managers = _ensure_users(hotels)
+    leaves = _ensure_categories(hotels)
+
+    now = datetime.combine(anchor, dtime.min, tzinfo=timezone.utc)
+    start = now - timedelta(days=365 * years)
+    # помесячные партиции на весь период, иначе всё старше миграции ляжет в *_p_before
+    with engine.begin() as conn:
+        partitions.ensure_all(conn, start.date())
+
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection  # psycopg.Connection — нужен его COPY
+        with conn.cursor() as cur:
+            if truncate:
+                cur.execute(
+                    "TRUNCATE expense_snapshots, expense_history, expense_history_outbox, "
+                    "daily_category_totals, expense_keys"
+                )
+                cur.execute("DELETE FROM expenses")
+                conn.commit()
+
+            span = (now - start).total_seconds()
+            t0 = time.monotonic()
+            done = hist_total = 0
+            while done < expenses:
+                n = min(chunk, expenses - done)
+                exp_rows, hist_rows = [], []
+                for _ in range(n):
+                    row, hist = _gen_expense(rng, leaves, managers, admin_id, start, span, now)
+                    exp_rows.append(row)
+                    hist_rows.extend(hist)
+                _copy(cur, "expenses", EXPENSE_COLUMNS, exp_rows)
+                _copy(cur, "expense_history", HISTORY_COLUMNS, hist_rows)
+                conn.commit()
+                done += n
+                hist_total += len(hist_rows)
+                rate = done / max(time.monotonic() - t0, 1e-9)
+                print(f"expenses {done}/{expenses}, history {hist_total} ({rate:,.0f} rows/s)", flush=True)
+
+            cur.execute("ANALYZE expenses")
+            cur.execute("ANALYZE expense_history")
+            conn.commit()
+    finally:
+        raw.close()
+
+    asyncio.run(_finish())
+    print(f"Done: {len(leaves)} leaf categories, {expenses} expenses, {hist_total} history rows; rollup rebuilt.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синтетические данные для нагрузочных замеров")
+    parser.add_argument("--hotels", type=int, default=3)
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--chunk", type=int, default=20_000, help="строк трат на один COPY/commit")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--anchor-date", type=date.fromisoformat, default=DEFAULT_ANCHOR,
+        help=f"конец периода (YYYY-MM-DD, полночь UTC), по умолчанию {DEFAULT_ANCHOR}",
+    )
+    parser.add_argument(
+        "--truncate", action="store_true", help="удалить траты, историю (и outbox), снимки и роллап перед загрузкой",
+    )
+    args = parser.parse_args()
+    run(args.hotels, args.expenses, args.years, args.chunk, args.seed, args.truncate, args.anchor_date)
@@ -1,20 +1,44 @@
-import os
-from pathlib import Path
+import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.api.expenses import router as expenses_router
 from app.api.health import router as health_router
 from app.api.categories import router as categories_router
-from app.api.receipts import router as receipts_router
+from app.api.receipts import router as receipts_router, files_router as receipt_files_router
+from app.api.dashboard import router as dashboard_router
+from app.api.auth import router as auth_router
+from app.api.history import router as history_router
+from app.api.events import router as events_router
+from app.api.metrics import router as metrics_router
+from app.core.audit import audit_writer
+from app.core.events import event_hub
+from app.core import partitions
+from app.core.config import settings
+from app.core.db import ReadYourWritesMiddleware, async_engine, async_read_engine
+from app.core.metrics import MetricsMiddleware, TimedJSONResponse, instrument_engine
 
-app = FastAPI(title="Шурале — Финансовый трекер")
+log = logging.getLogger(__name__)
 
-receipts_dir = os.getenv("RECEIPTS_DIR", "/data/receipts")
-Path(receipts_dir).mkdir(parents=True, exist_ok=True)
-app.mount("/receipts", StaticFiles(directory=receipts_dir), name="receipts")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    if settings.auth_allow_role_header:
+        log.warning("AUTH_ALLOW_ROLE_HEADER is on: requests without a token are accepted by X-Role (dev/test only)")
+    if settings.partitions_ensure_on_startup:
+        await partitions.ensure_on_startup()
+    if settings.audit_writer_mode == "batched":
+        audit_writer.start()
+    yield
+    await event_hub.stop()
+    await audit_writer.stop()
+
+app = FastAPI(
+    title="Шурале — Финансовый трекер",
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,9 +46,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag"],
 )
+# после изменения клиент читает из основной (cookie), пока реплика может отставать
+app.add_middleware(ReadYourWritesMiddleware)
+
+# метрики, Server-Timing и лог медленных SQL; METRICS_ENABLED прячет только /metrics
+instrument_engine(async_engine)
+if async_read_engine is not async_engine:
+    instrument_engine(async_read_engine, "read")
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(health_router)
+app.include_router(auth_router)
 app.include_router(categories_router)
 app.include_router(expenses_router)
 app.include_router(receipts_router)
+app.include_router(receipt_files_router)
+app.include_router(dashboard_router)
+app.include_router(history_router)
+app.include_router(events_router)
+if settings.metrics_enabled:
+    app.include_router(metrics_router)
@@ -0,0 +1,13 @@
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db import Base
+
+class CacheVersion(Base):
+    """
+    Счётчики версий для кешей в памяти процессов (напр. "categories").
+    Мутация увеличивает версию в своей транзакции; кеш сверяет версию одним запросом по PK.
+    """
+    __tablename__ = "cache_versions"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
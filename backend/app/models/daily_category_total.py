@@ -0,0 +1,21 @@
+import uuid
+from datetime import date
+from sqlalchemy import Integer, BigInteger, Date, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db import Base
+
+class DailyCategoryTotal(Base):
+    """
+    Роллап для дашборда: день × категория × источник оплаты -> сумма, кол-во.
+    Учитываются только неудалённые траты. Поддерживается инкрементально
+    эндпоинтами трат (app.core.rollup), пересобирается python -m app.rebuild_rollup.
+    """
+    __tablename__ = "daily_category_totals"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    category_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("categories.id"), primary_key=True)
+    payment_source: Mapped[str] = mapped_column(String(16), primary_key=True)
+
+    total_cents: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
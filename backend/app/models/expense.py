@@ -1,7 +1,10 @@
 import enum
 import uuid
-from sqlalchemy import Integer, Text, Boolean, DateTime, ForeignKey, String
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    BigInteger, Integer, Text, Boolean, DateTime, ForeignKey, String, Index, Computed, FetchedValue,
+    PrimaryKeyConstraint, text,
+)
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 from app.core.db import Base
@@ -11,16 +14,63 @@ class PaymentSource(str, enum.Enum):
     CARD = "CARD"
     BANK = "BANK"
 
+# russian — стемминг ("сантехника" ~ "сантехник"), simple — как написано (имена, номера счетов)
+COMMENT_TSV_EXPR = (
+    "setweight(to_tsvector('russian', coalesce(comment, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(comment, '')), 'B')"
+)
+
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # помесячные партиции по spent_at (app.core.partitions): ключ партиции обязан входить в PK
+        PrimaryKeyConstraint("id", "spent_at"),
+        # keyset-пагинация списка: (spent_at, id), по умолчанию только живые записи
+        Index("ix_expenses_spent_at_id", "spent_at", "id"),
+        Index("ix_expenses_live_spent_at_id", "spent_at", "id", postgresql_where=text("is_deleted = false")),
+        # фильтры по категории / источнику оплаты + диапазон дат
+        Index(
+            "ix_expenses_live_category_spent_at_id",
+            "category_id", "spent_at", "id",
+            postgresql_where=text("is_deleted = false"),
+        ),
+        Index(
+            "ix_expenses_live_source_spent_at_id",
+            "payment_source", "spent_at", "id",
+            postgresql_where=text("is_deleted = false"),
+        ),
+        # подсчёт ссылок на файл чека (одинаковые чеки хранятся одним файлом)
+        Index("ix_expenses_receipt_path", "receipt_path", postgresql_where=text("receipt_path IS NOT NULL")),
+        # поиск по комментарию: полнотекстовый + триграммы (опечатки)
+        Index("ix_expenses_comment_tsv", "comment_tsv", postgresql_using="gin"),
+        Index(
+            "ix_expenses_comment_trgm", "comment",
+            postgresql_using="gin", postgresql_ops={"comment": "gin_trgm_ops"},
+        ),
+        # max(change_seq) — версия трат для ETag (app.core.versions)
+        Index("ix_expenses_change_seq", "change_seq"),
+        # GET /expenses/changes: изменения после курсора по (change_xid, id)
+        Index("ix_expenses_change_xid_id", "change_xid", "id"),
+        {"postgresql_partition_by": "RANGE (spent_at)"},
+    )
+
+    # PK маппера — (id, spent_at), как у таблицы: refresh и UPDATE/DELETE при flush идут в одну партицию.
+    # Поиск по одному id — через app.core.partitions.expense_by_id (spent_at из expense_keys)
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), default=uuid.uuid4)
 
     amount_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     payment_source: Mapped[str] = mapped_column(String(16), nullable=False)
 
     category_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False)
     comment: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # вычисляется в БД; в ORM не грузим (deferred)
+    comment_tsv: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(COMMENT_TSV_EXPR, persisted=True),
+        nullable=True,
+        deferred=True,
+    )
 
     spent_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
@@ -33,3 +83,22 @@ class Expense(Base):
     created_by: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # номер последнего изменения: на INSERT — default, на UPDATE — триггер (он же ставит updated_at);
+    # растёт с каждой записью и уникален, в отличие от updated_at (одно now() на транзакцию)
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        server_default=text("nextval('expenses_change_seq')"),
+        server_onupdate=FetchedValue(),
+        deferred=True,
+    )
+    # транзакция последнего изменения (pg_current_xact_id — 64 бита с эпохой, не переполняется):
+    # на INSERT — default, на UPDATE — тот же триггер. Всё, что записали транзакции с xid меньше xmin
+    # снимка, уже закоммичено или откачено — такой префикс окончателен, в отличие от change_seq
+    change_xid: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        server_default=text("(pg_current_xact_id()::text::bigint)"),
+        server_onupdate=FetchedValue(),
+        deferred=True,
+    )
@@ -1,15 +1,35 @@
 import uuid
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, String, Index, PrimaryKeyConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, declared_attr, mapped_column
 from sqlalchemy.sql import func
 from app.core.db import Base
 
 class ExpenseHistory(Base):
     __tablename__ = "expense_history"
+    __table_args__ = (
+        # помесячные партиции по created_at (app.core.partitions)
+        PrimaryKeyConstraint("id", "created_at"),
+        # история одной траты и общая лента (keyset по created_at, id)
+        Index("ix_expense_history_expense_created", "expense_id", "created_at", "id"),
+        Index("ix_expense_history_created", "created_at", "id"),
+        Index("ix_expense_history_actor_created", "actor_id", "created_at", "id"),
+        Index("ix_expense_history_action_created", "action", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    expense_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("expenses.id"), nullable=False)
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {"primary_key": [cls.__table__.c.id]}
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), default=uuid.uuid4)
+    # внешний ключ на expense_keys: на expenses нельзя (партиционирована, уникален только (id, spent_at));
+    # DEFERRABLE — перенос траты в другую партицию удаляет и вставляет ключ в одной транзакции
+    expense_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("expense_keys.id", deferrable=True, initially="DEFERRED"),
+        nullable=False,
+    )
 
     action: Mapped[str] = mapped_column(String(16), nullable=False)  # CREATE/UPDATE/DELETE/RESTORE
     diff_json: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
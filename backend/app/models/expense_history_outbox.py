@@ -0,0 +1,22 @@
+import uuid
+from sqlalchemy import BigInteger, DateTime, String
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.core.db import Base
+
+class ExpenseHistoryOutbox(Base):
+    """
+    Строки истории, записанные в транзакции изменения траты (AUDIT_WRITER_MODE=batched).
+    Без вторичных индексов — вставка дешевле, чем в expense_history; фоновый писатель
+    (app.core.audit) переносит их туда пачками.
+    """
+    __tablename__ = "expense_history_outbox"
+
+    seq: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
+    expense_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    action: Mapped[str] = mapped_column(String(16), nullable=False)
+    diff_json: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    actor_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,16 @@
+import uuid
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db import Base
+
+class ExpenseKey(Base):
+    """
+    id траты -> ключ её партиции (spent_at). Ведётся триггером на expenses (миграция d41f7a2c9e60).
+    Поиск по одному id берёт отсюда spent_at — Postgres отсекает остальные партиции при выполнении.
+    На эту таблицу ссылаются внешние ключи истории и снимков (на саму expenses нельзя).
+    """
+    __tablename__ = "expense_keys"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    spent_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
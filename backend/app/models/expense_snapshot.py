@@ -0,0 +1,25 @@
+import uuid
+from sqlalchemy import DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db import Base
+
+class ExpenseSnapshot(Base):
+    """
+    Состояние траты на момент snapshot_at (поля из diff_json истории + is_deleted).
+    Снимки делаются периодически (python -m app.snapshot_expenses) и только для трат,
+    менявшихся с прошлого снимка. Восстановление на дату: ближайший снимок + хвост истории.
+    """
+    __tablename__ = "expense_snapshots"
+    __table_args__ = (
+        Index("ix_expense_snapshots_snapshot_at", "snapshot_at"),
+    )
+
+    # внешний ключ на expense_keys (см. ExpenseHistory.expense_id)
+    expense_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("expense_keys.id", deferrable=True, initially="DEFERRED"),
+        primary_key=True,
+    )
+    snapshot_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    state: Mapped[dict] = mapped_column(JSONB, nullable=False)
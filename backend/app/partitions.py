@@ -0,0 +1,46 @@
+"""
+Обслуживание помесячных партиций expenses / expense_history (см. app.core.partitions).
+Запускать по cron раз в сутки-неделю; API при старте тоже создаёт партиции вперёд.
+
+    python -m app.partitions ensure [--ahead 3] [--from 2023-01-01]
+    python -m app.partitions archive --table expense_history --older-than 36 [--drop]
+"""
+import argparse
+from datetime import date, datetime, timezone
+
+from app.core import partitions
+from app.core.db import engine
+
+
+def run_ensure(first: date | None, ahead: int | None) -> None:
+    with engine.begin() as conn:
+        created = partitions.ensure_all(conn, first, ahead)
+    print(f"Created: {', '.join(created) or 'nothing'}")
+
+
+def run_archive(table: str, older_than: int, drop: bool) -> None:
+    today = datetime.now(timezone.utc).date()
+    before = partitions.add_months(partitions.month_start(today), -older_than)
+    # DETACH ... CONCURRENTLY нельзя внутри транзакции
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        names = partitions.archive(conn, table, before, drop)
+    where = "dropped" if drop else f"moved to schema {partitions.ARCHIVE_SCHEMA}"
+    print(f"{len(names)} partition(s) before {before} {where}: {', '.join(names) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Помесячные партиции expenses / expense_history")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_ensure = sub.add_parser("ensure", help="создать партиции вперёд (и назад с --from)")
+    p_ensure.add_argument("--ahead", type=int, default=None, help="месяцев вперёд, по умолчанию PARTITIONS_AHEAD_MONTHS")
+    p_ensure.add_argument("--from", dest="first", type=date.fromisoformat, default=None)
+    p_archive = sub.add_parser("archive", help="отсоединить старые месяцы в схему archive")
+    p_archive.add_argument("--table", choices=list(partitions.PARTITIONED), required=True)
+    p_archive.add_argument("--older-than", type=int, required=True, help="месяцев назад от текущего")
+    p_archive.add_argument("--drop", action="store_true", help="удалить, а не переносить в archive")
+    args = parser.parse_args()
+
+    if args.cmd == "ensure":
+        run_ensure(args.first, args.ahead)
+    else:
+        run_archive(args.table, args.older_than, args.drop)
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import json
+
+from app.core.db import AsyncSessionLocal
+from app.core import rollup
+
+
+async def run(verify_only: bool = False) -> int:
+    async with AsyncSessionLocal() as db:
+        drift = await rollup.find_drift(db)
+        for d in drift:
+            print(json.dumps(d, ensure_ascii=False))
+        print(f"Drift: {len(drift)} key(s)")
+
+        if verify_only:
+            return 1 if drift else 0
+
+        await rollup.rebuild(db)
+        await db.commit()
+        print("Rollup daily_category_totals rebuilt.")
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересборка/проверка роллапа daily_category_totals")
+    parser.add_argument("--verify", action="store_true", help="только показать расхождения, ничего не менять")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(verify_only=args.verify)))
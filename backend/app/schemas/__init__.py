@@ -1,2 +1,4 @@
-from .category import CategoryOut, CategoryCreate, CategoryUpdate
+from .category import CategoryOut, CategoryCreate, CategoryUpdate, CategoryTreeNodeOut
 from .expense import ExpenseOut, ExpenseCreate, ExpenseUpdate
+from .dashboard import DashboardOut, CategoryTotalOut, DayTotalOut
+from .auth import LoginIn, TokenOut
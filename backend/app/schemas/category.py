@@ -14,3 +14,11 @@ class CategoryCreate(BaseModel):
 class CategoryUpdate(BaseModel):
     name: str | None = Field(default=None, min_length=1, max_length=120)
     parent_id: uuid.UUID | None = None
+
+class CategoryTreeNodeOut(CategoryOut):
+    # траты самой категории
+    total_cents: int = 0
+    count: int = 0
+    # категория + все потомки на любой глубине
+    subtree_total_cents: int = 0
+    subtree_count: int = 0
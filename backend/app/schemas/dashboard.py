@@ -0,0 +1,19 @@
+import uuid
+from datetime import date
+from pydantic import BaseModel
+
+class CategoryTotalOut(BaseModel):
+    category_id: uuid.UUID
+    total_cents: int
+    count: int
+
+class DayTotalOut(BaseModel):
+    day: date
+    total_cents: int
+    count: int
+
+class DashboardOut(BaseModel):
+    total_cents: int
+    count: int
+    by_category: list[CategoryTotalOut]
+    by_day: list[DayTotalOut]
@@ -1,5 +1,6 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal
 from pydantic import BaseModel, Field
 
 class ExpenseOut(BaseModel):
@@ -28,3 +29,49 @@ class ExpenseUpdate(BaseModel):
     category_id: uuid.UUID | None = None
     comment: str | None = Field(default=None, max_length=500)
     spent_at: datetime | None = None
+
+class ExpenseImportRow(ExpenseCreate):
+    # для CSV из таблиц: вместо UUID можно указать имя категории
+    category_id: uuid.UUID | None = None
+    category_name: str | None = None
+
+class BulkRowError(BaseModel):
+    row: int  # номер строки во входных данных, с 0
+    detail: str
+
+class BulkImportResult(BaseModel):
+    created: int
+    errors: list[BulkRowError]
+
+class ExpenseBatchFilter(BaseModel):
+    # те же фильтры, что у GET /expenses
+    date_from: date | None = None
+    date_to: date | None = None
+    category_ids: list[uuid.UUID] | None = None
+    include_children: bool = False
+    payment_source: str | None = None
+    include_deleted: bool = False
+
+class ExpenseBatchIn(BaseModel):
+    op: Literal["set_category", "set_payment_source", "delete", "restore"]
+    # какие траты: список id или фильтр (ровно одно из двух)
+    ids: list[uuid.UUID] | None = Field(default=None, min_length=1, max_length=10_000)
+    filter: ExpenseBatchFilter | None = None
+    # аргумент операции
+    category_id: uuid.UUID | None = None
+    payment_source: str | None = None
+
+class ExpenseBatchResult(BaseModel):
+    op: str
+    updated: int
+    ids: list[uuid.UUID]  # реально изменённые траты
+
+class ExpenseTombstone(BaseModel):
+    id: uuid.UUID
+    deleted_at: datetime | None = None
+
+class ExpenseChangesOut(BaseModel):
+    upserts: list[ExpenseOut]  # новые и изменённые (живые) траты — заменить целиком
+    deleted: list[ExpenseTombstone]  # удалённые — убрать у себя
+    cursor: str  # передать в ?since= в следующий раз
+    has_more: bool  # есть ещё изменения — запросить сразу с новым курсором
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.db import AsyncSessionLocal
+from app.core import snapshots
+
+# запас, чтобы строки истории, ещё не закоммиченные к моменту снимка, не остались за бортом
+SAFETY_LAG = timedelta(minutes=5)
+
+
+async def run(at: datetime | None = None) -> None:
+    at = at or (datetime.now(timezone.utc) - SAFETY_LAG)
+    async with AsyncSessionLocal() as db:
+        n = await snapshots.make_snapshot(db, at)
+        await db.commit()
+    print(f"Snapshot at {at.isoformat()}: {n} expense(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Периодический снимок состояний трат (для as_of)")
+    parser.add_argument("--at", type=datetime.fromisoformat, default=None, help="момент снимка (ISO), по умолчанию сейчас - 5 мин")
+    args = parser.parse_args()
+    at = snapshots.parse_ts(args.at) if args.at else None
+    asyncio.run(run(at))
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import snapshots
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.expense_history import ExpenseHistory
+from app.models.expense_history_outbox import ExpenseHistoryOutbox
+from app.models.user import User, UserRole
+from app.snapshot_expenses import SAFETY_LAG
+
+T = datetime(2026, 3, 1, 9, 0, tzinfo=timezone.utc)
+US = timedelta(microseconds=1)
+A, B = uuid.UUID(int=0xA), uuid.UUID(int=0xB)
+C1, C2 = uuid.UUID(int=0xC1), uuid.UUID(int=0xC2)
+SPENT_A = datetime(2026, 2, 27, 12, 0, tzinfo=timezone.utc)
+SPENT_B = datetime(2026, 2, 28, 12, 0, tzinfo=timezone.utc)
+
+
+def _create(amount: int, source: str, category: uuid.UUID, comment: str | None, spent: datetime) -> dict:
+    return {
+        "amount_cents": {"old": None, "new": amount},
+        "payment_source": {"old": None, "new": source},
+        "category_id": {"old": None, "new": str(category)},
+        "comment": {"old": None, "new": comment},
+        # как пишет API при создании: без зоны (datetime.utcnow-стиль) — проверяем и parse_ts
+        "spent_at": {"old": None, "new": spent.replace(tzinfo=None).isoformat()},
+    }
+
+
+# (expense_id, action, diff, created_at) — известная история двух трат
+HISTORY = [
+    (A, "CREATE", _create(1000, "CASH", C1, "кофе", SPENT_A), T),
+    (B, "CREATE", _create(500, "CARD", C1, None, SPENT_B), T + timedelta(minutes=5)),
+    (A, "UPDATE", {"amount_cents": {"old": 1000, "new": 1500}}, T + timedelta(minutes=10)),
+    (A, "DELETE", {"is_deleted": {"old": False, "new": True}}, T + timedelta(minutes=20)),
+    (A, "RESTORE", {"is_deleted": {"old": True, "new": False}}, T + timedelta(minutes=25)),
+    (B, "UPDATE", {"category_id": {"old": str(C1), "new": str(C2)}}, T + timedelta(minutes=28)),
+    (A, "UPDATE", {"comment": {"old": "кофе", "new": None}}, T + timedelta(minutes=30)),
+]
+LAST = HISTORY[-1][3]
+# снимок, как его делает app.snapshot_expenses в момент LAST: at = сейчас - SAFETY_LAG
+SNAPSHOT_AT = LAST - SAFETY_LAG
+
+AS_OF = [
+    T - US,
+    T,
+    T + timedelta(minutes=10) - US,
+    T + timedelta(minutes=10),
+    T + timedelta(minutes=20),
+    SNAPSHOT_AT - US,
+    SNAPSHOT_AT,  # RESTORE ровно в момент снимка — уже в снимке
+    SNAPSHOT_AT + US,
+    T + timedelta(minutes=28),
+    LAST,
+    LAST + timedelta(hours=1),
+]
+
+
+def _replay(as_of: datetime) -> dict[uuid.UUID, dict]:
+    states: dict[uuid.UUID, dict] = {}
+    for eid, action, diff, at in sorted(HISTORY, key=lambda h: h[3]):
+        if at <= as_of:
+            states[eid] = snapshots.apply_change(states.get(eid), action, diff, at)
+    return states
+
+
+def test_replay_known_history():
+    assert _replay(T - US) == {}
+
+    a = _replay(T + timedelta(minutes=10) - US)[A]
+    assert a["amount_cents"] == 1000 and a["is_deleted"] is False
+    assert a["changed_at"] == T.isoformat()
+
+    states = _replay(T + timedelta(minutes=20))
+    assert states[A]["amount_cents"] == 1500 and states[A]["is_deleted"] is True
+    assert states[B]["category_id"] == str(C1)
+
+    states = _replay(SNAPSHOT_AT)
+    assert SNAPSHOT_AT == T + timedelta(minutes=25)
+    assert states[A]["is_deleted"] is False
+
+    states = _replay(LAST)
+    assert states[A] == {
+        "is_deleted": False,
+        "amount_cents": 1500,
+        "payment_source": "CASH",
+        "category_id": str(C1),
+        "comment": None,
+        "spent_at": SPENT_A.replace(tzinfo=None).isoformat(),
+        "changed_at": LAST.isoformat(),
+    }
+    assert states[B]["category_id"] == str(C2)
+    assert snapshots.parse_ts(states[A]["spent_at"]) == SPENT_A
+
+
+def test_snapshot_plus_tail_equals_full_replay():
+    # правило states_as_of: снимок <= as_of, хвост — строго после снимка и <= as_of
+    base = _replay(SNAPSHOT_AT)
+    for as_of in AS_OF:
+        if as_of < SNAPSHOT_AT:
+            continue
+        states = {eid: dict(st) for eid, st in base.items()}
+        for eid, action, diff, at in HISTORY:
+            if SNAPSHOT_AT < at <= as_of:
+                states[eid] = snapshots.apply_change(states.get(eid), action, diff, at)
+        assert states == _replay(as_of), as_of
+
+
+# ниже — Python (states_as_of/expenses_as_of) против SQL (expenses_as_of_query) на настоящем Postgres.
+# TEST_DATABASE_URL — база после alembic upgrade head; всё в одной транзакции, которая откатывается
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+def _expected(as_of: datetime) -> dict[uuid.UUID, dict]:
+    out = {}
+    for eid, st in _replay(as_of).items():
+        out[eid] = {
+            "amount_cents": st["amount_cents"],
+            "payment_source": st["payment_source"],
+            "category_id": uuid.UUID(st["category_id"]),
+            "comment": st["comment"],
+            "spent_at": snapshots.parse_ts(st["spent_at"]),
+            "is_deleted": st["is_deleted"],
+            "updated_at": snapshots.parse_ts(st["changed_at"]),
+        }
+    return out
+
+
+async def _seed(db: AsyncSession) -> None:
+    user = uuid.uuid4()
+    await db.execute(insert(User).values(
+        id=user, email=f"as-of-{user}@test.local", password_hash="-", role=UserRole.ADMIN,
+    ))
+    await db.execute(insert(Category), [
+        {"id": C1, "name": f"as-of C1 {user}"}, {"id": C2, "name": f"as-of C2 {user}"},
+    ])
+    final = _replay(LAST)
+    await db.execute(insert(Expense), [
+        {
+            "id": eid, "amount_cents": st["amount_cents"], "payment_source": st["payment_source"],
+            "category_id": uuid.UUID(st["category_id"]), "comment": st["comment"],
+            "spent_at": snapshots.parse_ts(st["spent_at"]), "is_deleted": st["is_deleted"],
+            "created_by": user, "created_at": T,
+        }
+        for eid, st in final.items()
+    ])
+    rows = [
+        {"expense_id": eid, "action": action, "diff_json": diff, "actor_id": user, "created_at": at}
+        for eid, action, diff, at in HISTORY
+    ]
+    # последнее изменение ещё в outbox (AUDIT_WRITER_MODE=batched) — оба пути его видят
+    await db.execute(insert(ExpenseHistory), rows[:-1])
+    await db.execute(insert(ExpenseHistoryOutbox), rows[-1:])
+
+
+def _compare(as_of: datetime, rows, label: str) -> None:
+    got = {
+        r["id"]: {k: r[k] for k in ("amount_cents", "payment_source", "category_id", "comment",
+                                     "spent_at", "is_deleted", "updated_at")}
+        for r in rows if r["id"] in (A, B)
+    }
+    assert got == _expected(as_of), (label, as_of)
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (Postgres after alembic upgrade head)")
+@pytest.mark.parametrize("with_snapshot", [False, True])
+def test_python_and_sql_as_of_agree(with_snapshot):
+    async def run():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.connect() as conn:
+                trans = await conn.begin()
+                try:
+                    db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+                    await _seed(db)
+                    if with_snapshot:
+                        assert await snapshots.make_snapshot(db, SNAPSHOT_AT) == 2
+                    await db.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+                    for as_of in AS_OF:
+                        py = await snapshots.expenses_as_of(db, as_of, [A, B])
+                        _compare(as_of, py, "python")
+                        q = snapshots.expenses_as_of_query(as_of)
+                        sql = (await db.execute(select(q).where(q.c.id.in_([A, B])))).mappings().all()
+                        _compare(as_of, sql, "sql")
+                finally:
+                    await trans.rollback()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
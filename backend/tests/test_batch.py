@@ -0,0 +1,163 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+
+from app.api import expenses as api
+from app.core import audit, rollup
+from app.core.actor import Actor
+from app.models.expense import Expense
+from app.models.user import UserRole
+from app.schemas.expense import ExpenseBatchIn
+
+ADMIN = Actor(id=uuid.uuid4(), role=UserRole.ADMIN)
+SPENT = datetime(2026, 3, 1, 9, 0, tzinfo=timezone.utc)
+C_OLD, C_NEW = uuid.uuid4(), uuid.uuid4()
+
+
+def _returned(**kw) -> SimpleNamespace:
+    """Строка RETURNING из _batch_update."""
+    row = {
+        "id": uuid.uuid4(), "amount_cents": 1000, "payment_source": "CASH",
+        "category_id": C_OLD, "spent_at": SPENT, "is_deleted": False,
+    }
+    row.update(kw)
+    return SimpleNamespace(**row)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """batch_expenses без БД: UPDATE отдаёт заданные строки, история и роллап — в списки."""
+    captured = SimpleNamespace(rows=[], history=[], rollup=[], update=None)
+
+    async def fake_update(db, conds, values, old_col=None):
+        captured.update = (values, old_col)
+        return captured.rows
+
+    async def add_history_rows(db, rows):
+        captured.history.extend(rows)
+
+    async def upsert(db, values):
+        captured.rollup.extend(values)
+
+    async def noop(*args, **kwargs):
+        return None
+
+    async def category(db, category_id):
+        return SimpleNamespace(id=category_id, is_active=True)
+
+    monkeypatch.setattr(api, "_batch_update", fake_update)
+    monkeypatch.setattr(audit, "add_history_rows", add_history_rows)
+    monkeypatch.setattr(audit, "commit_with_history", noop)
+    monkeypatch.setattr(api, "bump_after_commit", noop)
+    monkeypatch.setattr(rollup, "_upsert", upsert)
+    monkeypatch.setattr(api.category_cache, "get", category)
+
+    def run(payload: ExpenseBatchIn):
+        return asyncio.run(api.batch_expenses(payload, db=None, actor=ADMIN))
+
+    captured.run = run
+    return captured
+
+
+_NEW = {"category_id": C_NEW, "payment_source": "BANK"}
+
+
+def _single_diff(**old) -> dict:
+    # diff одиночного PATCH для той же правки — batch пишет такой же
+    return api._make_diff(Expense(**old), {k: v for k, v in _NEW.items() if k in old})
+
+
+def test_set_category_history_diff(batch):
+    batch.rows = [_returned(old_value=C_OLD, category_id=C_NEW), _returned(old_value=C_OLD, category_id=C_NEW)]
+    res = batch.run(ExpenseBatchIn(op="set_category", ids=[r.id for r in batch.rows], category_id=C_NEW))
+
+    assert res.updated == 2 and res.ids == [r.id for r in batch.rows]
+    values, old_col = batch.update
+    assert values == {"category_id": C_NEW} and old_col is Expense.category_id
+    assert [h["expense_id"] for h in batch.history] == res.ids
+    for h in batch.history:
+        assert h["action"] == "UPDATE" and h["actor_id"] == ADMIN.id
+        assert h["diff_json"] == {"category_id": {"old": str(C_OLD), "new": str(C_NEW)}}
+        assert h["diff_json"] == _single_diff(category_id=C_OLD)
+    assert len({h["id"] for h in batch.history}) == 2
+
+    # роллап: из старой категории в новую, суммы сохраняются
+    by_cat = {(v["category_id"], v["payment_source"]): (v["total_cents"], v["count"]) for v in batch.rollup}
+    assert by_cat == {(C_OLD, "CASH"): (-2000, -2), (C_NEW, "CASH"): (2000, 2)}
+
+
+def test_set_payment_source_history_diff(batch):
+    batch.rows = [_returned(old_value="CASH", payment_source="BANK")]
+    res = batch.run(ExpenseBatchIn(op="set_payment_source", ids=[batch.rows[0].id], payment_source="bank"))
+
+    assert res.updated == 1
+    values, old_col = batch.update
+    assert values == {"payment_source": "BANK"} and old_col is Expense.payment_source
+    [h] = batch.history
+    assert h["diff_json"] == {"payment_source": {"old": "CASH", "new": "BANK"}}
+    assert h["diff_json"] == _single_diff(payment_source="CASH")
+    by_src = {v["payment_source"]: (v["total_cents"], v["count"]) for v in batch.rollup}
+    assert by_src == {"CASH": (-1000, -1), "BANK": (1000, 1)}
+
+
+def test_deleted_rows_get_history_but_not_rollup(batch):
+    batch.rows = [_returned(old_value=C_OLD, category_id=C_NEW, is_deleted=True)]
+    batch.run(ExpenseBatchIn(op="set_category", ids=[batch.rows[0].id], category_id=C_NEW))
+    assert len(batch.history) == 1 and batch.rollup == []
+
+
+def test_nothing_changed_writes_no_history(batch):
+    res = batch.run(ExpenseBatchIn(op="set_payment_source", ids=[uuid.uuid4()], payment_source="CARD"))
+    assert res.updated == 0 and batch.history == [] and batch.rollup == []
+
+
+@pytest.mark.parametrize("payload, status", [
+    (dict(op="set_payment_source", ids=[uuid.uuid4()], payment_source="CRYPTO"), 400),
+    (dict(op="set_category", ids=[uuid.uuid4()]), 400),
+    (dict(op="delete"), 400),  # ни ids, ни filter
+    (dict(op="delete", filter={}), 400),  # пустой фильтр
+])
+def test_bad_batch_rejected(batch, payload, status):
+    with pytest.raises(HTTPException) as e:
+        batch.run(ExpenseBatchIn(**payload))
+    assert e.value.status_code == status
+
+
+def test_ids_limit_in_schema():
+    ExpenseBatchIn(op="delete", ids=[uuid.uuid4() for _ in range(api.BATCH_MAX_ROWS)])
+    with pytest.raises(ValidationError):
+        ExpenseBatchIn(op="delete", ids=[uuid.uuid4() for _ in range(api.BATCH_MAX_ROWS + 1)])
+
+
+class _Db:
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.rolled_back = False
+
+    async def execute(self, stmt):
+        self.sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        return SimpleNamespace(all=lambda: [_returned() for _ in range(self.n)])
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def test_filter_over_limit_rejected():
+    # фильтр задел больше BATCH_MAX_ROWS: подзапрос берёт LIMIT max+1, лишняя строка — 413 и откат
+    db = _Db(api.BATCH_MAX_ROWS + 1)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(api._batch_update(db, [Expense.is_deleted == False], {"is_deleted": True}))  # noqa: E712
+    assert e.value.status_code == 413 and db.rolled_back
+    assert f"LIMIT {api.BATCH_MAX_ROWS + 1}" in db.sql and "FOR UPDATE" in db.sql
+
+
+def test_filter_at_limit_allowed():
+    db = _Db(api.BATCH_MAX_ROWS)
+    rows = asyncio.run(api._batch_update(db, [Expense.is_deleted == False], {"is_deleted": True}))  # noqa: E712
+    assert len(rows) == api.BATCH_MAX_ROWS and not db.rolled_back
@@ -0,0 +1,144 @@
+import base64
+import json
+import random
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.expenses import _changes_cursor
+from app.core.pagination import decode_xid_cursor, encode_xid_cursor
+
+ZERO = uuid.UUID(int=0)
+
+
+def _raw(obj) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+
+def test_xid_cursor_round_trip():
+    row_id = uuid.uuid4()
+    for xid in (0, 1, 2**32 + 7, 2**62):
+        assert decode_xid_cursor(encode_xid_cursor(xid, row_id)) == (xid, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    _raw({"s": 42}),  # старый формат (по change_seq)
+    _raw({"x": -1, "i": str(ZERO)}),
+    _raw({"x": True, "i": str(ZERO)}),
+    _raw({"x": "10", "i": str(ZERO)}),
+    _raw({"x": 1.5, "i": str(ZERO)}),
+    _raw({"x": 10, "i": "nope"}),
+    _raw({"x": 10}),
+    "###",
+])
+def test_bad_xid_cursor_rejected(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_xid_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def _row(xid, row_id):
+    return SimpleNamespace(change_xid=xid, id=row_id)
+
+
+def test_cursor_next_page_is_last_row():
+    last = _row(15, uuid.uuid4())
+    assert _changes_cursor(None, last, True, 20) == (15, last.id)
+
+
+def test_cursor_jumps_to_horizon_when_drained():
+    assert _changes_cursor((5, uuid.uuid4()), _row(15, uuid.uuid4()), False, 20) == (20, ZERO)
+    assert _changes_cursor(None, None, False, 20) == (20, ZERO)
+
+
+def test_cursor_never_goes_back():
+    after = (30, uuid.uuid4())
+    assert _changes_cursor(after, None, False, 20) == after
+
+
+class _Db:
+    """
+    Модель MVCC для /changes: у транзакции xid по порядку начала, строки видны после commit,
+    xmin снимка — наименьший xid незавершённых. Строка хранит xid последней записи (change_xid).
+    """
+
+    def __init__(self) -> None:
+        self.next_xid = 100
+        self.running: dict[int, dict[uuid.UUID, int]] = {}  # xid -> {id: value}
+        self.rows: dict[uuid.UUID, tuple[int, int]] = {}  # id -> (change_xid, value), закоммиченное
+
+    def begin(self) -> int:
+        xid = self.next_xid
+        self.next_xid += 1
+        self.running[xid] = {}
+        return xid
+
+    def write(self, xid: int, row_id: uuid.UUID, value: int) -> None:
+        self.running[xid][row_id] = value
+
+    def commit(self, xid: int) -> None:
+        for row_id, value in self.running.pop(xid).items():
+            self.rows[row_id] = (xid, value)
+
+    def changes(self, since, limit: int):
+        # тот же порядок шагов, что в эндпоинте: сначала граница, потом строки по ней
+        horizon = min(self.running, default=self.next_xid)
+        after = decode_xid_cursor(since) if since else None
+        found = sorted(
+            (xid, row_id, value) for row_id, (xid, value) in self.rows.items()
+            if xid < horizon and (after is None or (xid, row_id) > after)
+        )
+        page, has_more = found[:limit], len(found) > limit
+        last = _row(*page[-1][:2]) if page else None
+        cursor = _changes_cursor(after, last, has_more, horizon)
+        return {row_id: value for _, row_id, value in page}, encode_xid_cursor(*cursor), has_more
+
+
+def _sync(db: _Db, client: dict, since, limit: int):
+    while True:
+        upserts, since, has_more = db.changes(since, limit)
+        client.update(upserts)
+        if not has_more:
+            return since
+
+
+def test_long_transaction_is_not_skipped():
+    # транзакция начата раньше и идёт дольше любого окна — соседние коммиты курсор её не обгоняет
+    db, client = _Db(), {}
+    a, b = uuid.uuid4(), uuid.uuid4()
+    slow = db.begin()
+    db.write(slow, a, 1)
+    fast = db.begin()
+    db.write(fast, b, 2)
+    db.commit(fast)
+
+    since = _sync(db, client, None, 10)
+    assert client == {}  # b за границей (xmin = slow), но и не потерян
+    for _ in range(5):
+        since = _sync(db, client, since, 10)
+    db.commit(slow)
+    _sync(db, client, since, 10)
+    assert client == {a: 1, b: 2}
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_random_interleavings_converge(seed):
+    rnd = random.Random(seed)
+    db, client, since = _Db(), {}, None
+    ids = [uuid.uuid4() for _ in range(8)]
+    for _ in range(200):
+        op = rnd.random()
+        if op < 0.25 or not db.running:
+            db.begin()
+        elif op < 0.6:
+            db.write(rnd.choice(list(db.running)), rnd.choice(ids), rnd.randrange(1000))
+        elif op < 0.8:
+            db.commit(rnd.choice(list(db.running)))
+        else:
+            since = _sync(db, client, since, rnd.randint(1, 3))
+    for xid in list(db.running):
+        db.commit(xid)
+    _sync(db, client, since, 2)
+    assert client == {row_id: value for row_id, (_, value) in db.rows.items()}
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi import Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from starlette.requests import Request
+
+from app.core.conditional import etag_matches, list_etag, not_modified
+from app.core.versions import EXPENSES_VERSION, bump_version, expenses_version
+from app.models.cache_version import CacheVersion
+
+ETAG = '"0123abcd"'
+
+
+@pytest.mark.parametrize("header", [
+    ETAG,
+    f"W/{ETAG}",  # If-None-Match сравнивает слабо
+    f'"other", {ETAG}',
+    f'"other",W/{ETAG} , "more"',
+    "*",
+    " * ",
+])
+def test_etag_matches(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", [None, "", '"other"', "0123abcd", '"0123abcd-thumb", W/"x"', "W/*"])
+def test_etag_does_not_match(header):
+    assert not etag_matches(header, ETAG)
+
+
+def _request(query: str = "", if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": query.encode(), "headers": headers})
+
+
+def test_list_etag_depends_on_every_part():
+    base = list_etag(_request("limit=50"), (3, 17), "MANAGER")
+    assert base.startswith('"') and base.endswith('"')
+    assert list_etag(_request("limit=50"), (3, 17), "MANAGER") == base
+    assert list_etag(_request("limit=50"), (3, 17), "ADMIN") != base  # роль видит удалённые
+    assert list_etag(_request("limit=50"), (4, 17), "MANAGER") != base  # счётчик после commit
+    assert list_etag(_request("limit=50"), (3, 18), "MANAGER") != base  # max(change_seq)
+    assert list_etag(_request("limit=20"), (3, 17), "MANAGER") != base
+
+
+def test_list_etag_include_children_and_categories_version():
+    q = "category_ids=a&include_children=true"
+    plain = list_etag(_request("category_ids=a"), (3, 17), "MANAGER")
+    with_tree = list_etag(_request(q), (3, 17), "MANAGER", 5)
+    assert with_tree != plain
+    # перенос категории (версия дерева) меняет ответ со include_children
+    assert list_etag(_request(q), (3, 17), "MANAGER", 6) != with_tree
+
+
+def test_list_etag_ignores_query_order():
+    assert list_etag(_request("a=1&b=2&b=3"), 1) == list_etag(_request("b=2&a=1&b=3"), 1)
+    assert list_etag(_request("a=1"), 1) != list_etag(_request("a=1&a=1"), 1)
+
+
+def test_not_modified():
+    response = Response()
+    assert not_modified(_request(), response, ETAG) is None
+    assert response.headers["etag"] == ETAG
+    cached = not_modified(_request(if_none_match=ETAG), Response(), ETAG)
+    assert cached.status_code == 304 and cached.headers["etag"] == ETAG
+
+
+def test_etag_changes_after_write():
+    # expenses_version на SQLite: cache_versions + минимальная expenses (только change_seq)
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(CacheVersion.__table__.create)
+                await conn.execute(text("CREATE TABLE expenses (change_seq INTEGER)"))
+            async with AsyncSession(engine) as db:
+                async def etag(if_none_match=None):
+                    request = _request("limit=50", if_none_match)
+                    return list_etag(request, await expenses_version(db), "MANAGER"), request
+
+                first, _ = await etag()
+                again, request = await etag(first)
+                assert again == first and not_modified(request, Response(), again).status_code == 304
+
+                # запись: change_seq в транзакции изменения...
+                await db.execute(text("INSERT INTO expenses (change_seq) VALUES (1)"))
+                await db.commit()
+                second, request = await etag(first)
+                assert second != first and not_modified(request, Response(), second) is None
+
+                # ...и счётчик после commit (bump_after_commit) — тоже новая версия
+                await bump_version(db, EXPENSES_VERSION)
+                await db.commit()
+                third, _ = await etag()
+                assert third not in (first, second)
+                assert await expenses_version(db) == (1, 1)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.events import MAX_EVENTS_PER_COMMIT, PAYLOAD_LIMIT, RESYNC, EventHub, _event, _payloads
+
+AT = datetime(2026, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def _row(comment: str = "", **diff) -> dict:
+    return {
+        "action": "UPDATE",
+        "expense_id": uuid.uuid4(),
+        "diff_json": {"comment": {"old": None, "new": comment}, **diff},
+        "actor_id": uuid.uuid4(),
+        "created_at": AT,
+    }
+
+
+def _size(row: dict) -> int:
+    return len(json.dumps(_event(row), ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _sized(target: int, char: str = "x") -> dict:
+    """Строка истории, событие которой в JSON занимает ровно target байт."""
+    row = _row()
+    row["diff_json"]["comment"]["new"] = char * ((target - _size(row)) // len(char.encode("utf-8")))
+    assert _size(row) == target
+    return row
+
+
+def _decode(payloads: list[str]) -> list[dict]:
+    return [ev for p in payloads for ev in json.loads(p)]
+
+
+def test_bulk_switch_above_limit():
+    rows = [_row("a") for _ in range(MAX_EVENTS_PER_COMMIT)]
+    payloads = _payloads(rows)
+    assert [ev["expense_id"] for ev in _decode(payloads)] == [str(r["expense_id"]) for r in rows]
+
+    payloads = _payloads(rows + [_row("a")])
+    assert payloads == [json.dumps([{"action": "BULK", "count": MAX_EVENTS_PER_COMMIT + 1}])]
+
+
+def test_event_at_limit_keeps_changes():
+    row = _sized(PAYLOAD_LIMIT - 2)  # "[" + событие + "]" == PAYLOAD_LIMIT
+    [payload] = _payloads([row])
+    assert len(payload.encode("utf-8")) == PAYLOAD_LIMIT
+    assert _decode([payload])[0]["changes"]["comment"] == row["diff_json"]["comment"]["new"]
+
+
+def test_event_over_limit_drops_changes():
+    row = _sized(PAYLOAD_LIMIT - 1)
+    [payload] = _payloads([row])
+    [ev] = _decode([payload])
+    assert "changes" not in ev
+    assert ev["expense_id"] == str(row["expense_id"]) and ev["action"] == "UPDATE"
+
+
+def test_multibyte_counted_in_bytes():
+    # кириллица — 2 байта на символ: по длине строки влезло бы, по байтам — нет
+    row = _row("щ" * (PAYLOAD_LIMIT // 2))
+    assert len(json.dumps(_event(row), ensure_ascii=False)) < PAYLOAD_LIMIT < _size(row)
+    [ev] = _decode(_payloads([row]))
+    assert "changes" not in ev
+
+
+def test_split_boundary():
+    # два события по n байт: "[" + a + "," + b + "]" = 2n + 3
+    n = (PAYLOAD_LIMIT - 3) // 2
+    fits = [_sized(n), _sized(n)]
+    payloads = _payloads(fits)
+    assert len(payloads) == 1 and len(payloads[0].encode("utf-8")) <= PAYLOAD_LIMIT
+
+    over = [_sized(n + 1), _sized(n + 1)]
+    assert 2 * (n + 1) + 3 > PAYLOAD_LIMIT
+    assert len(_payloads(over)) == 2
+
+
+@pytest.mark.parametrize("comment_len", [0, 100, 1000, 3000, 7000])
+def test_payloads_within_limit_and_in_order(comment_len):
+    rows = [_row("ё" * (comment_len + i)) for i in range(50)]
+    payloads = _payloads(rows)
+    assert all(len(p.encode("utf-8")) <= PAYLOAD_LIMIT for p in payloads)
+    assert [ev["expense_id"] for ev in _decode(payloads)] == [str(r["expense_id"]) for r in rows]
+
+
+def test_slow_subscriber_gets_resync(monkeypatch):
+    async def idle(self):
+        await asyncio.Event().wait()
+
+    # без LISTEN-соединения: события подаём в _fanout напрямую
+    monkeypatch.setattr(EventHub, "_run", idle)
+
+    async def run():
+        hub = EventHub(queue_size=3)
+        slow, fast = hub.subscribe(), hub.subscribe()
+        try:
+            got = []
+            for i in range(5):
+                hub._fanout([{"n": i}])
+                got.append(fast.get_nowait())  # этот успевает читать
+            assert [ev for _, ev in got] == [{"n": i} for i in range(5)]
+            assert [seq for seq, _ in got] == sorted(seq for seq, _ in got)
+
+            # 4-е событие не влезло: очередь медленного сброшена, RESYNC, дальше — обычные события
+            items = [slow.get_nowait() for _ in range(slow.qsize())]
+            assert [ev for _, ev in items] == [RESYNC, {"n": 4}]
+            assert got[2][0] < items[0][0] < items[1][0]
+
+            # переполнение посреди пачки: остаток пачки не нужен — только RESYNC
+            hub._fanout([{"n": i} for i in range(10)])
+            assert slow.qsize() == 1 and slow.get_nowait()[1] == RESYNC
+            assert fast.qsize() == 1 and fast.get_nowait()[1] == RESYNC
+
+            hub.unsubscribe(slow)
+            hub._fanout([{"n": 10}])
+            assert slow.empty() and hub.subscribers == 1
+        finally:
+            await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_event_shape():
+    row = _row("кофе", amount_cents={"old": 100, "new": 150})
+    ev = _event(row)
+    assert ev == {
+        "action": "UPDATE",
+        "expense_id": str(row["expense_id"]),
+        "changes": {"comment": "кофе", "amount_cents": 150},
+        "by": str(row["actor_id"]),
+        "at": AT.isoformat(),
+    }
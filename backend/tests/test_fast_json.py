@@ -0,0 +1,89 @@
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.core.fast_json import rows_response
+from app.schemas.expense import ExpenseOut
+
+
+class TotalOut(BaseModel):
+    category_id: uuid.UUID
+    total: Decimal
+    at: datetime
+
+
+ExpenseRow = namedtuple("ExpenseRow", list(ExpenseOut.model_fields))
+TotalRow = namedtuple("TotalRow", list(TotalOut.model_fields))
+
+UTC_MICRO = datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)
+MSK = datetime(2026, 3, 1, 12, 30, 15, 7, tzinfo=ZoneInfo("Europe/Moscow"))
+OFFSET_ZERO = datetime(2026, 3, 1, 9, 0, tzinfo=timezone(timedelta(0)))
+NEG_OFFSET = datetime(2025, 12, 31, 23, 59, 59, 999999, tzinfo=timezone(timedelta(hours=-5, minutes=-30)))
+
+EXPENSES = [
+    ExpenseRow(
+        uuid.UUID("6f1c2d3e-0000-4000-8000-000000000001"), 12345, "CARD",
+        uuid.UUID("6f1c2d3e-0000-4000-8000-0000000000aa"), "кофе \"с собой\" \\ 🙂",
+        UTC_MICRO, "2026/03/r.jpg", False, uuid.uuid4(), MSK, OFFSET_ZERO,
+    ),
+    ExpenseRow(
+        uuid.uuid4(), 1, "CASH", uuid.uuid4(), None,
+        NEG_OFFSET, None, True, uuid.uuid4(), UTC_MICRO, MSK,
+    ),
+]
+TOTALS = [
+    TotalRow(uuid.uuid4(), Decimal("1234.50"), UTC_MICRO),
+    TotalRow(uuid.uuid4(), Decimal("0"), MSK),
+    TotalRow(uuid.uuid4(), Decimal("-7.000001"), NEG_OFFSET),
+]
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/model/expenses", response_model=list[ExpenseOut])
+    async def model_expenses():
+        return [r._asdict() for r in EXPENSES]
+
+    @app.get("/fast/expenses", response_model=list[ExpenseOut])
+    async def fast_expenses(response: Response):
+        return rows_response(EXPENSES, response)
+
+    @app.get("/model/totals", response_model=list[TotalOut])
+    async def model_totals():
+        return [r._asdict() for r in TOTALS]
+
+    @app.get("/fast/totals", response_model=list[TotalOut])
+    async def fast_totals(response: Response):
+        return rows_response(TOTALS, response)
+
+    return TestClient(app)
+
+
+def test_expense_rows_same_bytes():
+    c = _client()
+    assert c.get("/fast/expenses").content == c.get("/model/expenses").content
+
+
+def test_decimal_rows_same_bytes():
+    c = _client()
+    assert c.get("/fast/totals").content == c.get("/model/totals").content
+
+
+def test_headers_carried_over():
+    app = FastAPI()
+
+    @app.get("/")
+    async def page(response: Response):
+        response.headers["X-Next-Cursor"] = "abc"
+        return rows_response(EXPENSES, response)
+
+    r = TestClient(app).get("/")
+    assert r.headers["x-next-cursor"] == "abc"
+    assert r.headers["content-type"] == "application/json"
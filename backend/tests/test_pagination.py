@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import Column, DateTime, MetaData, Table, TypeDecorator, Uuid, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.pagination import decode_cursor, encode_cursor, keyset_page
+
+T0 = datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def _raw(obj) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("ts", [
+    T0,
+    T0.replace(microsecond=0),
+    T0.astimezone(timezone(timedelta(hours=3))),
+    T0.astimezone(timezone(timedelta(hours=-5, minutes=-30))),
+])
+def test_cursor_round_trip(ts):
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(ts, row_id)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == (ts, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "курсор",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    _raw(None),
+    _raw([1, 2]),
+    _raw({"t": T0.isoformat()}),
+    _raw({"i": str(uuid.uuid4())}),
+    _raw({"t": "yesterday", "i": str(uuid.uuid4())}),
+    _raw({"t": T0.isoformat(), "i": "42"}),
+    _raw({"t": 1, "i": str(uuid.uuid4())}),
+    _raw({"t": T0.replace(tzinfo=None).isoformat(), "i": str(uuid.uuid4())}),  # без зоны — не наш
+    encode_cursor(T0, uuid.uuid4())[:-3],  # обрезан
+])
+def test_bad_cursor_rejected(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+class UtcDateTime(TypeDecorator):
+    """SQLite хранит время без зоны; храним UTC и возвращаем aware — как timestamptz в Postgres."""
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return value.replace(tzinfo=timezone.utc) if value is not None else None
+
+
+# keyset_page на SQLite (aiosqlite): сравнение кортежей и ORDER BY ... LIMIT — те же, что в Postgres
+items = Table("items", MetaData(), Column("ts", UtcDateTime()), Column("id", Uuid))
+
+
+def _pages(rows: list[tuple[datetime, uuid.UUID]], limit: int) -> list[list[tuple[datetime, uuid.UUID]]]:
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(items.metadata.create_all)
+                await conn.execute(insert(items), [{"ts": ts, "id": i} for ts, i in rows])
+            pages, cursor = [], None
+            async with AsyncSession(engine) as db:
+                while True:
+                    response = Response()
+                    page = await keyset_page(
+                        db, select(items), items.c.ts, items.c.id, limit, cursor, response, as_rows=True
+                    )
+                    pages.append([(r.ts, r.id) for r in page])
+                    cursor = response.headers.get("X-Next-Cursor")
+                    if cursor is None:
+                        break
+                    assert len(page) == limit
+            return pages
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 7, 20])
+def test_pages_with_tied_timestamps(limit):
+    # много строк с одним spent_at — порядок и граница страницы держатся на id
+    rows = [(T0, uuid.uuid4()) for _ in range(7)]
+    rows += [(T0 - timedelta(seconds=1), uuid.uuid4()) for _ in range(4)]
+    rows += [(T0 + timedelta(microseconds=1), uuid.uuid4())]
+    pages = _pages(rows, limit)
+
+    flat = [r for p in pages for r in p]
+    expected = sorted(rows, key=lambda r: (r[0], r[1]), reverse=True)
+    assert flat == expected  # ни пропусков, ни повторов на границах
+    assert all(len(p) == limit for p in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_exact_multiple_has_no_empty_last_page():
+    rows = [(T0, uuid.uuid4()) for _ in range(6)]
+    pages = _pages(rows, 3)
+    assert [len(p) for p in pages] == [3, 3]
@@ -0,0 +1,112 @@
+import importlib.util
+import uuid
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core import partitions
+from app.models.expense import Expense
+
+_spec = importlib.util.spec_from_file_location(
+    "m716dcb641a86", Path(__file__).parents[1] / "alembic/versions/716dcb641a86_monthly_partitions.py",
+)
+migration = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(migration)
+
+
+@pytest.mark.parametrize("add_months", [partitions.add_months, migration._add_months])
+@pytest.mark.parametrize("d, n, expected", [
+    (date(2024, 1, 1), 1, date(2024, 2, 1)),
+    (date(2024, 11, 1), 2, date(2025, 1, 1)),
+    (date(2024, 12, 1), 1, date(2025, 1, 1)),
+    (date(2024, 1, 1), -1, date(2023, 12, 1)),
+    (date(2024, 3, 1), -15, date(2022, 12, 1)),
+    (date(2024, 1, 31), 1, date(2024, 2, 1)),  # всегда начало месяца
+    (date(2024, 5, 1), 0, date(2024, 5, 1)),
+    (date(2024, 5, 1), 36, date(2027, 5, 1)),
+])
+def test_add_months(add_months, d, n, expected):
+    assert add_months(d, n) == expected
+
+
+@pytest.mark.parametrize("bound", [partitions._bound, migration._bound])
+def test_bound_is_utc_midnight(bound):
+    assert bound(date(2024, 2, 1)) == "'2024-02-01 00:00:00+00'"
+
+
+def test_month_start_and_name():
+    assert partitions.month_start(date(2024, 2, 29)) == date(2024, 2, 1)
+    assert partitions._name("expenses", date(2024, 2, 1)) == "expenses_p2024_02"
+
+
+class _Conn:
+    """Подмена Connection: помнит SQL, отдаёт список партиций из pg_inherits."""
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = names
+        self.sql: list[str] = []
+
+    def scalars(self, stmt, params=None):
+        return list(self.names)
+
+    def execute(self, stmt, params=None):
+        self.sql.append(str(stmt))
+        return SimpleNamespace(rowcount=0)
+
+    def created(self) -> list[str]:
+        return [s.split()[2] for s in self.sql if s.startswith("CREATE TABLE")]
+
+
+def _existing(table: str, first: date, last: date) -> list[str]:
+    out, m = [f"{table}_p_before", f"{table}_p_future"], first
+    while m <= last:
+        out.append(partitions._name(table, m))
+        m = partitions.add_months(m, 1)
+    return out
+
+
+def test_ensure_forward_carves_future():
+    conn = _Conn(_existing("expenses", date(2024, 1, 1), date(2024, 3, 1)))
+    names = partitions.ensure(conn, "expenses", None, date(2024, 5, 17))
+    assert names == ["expenses_p2024_04", "expenses_p2024_05"]
+    assert conn.created() == names
+    assert "ALTER TABLE expenses DETACH PARTITION expenses_p_future" in conn.sql
+    # future снова от следующего после созданных месяца
+    assert conn.sql[-1] == (
+        "ALTER TABLE expenses ATTACH PARTITION expenses_p_future "
+        "FOR VALUES FROM ('2024-06-01 00:00:00+00') TO (MAXVALUE)"
+    )
+
+
+def test_ensure_backward_carves_before():
+    conn = _Conn(_existing("expense_history", date(2024, 1, 1), date(2024, 3, 1)))
+    names = partitions.ensure(conn, "expense_history", date(2023, 11, 20), date(2024, 2, 1))
+    assert names == ["expense_history_p2023_11", "expense_history_p2023_12"]
+    assert conn.sql[-1] == (
+        "ALTER TABLE expense_history ATTACH PARTITION expense_history_p_before "
+        "FOR VALUES FROM (MINVALUE) TO ('2023-11-01 00:00:00+00')"
+    )
+    moved = next(s for s in conn.sql if s.startswith("WITH moved"))
+    assert "created_at >= '2023-11-01 00:00:00+00' AND created_at < '2024-01-01 00:00:00+00'" in moved
+
+
+def test_ensure_nothing_to_do():
+    conn = _Conn(_existing("expenses", date(2024, 1, 1), date(2024, 3, 1)))
+    assert partitions.ensure(conn, "expenses", date(2024, 1, 1), date(2024, 3, 31)) == []
+    assert conn.created() == []
+
+
+def test_ensure_requires_partitioned_table():
+    with pytest.raises(RuntimeError):
+        partitions.ensure(_Conn([]), "expenses", None, date(2024, 1, 1))
+
+
+def test_lookup_by_id_carries_partition_key():
+    sql = str(select(Expense.id).where(*partitions.expense_by_id(uuid.uuid4())).compile(dialect=postgresql.dialect()))
+    assert "expenses.spent_at = (SELECT expense_keys.spent_at" in sql
+    sql = str(select(Expense.id).where(*partitions.expenses_by_ids([uuid.uuid4()])).compile(dialect=postgresql.dialect()))
+    assert "expenses.spent_at = ANY (CAST((SELECT array_agg(expense_keys.spent_at)" in sql
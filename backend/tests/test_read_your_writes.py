@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.core import db
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    # отдельная "реплика" — сессии не создаются, сравниваем только фабрики
+    fake = object()
+    monkeypatch.setattr(db, "AsyncReadSessionLocal", fake)
+    return fake
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(db.ReadYourWritesMiddleware)
+
+    @app.post("/ok")
+    async def ok():
+        return {}
+
+    @app.post("/fail")
+    async def fail():
+        raise HTTPException(status_code=400)
+
+    @app.get("/read")
+    async def read(request: Request):
+        return {"primary": db.read_sessionmaker(request) is db.AsyncSessionLocal}
+
+    return TestClient(app)
+
+
+def test_write_sets_cookie_and_next_read_goes_to_primary(replica):
+    c = _client()
+    assert c.get("/read").json() == {"primary": False}
+    r = c.post("/ok")
+    assert db.STICKY_COOKIE in r.cookies
+    assert c.get("/read").json() == {"primary": True}
+
+
+def test_failed_write_and_reads_set_no_cookie(replica):
+    c = _client()
+    assert db.STICKY_COOKIE not in c.post("/fail").cookies
+    assert db.STICKY_COOKIE not in c.get("/read").cookies
+
+
+@pytest.mark.parametrize("value, primary", [
+    (lambda now: now + 1, True),
+    (lambda now: now - 1, False),
+    (lambda now: now + 3600, False),  # длиннее READ_STICKY_SEC — подделка
+    (lambda now: "garbage", False),
+])
+def test_cookie_window(replica, value, primary):
+    c = _client()
+    c.cookies.set(db.STICKY_COOKIE, str(value(time.time())))
+    assert c.get("/read").json() == {"primary": primary}
+
+
+def test_no_replica_no_cookie():
+    assert db.AsyncReadSessionLocal is db.AsyncSessionLocal
+    assert db.STICKY_COOKIE not in _client().post("/ok").cookies
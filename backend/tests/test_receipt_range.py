@@ -0,0 +1,44 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.receipts import ReceiptFileResponse, _etag
+
+BODY = bytes(range(256)) * 4
+
+
+def _client(tmp_path) -> tuple[TestClient, str]:
+    path = tmp_path / "ab" / "abcdef.jpg"
+    path.parent.mkdir()
+    path.write_bytes(BODY)
+    etag = _etag("ab/abcdef.jpg", None)
+    app = FastAPI()
+
+    @app.get("/r")
+    async def r():
+        return ReceiptFileResponse(path, etag, media_type="image/jpeg")
+
+    return TestClient(app), etag
+
+
+def test_if_range_with_our_etag_gives_partial(tmp_path):
+    c, etag = _client(tmp_path)
+    r = c.get("/r", headers={"Range": "bytes=10-19", "If-Range": etag})
+    assert r.status_code == 206
+    assert r.content == BODY[10:20]
+    assert r.headers["etag"] == etag
+
+
+def test_if_range_mismatch_gives_full_body(tmp_path):
+    c, etag = _client(tmp_path)
+    for other in ('"other"', f"W/{etag}"):
+        r = c.get("/r", headers={"Range": "bytes=10-19", "If-Range": other})
+        assert r.status_code == 200
+        assert r.content == BODY
+
+
+def test_if_range_last_modified_still_works(tmp_path):
+    c, _ = _client(tmp_path)
+    lm = c.get("/r").headers["last-modified"]
+    r = c.get("/r", headers={"Range": "bytes=0-3", "If-Range": lm})
+    assert r.status_code == 206
+    assert r.content == BODY[:4]
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.core import receipt_store
+from app.core.receipt_derivatives import SIZES, derivative_path
+
+REL = receipt_store.cas_path("ab" * 32, ".jpg")
+
+
+class _Db:
+    def __init__(self, refs: int) -> None:
+        self.refs = refs
+        self.committed = False
+
+    async def execute(self, stmt, params=None):
+        return None  # advisory-lock
+
+    async def scalar(self, stmt):
+        return self.refs
+
+    async def commit(self):
+        self.committed = True
+
+
+@pytest.fixture
+def receipt(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECEIPTS_DIR", str(tmp_path))
+    files = [tmp_path / REL] + [derivative_path(REL, size) for size in SIZES]
+    for f in files:
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_bytes(b"x")
+    return files
+
+
+def test_release_last_reference_removes_derivatives(receipt):
+    db = _Db(refs=0)
+    asyncio.run(receipt_store.release(db, REL))
+    assert not any(f.exists() for f in receipt)
+    assert db.committed
+
+
+def test_release_keeps_files_still_referenced(receipt):
+    asyncio.run(receipt_store.release(_Db(refs=1), REL))
+    assert all(f.exists() for f in receipt)
+
+
+def test_release_without_derivatives(receipt):
+    for f in receipt[1:]:
+        f.unlink()
+    asyncio.run(receipt_store.release(_Db(refs=0), REL))
+    assert not receipt[0].exists()
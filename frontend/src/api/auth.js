@@ -0,0 +1,30 @@
+import { api, setAuthToken } from "./client";
+
+const STORAGE_KEY = "hft_session";
+
+// сессия = токен + роль из ответа /auth/login; переживает перезагрузку страницы
+export function loadSession() {
+  try {
+    const s = JSON.parse(localStorage.getItem(STORAGE_KEY) || "null");
+    if (s?.token) {
+      setAuthToken(s.token);
+      return s;
+    }
+  } catch {
+    // битое значение — как будто не входили
+  }
+  return null;
+}
+
+export async function login(email, password) {
+  const res = await api.post("/auth/login", { email, password });
+  const session = { token: res.data.access_token, role: res.data.role, email };
+  localStorage.setItem(STORAGE_KEY, JSON.stringify(session));
+  setAuthToken(session.token);
+  return session;
+}
+
+export function logout() {
+  localStorage.removeItem(STORAGE_KEY);
+  setAuthToken(null);
+}
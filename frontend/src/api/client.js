@@ -2,16 +2,27 @@ import axios from "axios";
 
 export const api = axios.create({
   baseURL: "http://localhost:8000",
+  // cookie read-your-writes от API (после изменения читать из основной базы)
+  withCredentials: true,
   paramsSerializer: {
     indexes: null, // ВАЖНО для FastAPI массивов
   },
 });
 
-// временно: если хотим быть админом
-export function setAdminMode(enabled) {
-  if (enabled) {
-    api.defaults.headers.common["X-Role"] = "ADMIN";
+export function setAuthToken(token) {
+  if (token) {
+    api.defaults.headers.common["Authorization"] = `Bearer ${token}`;
   } else {
-    delete api.defaults.headers.common["X-Role"];
+    delete api.defaults.headers.common["Authorization"];
   }
 }
+
+// токен истёк/отозван — приложение возвращается к форме входа
+export function onUnauthorized(handler) {
+  return api.interceptors.response.use(undefined, (error) => {
+    if (error?.response?.status === 401 && !error.config?.url?.startsWith("/auth/")) {
+      handler();
+    }
+    return Promise.reject(error);
+  });
+}
@@ -0,0 +1,14 @@
+import { api } from "./client";
+
+// EventSource не умеет ставить заголовки — токен передаём в query
+export function subscribeExpenseEvents({ onEvent, onResync }) {
+  const auth = api.defaults.headers.common["Authorization"];
+  const params = new URLSearchParams();
+  if (auth) params.set("token", auth.replace(/^Bearer /, ""));
+
+  const es = new EventSource(`${api.defaults.baseURL}/events?${params}`);
+  es.addEventListener("expense", (e) => onEvent?.(JSON.parse(e.data)));
+  // пропустили события (отстали/переподключились) — перечитать список
+  es.addEventListener("resync", () => onResync?.());
+  return () => es.close();
+}
@@ -4,6 +4,18 @@ export function listExpenses(params) {
   return api.get("/expenses", { params });
 }
 
+// все страницы списка: сервер отдаёт не больше limit строк, следующая — по X-Next-Cursor
+export async function listAllExpenses(params) {
+  const rows = [];
+  let cursor;
+  do {
+    const res = await listExpenses({ ...params, limit: 1000, cursor });
+    rows.push(...res.data);
+    cursor = res.headers["x-next-cursor"];
+  } while (cursor);
+  return rows;
+}
+
 export function createExpense(data) {
   return api.post("/expenses", data);
 }
@@ -19,3 +31,17 @@ export function restoreExpense(id) {
 export function updateExpense(id, data) {
   return api.patch(`/expenses/${id}`, data);
 }
+
+export function exportExpensesUrl(params) {
+  return api.getUri({ url: "/expenses/export", params });
+}
+
+// op: set_category | set_payment_source | delete | restore; ids или filter
+export function batchExpenses(data) {
+  return api.post("/expenses/batch", data);
+}
+
+// дельта-синхронизация: since — cursor из прошлого ответа (без него — первая загрузка)
+export function expenseChanges(since, limit) {
+  return api.get("/expenses/changes", { params: { since, limit } });
+}
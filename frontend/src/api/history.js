@@ -3,3 +3,7 @@ import { api } from "./client";
 export function getExpenseHistory(expenseId) {
   return api.get(`/expenses/${expenseId}/history`);
 }
+
+export function listHistory(params) {
+  return api.get("/history", { params });
+}
@@ -7,3 +7,12 @@ export function uploadReceipt(expenseId, file) {
     headers: { "Content-Type": "multipart/form-data" },
   });
 }
+
+// ссылка для <img src>/<a href>: браузер не пошлёт заголовок Authorization — токен в query
+export function receiptUrl(name, size) {
+  const params = {};
+  if (size) params.size = size;
+  const auth = api.defaults.headers.common["Authorization"];
+  if (auth) params.token = auth.replace(/^Bearer /, "");
+  return api.getUri({ url: `/receipts/${name}`, params });
+}